@@ -12,7 +12,10 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# When run in-process by the bot, keep the bot's logging configuration.
+if config.config_file_name is not None and config.attributes.get(
+    "configure_logger", True
+):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -56,6 +59,14 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # Reuse a connection handed over by the caller (see app.main.run_migrations)
+    if (connection := config.attributes.get("connection")) is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -0,0 +1,106 @@
+"""Add materialized leaderboard counter tables
+
+Revision ID: 3b9d2c7e41a8
+Revises: ea3c3f5c41ce
+Create Date: 2026-10-17 10:12:44.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2c7e41a8'
+down_revision: Union[str, Sequence[str], None] = 'ea3c3f5c41ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    connection = op.get_bind()
+    existing_tables = sa.inspect(connection).get_table_names()
+
+    if 'link_user_counts' not in existing_tables:
+        op.create_table(
+            'link_user_counts',
+            sa.Column('guild_id', sa.BigInteger(), nullable=False),
+            sa.Column('user_id', sa.BigInteger(), nullable=False),
+            sa.Column('link_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('guild_id', 'user_id'),
+        )
+
+    if 'link_hostname_counts' not in existing_tables:
+        op.create_table(
+            'link_hostname_counts',
+            sa.Column('guild_id', sa.BigInteger(), nullable=False),
+            sa.Column('hostname', sa.String(length=255), nullable=False),
+            sa.Column('link_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('guild_id', 'hostname'),
+        )
+
+    if 'link_user_hostname_counts' not in existing_tables:
+        op.create_table(
+            'link_user_hostname_counts',
+            sa.Column('guild_id', sa.BigInteger(), nullable=False),
+            sa.Column('user_id', sa.BigInteger(), nullable=False),
+            sa.Column('hostname', sa.String(length=255), nullable=False),
+            sa.Column('link_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('guild_id', 'user_id', 'hostname'),
+        )
+
+    if 'slap_user_counts' not in existing_tables:
+        op.create_table(
+            'slap_user_counts',
+            sa.Column('guild_id', sa.BigInteger(), nullable=False),
+            sa.Column('user_id', sa.BigInteger(), nullable=False),
+            sa.Column('slapped_count', sa.Integer(), nullable=False),
+            sa.Column('slapper_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('guild_id', 'user_id'),
+        )
+
+    # Backfill the counters from existing history
+    if 'link_entries' in existing_tables:
+        op.execute("DELETE FROM link_user_counts")
+        op.execute("DELETE FROM link_hostname_counts")
+        op.execute("DELETE FROM link_user_hostname_counts")
+        op.execute(
+            "INSERT INTO link_user_counts (guild_id, user_id, link_count) "
+            "SELECT guild_id, user_id, COUNT(id) FROM link_entries "
+            "GROUP BY guild_id, user_id"
+        )
+        op.execute(
+            "INSERT INTO link_hostname_counts (guild_id, hostname, link_count) "
+            "SELECT guild_id, hostname, COUNT(id) FROM link_entries "
+            "GROUP BY guild_id, hostname"
+        )
+        op.execute(
+            "INSERT INTO link_user_hostname_counts "
+            "(guild_id, user_id, hostname, link_count) "
+            "SELECT guild_id, user_id, hostname, COUNT(id) FROM link_entries "
+            "GROUP BY guild_id, user_id, hostname"
+        )
+
+    if 'slap_entries' in existing_tables:
+        op.execute("DELETE FROM slap_user_counts")
+        op.execute(
+            "INSERT INTO slap_user_counts "
+            "(guild_id, user_id, slapped_count, slapper_count) "
+            "SELECT guild_id, user_id, SUM(slapped), SUM(slapper) FROM ("
+            "  SELECT guild_id, slapped_id AS user_id, 1 AS slapped, 0 AS slapper "
+            "  FROM slap_entries"
+            "  UNION ALL"
+            "  SELECT guild_id, slapper_id AS user_id, 0 AS slapped, 1 AS slapper "
+            "  FROM slap_entries"
+            ") GROUP BY guild_id, user_id"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('slap_user_counts')
+    op.drop_table('link_user_hostname_counts')
+    op.drop_table('link_hostname_counts')
+    op.drop_table('link_user_counts')
@@ -0,0 +1,63 @@
+"""Add guild-scoped composite indexes to entry and counter tables
+
+Revision ID: 8e1f6a0c5d27
+Revises: 3b9d2c7e41a8
+Create Date: 2026-10-17 11:02:09.774531
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e1f6a0c5d27'
+down_revision: Union[str, Sequence[str], None] = '3b9d2c7e41a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_link_entries_guild_user', 'link_entries', ['guild_id', 'user_id', 'hostname']),
+    ('ix_link_entries_guild_hostname', 'link_entries', ['guild_id', 'hostname']),
+    ('ix_slap_entries_guild_slapped', 'slap_entries', ['guild_id', 'slapped_id']),
+    ('ix_slap_entries_guild_slapper', 'slap_entries', ['guild_id', 'slapper_id']),
+    ('ix_link_user_counts_guild_count', 'link_user_counts', ['guild_id', 'link_count']),
+    (
+        'ix_link_hostname_counts_guild_count',
+        'link_hostname_counts',
+        ['guild_id', 'link_count'],
+    ),
+    (
+        'ix_slap_user_counts_guild_slapped',
+        'slap_user_counts',
+        ['guild_id', 'slapped_count'],
+    ),
+    (
+        'ix_slap_user_counts_guild_slapper',
+        'slap_user_counts',
+        ['guild_id', 'slapper_count'],
+    ),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = inspector.get_table_names()
+
+    for name, table, columns in INDEXES:
+        if table not in existing_tables:
+            continue
+        if name in {index['name'] for index in inspector.get_indexes(table)}:
+            continue
+        op.create_index(name, table, columns)
+
+    op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -1,7 +1,8 @@
+import asyncio
 import io
 import re
+import time
 
-import httpx
 from discord import (
     Interaction,
     app_commands,
@@ -12,7 +13,6 @@ from openai import AsyncOpenAI
 from openai.types.chat import (
     ChatCompletionUserMessageParam,
     ChatCompletionSystemMessageParam,
-    ChatCompletionAssistantMessageParam,
     ChatCompletion,
 )
 from propcache import cached_property
@@ -22,16 +22,49 @@ from app.constants import FACT_CHECK_SYSTEM_PROMPT, FACT_CHECK_USER_PROMPT
 from app.config.app_settings import settings
 from app.models.ai import FactCheckResponse
 from app.database import db
+from app.utils.ai.context import (
+    PackedContext,
+    context_budget,
+    pack_conversation,
+    summary_messages,
+    token_counter,
+)
+from app.utils.ai.conversation import ConversationMemory, Summary, Turn
+from app.utils.ai.model_catalog import ModelCatalog
+from app.utils.http import http_transports
 from app.utils.interaction_utils import send
+from app.utils.message_editor import StreamedReply
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Older turns gathered before a thread's rolling summary is updated
+SUMMARY_BATCH = 4
+
+# Left in a thread made for /ask when the bot may not delete it
+ASK_FAILED = "❌ Sorry, this question could not be answered."
+
 
 class AI(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
         self.active_interactions = set()  # Simple set to track active interactions
+        self.model_catalog = ModelCatalog(
+            self.list_models, ttl=settings.model_catalog_ttl
+        )
+        self.conversations = ConversationMemory(
+            max_turns=settings.conversation_buffer_turns,
+            max_threads=settings.conversation_buffer_threads,
+        )
+        self._summarizing: dict[int, asyncio.Task] = {}
+
+    async def cog_load(self):
+        # Warm the catalog so the first autocomplete answers from memory
+        self.model_catalog.refresh()
+        # Loading the tokenizer logs which token counter is in use
+        self._tokenizer_load = asyncio.create_task(
+            asyncio.to_thread(token_counter.load)
+        )
 
     @cached_property
     def client(self):
@@ -52,7 +85,8 @@ class AI(Cog):
         return AsyncOpenAI(
             base_url="https://openrouter.ai/api/v1",
             api_key=settings.openrouter_api_key,
-            http_client=httpx.AsyncClient(
+            http_client=http_transports.client(
+                "openrouter",
                 event_hooks=dict(request=[log_request], response=[log_response]),
             ),
         )
@@ -63,27 +97,43 @@ class AI(Cog):
             r"https?://(?:canary\.|ptb\.)?discord(?:app)?\.com/channels/(\d+)/(\d+)/(\d+)"
         )
 
-    async def model_autocomplete(self, interaction: Interaction, current: str):
+    async def list_models(self) -> dict[str, int | None]:
+        """Model ids mapped to their context window, which OpenRouter includes."""
         models = await self.client.models.list()
+        return {m.id: getattr(m, "context_length", None) for m in models.data}
+
+    async def model_autocomplete(self, interaction: Interaction, current: str):
         return [
-            app_commands.Choice(name=m.id, value=m.id)
-            for m in models.data
-            if current.lower() in m.id.lower()
-        ][:25]
+            app_commands.Choice(name=model_id, value=model_id)
+            for model_id in await self.model_catalog.search(current, limit=25)
+        ]
+
+    @staticmethod
+    def in_thread(interaction: discord.Interaction) -> bool:
+        channel = interaction.channel
+        return channel is not None and channel.type in (
+            ChannelType.public_thread,
+            ChannelType.private_thread,
+        )
+
+    async def stored_thread_model(self, interaction: discord.Interaction) -> str | None:
+        """Model already chosen for the thread /ask was run in, if any."""
+        if not self.in_thread(interaction):
+            return None
+        return await db.get_thread_model(interaction.channel.id)
 
     async def obtain_thread(
-        self, interaction: discord.Interaction, question: str, model: str, temperature: float, max_tokens: int
-    ) -> tuple[discord.Thread | discord.TextChannel, str]:
+        self, interaction: discord.Interaction, question: str
+    ) -> tuple[discord.Thread | discord.TextChannel, bool]:
+        """
+        Return the thread /ask was run in, or a new thread for the question,
+        and whether the thread was created for it.
+        """
         if not (channel := interaction.channel):
             raise ValueError("Channel not available")
 
-        if channel.type in (ChannelType.public_thread, ChannelType.private_thread):
-            if stored_model := await db.get_thread_model(channel.id):
-                return channel, stored_model
-
-            if interaction.guild and channel and hasattr(channel, "id"):
-                await db.set_thread_ai_parameters(interaction.guild.id, channel.id, model, temperature, max_tokens)
-            return channel, model
+        if self.in_thread(interaction):
+            return channel, False
 
         thread_name = (
             f"Question: {question[:50]}…"
@@ -97,11 +147,18 @@ class AI(Cog):
             type=ChannelType.public_thread,
             auto_archive_duration=60,
         )
+        self.conversations.start_thread(thread.id)
+        return thread, True
 
-        # Store all AI parameters for this thread
-        if interaction.guild:
-            await db.set_thread_ai_parameters(interaction.guild.id, thread.id, model, temperature, max_tokens)
-        return thread, model
+    async def discard_thread(self, thread: discord.Thread, reason: str) -> None:
+        """Delete a thread created for a question that could not be answered."""
+        self.conversations.forget(thread.id)
+        try:
+            await thread.delete()
+        except discord.HTTPException as e:
+            # Deleting threads needs Manage Threads; say why it is empty instead
+            logger.warning(f"⚠️ Failed to delete thread {thread.id}: {e}")
+            await thread.send(reason)
 
     @app_commands.command(
         name="ask",
@@ -128,21 +185,107 @@ class AI(Cog):
             f"🚀 Hey {interaction.user.mention}, we're sending your request to the AI with your prompt:\n```\n{question}\n```"
         )
 
-        oai_response: ChatCompletion = await self.client.chat.completions.create(
-            model=model,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            messages=[
-                ChatCompletionUserMessageParam(role="user", content=question),
-            ],
+        # Threads keep the model they were started with
+        stored_model = await self.stored_thread_model(interaction)
+        model = stored_model or model
+
+        async def prepare_thread() -> tuple[
+            discord.Thread | discord.TextChannel, bool, StreamedReply
+        ]:
+            thread, created = await self.obtain_thread(interaction, question)
+            reply = StreamedReply(
+                thread,
+                header=(
+                    f"💡 **Question from {interaction.user.mention}:**\n```\n{question}\n```\n\n"
+                    f"🤖 **Answer (using {model}):**\n"
+                ),
+            )
+            steps = [
+                reply.start(),
+                interaction.edit_original_response(
+                    content=f"💬 Answering your question in {thread.mention}..."
+                ),
+            ]
+            # Store all AI parameters for this thread
+            if stored_model is None and interaction.guild:
+                steps.append(
+                    db.set_thread_ai_parameters(
+                        interaction.guild.id, thread.id, model, temperature, max_tokens
+                    )
+                )
+            try:
+                await asyncio.gather(*steps)
+            except Exception:
+                if created:
+                    await self.discard_thread(thread, ASK_FAILED)
+                raise
+            return thread, created, reply
+
+        # The model starts working while the thread is created and saved;
+        # its tokens wait in the response stream until the reply exists.
+        # Neither side is cancelled when the other fails, so the cleanup
+        # below always knows what each one left behind.
+        started = time.perf_counter()
+        first_token_ms = None
+        prepared, stream = await asyncio.gather(
+            prepare_thread(),
+            self.client.chat.completions.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=[
+                    ChatCompletionUserMessageParam(role="user", content=question),
+                ],
+                stream=True,
+            ),
+            return_exceptions=True,
         )
-        ai_text = oai_response.choices[0].message.content
-
-        thread, model = await self.obtain_thread(interaction, question, model, temperature, max_tokens)
+        if errors := [r for r in (prepared, stream) if isinstance(r, BaseException)]:
+            for error in errors:
+                logger.error(f"❌ /ask failed: {error!r}")
+            if not isinstance(stream, BaseException):
+                await stream.close()
+            if not isinstance(prepared, BaseException):
+                thread, created, reply = prepared
+                if created:
+                    # A thread made for a question that got no answer is
+                    # not left behind
+                    await self.discard_thread(thread, ASK_FAILED)
+                else:
+                    await reply.append("❌ The model request failed.")
+                    await reply.finish()
+            raise errors[0]
+
+        thread, _, reply = prepared
+        answer = ""
+        try:
+            async for chunk in stream:
+                if not chunk.choices or not (delta := chunk.choices[0].delta.content):
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                answer += delta
+                await reply.append(delta)
+        except Exception:
+            # Mark a partial answer so it doesn't read as a complete one
+            await stream.close()
+            await reply.append("\n❌ The answer was cut off.")
+            raise
+        finally:
+            await reply.finish()
+            self.conversations.record_question(
+                thread.id, interaction.id, interaction.user.display_name, question
+            )
+            if answer:
+                self.conversations.record_answer(
+                    thread.id, reply.messages[-1].id, answer
+                )
 
-        await thread.send(
-            f"💡 **Question from {interaction.user.mention}:**\n```\n{question}\n```\n\n"
-            f"🤖 **Answer (using {model}):**\n```\n{ai_text}\n```"
+        logger.info(
+            f"⏱️ /ask using {model}: first token after "
+            f"{first_token_ms or 0:.0f} ms, complete after "
+            f"{(time.perf_counter() - started) * 1000:.0f} ms "
+            f"in {len(reply.messages)} message(s)"
         )
 
         await interaction.edit_original_response(
@@ -550,11 +693,35 @@ class AI(Cog):
 
         await original_message.edit(content=None, embed=embed, attachments=[file])
 
+    @Cog.listener()
+    async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent):
+        db.forget_thread(payload.thread_id)
+        self.conversations.forget(payload.thread_id)
+
+    @Cog.listener()
+    async def on_thread_update(self, before: discord.Thread, after: discord.Thread):
+        # Archived threads rarely come back; free their cache entries
+        if after.archived and not before.archived:
+            db.forget_thread(after.id)
+            self.conversations.forget(after.id)
+
+    @Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        if (content := payload.data.get("content")) is not None:
+            self.conversations.edit(payload.channel_id, payload.message_id, content)
+
+    @Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        self.conversations.delete(payload.channel_id, payload.message_id)
+
     @Cog.listener()
     async def on_message(self, message: discord.Message):
         """Handle messages where the bot is mentioned in threads."""
         if message.author.bot:
             return
+
+        if isinstance(message.channel, discord.Thread):
+            self.conversations.record(message)
         
         if not self.bot.user or self.bot.user not in message.mentions:
             return
@@ -575,25 +742,36 @@ class AI(Cog):
                 f"🚀 Hey {message.author.mention}, I'm gathering the conversation history and sending your request to the AI..."
             )
             
-            context_messages = await self._fetch_thread_history(message.channel, message, count=20)
-            conversation_messages = self._format_conversation_for_ai(context_messages, question, message.author)
+            context_turns = await self.conversations.history(
+                message.channel, message, limit=self.conversations.max_turns
+            )
             
             ai_params = await db.get_thread_ai_parameters(message.channel.id) or {}
             model = ai_params.get('model', settings.default_model)
             temperature = ai_params.get('temperature', 0.7)
             max_tokens = ai_params.get('max_tokens', 500)
+
+            context = self._format_conversation_for_ai(
+                message.channel.id, context_turns, question, message.author, model, max_tokens
+            )
+            logger.info(
+                f"🧵 Sending {len(context.messages)} messages ({context.tokens} tokens) "
+                f"to {model}, {len(context.dropped)} older turns left out"
+            )
             
             oai_response: ChatCompletion = await self.client.chat.completions.create(
                 model=model,
                 max_tokens=max_tokens,
                 temperature=temperature,
-                messages=conversation_messages,
+                messages=context.messages,
             )
             ai_text = oai_response.choices[0].message.content
             
-            await message.reply(
+            answer = await message.reply(
                 f"🤖 **AI Response:**\n```\n{ai_text}\n```"
             )
+            self.conversations.record_answer(message.channel.id, answer.id, ai_text)
+            self.schedule_summary(message.channel.id, context.dropped)
             
             await initial_reply.edit(
                 content="✅ Your question has been answered with conversation context!"
@@ -603,88 +781,78 @@ class AI(Cog):
             logger.error(f"Error handling mention in thread: {e}")
             await message.reply(f"❌ Sorry, there was an error processing your request: {str(e)}")
 
-    async def _fetch_thread_history(
-        self,
-        thread: discord.Thread,
-        current_message: discord.Message,
-        count: int = 20
-    ) -> list[discord.Message]:
-        """
-        Fetch message history from a thread before the current message.
-        
-        Args:
-            thread: The thread to fetch messages from
-            current_message: The current message to fetch history before
-            count: Number of messages to fetch
-            
-        Returns:
-            List of messages in chronological order
-        """
-        if count <= 0:
-            return []
-        
-        context_messages = []
-        
-        async for msg in thread.history(limit=count + 10, before=current_message):
-            if msg.author.bot:
-                continue
-                
-            context_messages.append(msg)
-            
-            if len(context_messages) >= count:
-                break
-        
-        context_messages.reverse()
-        return context_messages
-
     def _format_conversation_for_ai(
         self,
-        context_messages: list[discord.Message],
+        thread_id: int,
+        context_turns: list[Turn],
         current_question: str,
-        current_author: discord.User
-    ) -> list[ChatCompletionUserMessageParam | ChatCompletionAssistantMessageParam | ChatCompletionSystemMessageParam]:
+        current_author: discord.User,
+        model: str,
+        max_tokens: int,
+    ) -> PackedContext:
         """
         Format the conversation history and current question for the AI.
         
         Args:
-            context_messages: List of previous messages in chronological order
+            thread_id: The thread the conversation is in
+            context_turns: Previous turns of the thread in chronological order
             current_question: The current question being asked
             current_author: The author of the current question
+            model: The model that will answer
+            max_tokens: Tokens reserved for the answer
             
         Returns:
-            List of properly formatted chat completion messages
+            The chat completion messages, newest turns first to fit the
+            model's token budget, and the turns that were left out
         """
-        messages = []
-        
-        messages.append(ChatCompletionSystemMessageParam(
-            role="system",
-            content="You are a helpful AI assistant in a Discord thread. You have access to the conversation history and should provide relevant, helpful responses based on the context."
-        ))
-        
-        for msg in context_messages:
-            if not (content := msg.content.strip()):
-                continue
-                
-            if len(content) > 1000:
-                content = content[:1000] + "..."
-            
-            if msg.author.bot:
-                messages.append(ChatCompletionAssistantMessageParam(
-                    role="assistant",
-                    content=content
-                ))
-            else:
-                messages.append(ChatCompletionUserMessageParam(
-                    role="user",
-                    content=f"{msg.author.display_name}: {content}"
-                ))
-        
-        messages.append(ChatCompletionUserMessageParam(
-            role="user",
-            content=f"{current_author.display_name}: {current_question}"
-        ))
-        
-        return messages
+        budget = context_budget(
+            self.model_catalog.context_length(model),
+            max_tokens,
+            settings.conversation_context_tokens,
+        )
+        return pack_conversation(
+            "You are a helpful AI assistant in a Discord thread. You have access to the conversation history and should provide relevant, helpful responses based on the context.",
+            context_turns,
+            f"{current_author.display_name}: {current_question}",
+            budget,
+            turn_tokens=settings.conversation_turn_tokens,
+            summary=self.conversations.summary(thread_id),
+        )
+
+    def schedule_summary(self, thread_id: int, dropped: list[Turn]) -> None:
+        """Fold turns that no longer fit in the prompt into the thread's summary."""
+        if not settings.conversation_summary_model or thread_id in self._summarizing:
+            return
+        previous = self.conversations.summary(thread_id)
+        if previous is not None:
+            dropped = [t for t in dropped if t.message_id > previous.through_id]
+        # Summarize in batches rather than once per follow-up
+        if len(dropped) < SUMMARY_BATCH:
+            return
+        task = asyncio.create_task(self.summarize(thread_id, previous, dropped))
+        self._summarizing[thread_id] = task
+        task.add_done_callback(lambda _: self._summarizing.pop(thread_id, None))
+
+    async def summarize(
+        self, thread_id: int, previous: Summary | None, turns: list[Turn]
+    ) -> None:
+        try:
+            response: ChatCompletion = await self.client.chat.completions.create(
+                model=settings.conversation_summary_model,
+                max_tokens=settings.conversation_summary_tokens,
+                temperature=0.2,
+                messages=summary_messages(
+                    previous, turns, turn_tokens=settings.conversation_turn_tokens
+                ),
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to summarize thread {thread_id}: {e}")
+            return
+        if text := (response.choices[0].message.content or "").strip():
+            self.conversations.set_summary(
+                thread_id, Summary(text, turns[-1].message_id)
+            )
+            logger.info(f"📝 Summarized {len(turns)} older turns of thread {thread_id}")
 
     @factcheck.error
     async def factcheck_error(self, ctx: Context, error: Exception):
@@ -43,14 +43,14 @@ class Links(Cog):
                     f"Found URL: {url} from {message.author.name} in {guild_name}"
                 )
 
-                await db.store_link_entry(
+                db.queue_link_entry(
                     guild_id=guild_id,
                     user_id=message.author.id,
                     hostname=hostname,
                     url=url,
                 )
                 self.logger.info(
-                    f"Stored link from {hostname} by user {message.author.name} in {guild_name}"
+                    f"Queued link from {hostname} by user {message.author.name} in {guild_name}"
                 )
             except Exception as e:
                 self.logger.error(f"Error processing URL {url}: {e}", exc_info=True)
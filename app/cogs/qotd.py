@@ -1,7 +1,6 @@
 from typing import Any
 from zoneinfo import ZoneInfo
 
-import httpx
 import asyncio
 from datetime import datetime, time, timezone, timedelta
 import discord
@@ -22,6 +21,7 @@ from app.database import db
 from app.constants import QOTD_SYSTEM_PROMPT
 from app.models.qotd import QOTDResponse
 from app.utils import EmbedBuilder, PollBuilder
+from app.utils.http import http_transports
 from app.utils.logger import get_logger
 
 
@@ -66,7 +66,8 @@ class QOTD(Cog):
         return AsyncOpenAI(
             base_url="https://openrouter.ai/api/v1",
             api_key=settings.openrouter_api_key,
-            http_client=httpx.AsyncClient(
+            http_client=http_transports.client(
+                "openrouter",
                 event_hooks=dict(request=[log_request], response=[log_response]),
             ),
         )
@@ -154,6 +154,33 @@ class Settings(Cog):
 
         await ctx.send(embed=embed, ephemeral=True)
 
+    @settings_group.command(
+        name="rebuildstats",
+        description="Rebuild the link and slap leaderboards from history",
+    )
+    @app_commands.check(is_admin_check)
+    async def rebuild_stats(self, ctx: Context):
+        """Rebuild the materialized leaderboard counters for the guild."""
+        await ctx.defer(ephemeral=True)
+        await db.rebuild_counters(ctx.guild.id)
+
+        embed = EmbedBuilder.success_embed(
+            title="Leaderboards Rebuilt",
+            description="Link and slap statistics have been recounted from history.",
+        ).build()
+
+        await ctx.send(embed=embed, ephemeral=True)
+
+    @rebuild_stats.error
+    async def rebuild_stats_error(self, ctx: Context, error):
+        """Handle errors for rebuild_stats command"""
+        self.logger.error(f"Error in rebuild_stats for guild {ctx.guild.id}: {error}")
+        embed = EmbedBuilder.error_embed(
+            title="Error",
+            description="An error occurred while rebuilding the leaderboards.",
+        ).build()
+        await ctx.send(embed=embed, ephemeral=True)
+
     @hybrid_group(
         name="config",
         description="Manage custom configuration values",
@@ -4,17 +4,6 @@ import traceback
 from functools import cached_property
 
 import discord
-import httpx
-import yfinance as yf
-import matplotlib.pyplot as plt
-from agents import (
-    Agent,
-    set_tracing_disabled,
-    Runner,
-    RunItemStreamEvent,
-    RawResponsesStreamEvent,
-    ModelSettings,
-)
 from discord import app_commands, Interaction
 from discord.ext import commands
 from openai import AsyncOpenAI
@@ -22,49 +11,72 @@ from openai import AsyncOpenAI
 from app.config.app_settings import settings
 from app.models.ai import StreamEventResult
 from app.utils import EmbedBuilder
-from app.utils.ai.tools import (
-    get_price,
-    get_income_statement,
-    get_cash_flow_statement,
-    get_balance_sheet,
-    web_search,
-    get_news,
-    get_company_info,
-    get_price_history,
-    get_key_metrics,
-    get_analyst_recommendations,
-    get_insider_trades,
-    get_institutional_holders,
-    compare_stocks,
-    sandboxed_financial_analysis,
+from app.utils.ai.sandbox import sandbox_pool
+from app.utils.charts import (
+    ChartCache,
+    ChartOptions,
+    ChartRenderer,
+    ChartStyle,
+    series_from_history,
 )
-from agents import set_default_openai_client
-
+from app.utils.http import http_transports
 from app.utils.interaction_utils import send
+from app.utils.lazy_import import lazy_import, resolve
+from app.utils.message_editor import CoalescedEditor
 from app.views.paginated import PaginationView
 from app.utils.logger import get_logger
+from app.utils.market_data import (
+    InfoKind,
+    fetch_quotes,
+    history_store,
+    ticker_info,
+)
 
 logger = get_logger(__name__)
 
+# Market data and the agents SDK are only needed once a /stock command runs,
+# so keep them off the startup path
+agents = lazy_import("agents")
+tools = lazy_import("app.utils.ai.tools")
+
+# Characters of streamed analysis shown in the progress embed
+PROGRESS_PREVIEW_CHARS = 2000
+
 
 class Stocks(commands.GroupCog, name="stock"):
     """Cog providing /stock subcommands for finance data."""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.chart_renderer = ChartRenderer(max_workers=settings.chart_workers)
+        self.chart_cache = ChartCache(maxsize=settings.chart_cache_size)
+
+    async def cog_unload(self):
+        self.chart_renderer.close()
+        sandbox_pool.close()
+
+    @staticmethod
+    def chart_options(style: ChartStyle = "line", volume: bool = False) -> ChartOptions:
+        return ChartOptions(
+            width=settings.chart_width,
+            height=settings.chart_height,
+            dpi=settings.chart_dpi,
+            style=style,
+            volume=volume,
+        )
 
     @cached_property
     def client(self):
         return AsyncOpenAI(
             api_key=settings.openai_api_key,
-            http_client=httpx.AsyncClient(),
+            http_client=http_transports.client("openai"),
         )
 
     @cached_property
     def stock_analysis_agent(self):
-        set_default_openai_client(self.client)
-        set_tracing_disabled(True)
-        return Agent(
+        agents.set_default_openai_client(self.client)
+        agents.set_tracing_disabled(True)
+        return agents.Agent(
             name="Stock Analyst Agent",
             instructions="""
             You are Uncle Ron, a seasoned Wall Street veteran with 30+ years of experience in equity research and fundamental analysis. You have the wisdom of someone who's seen multiple market cycles, the patience to dig deep into financials, and the directness of someone who doesn't sugarcoat bad investments. You speak with authority but remain humble about market uncertainties.
@@ -236,68 +248,66 @@ class Stocks(commands.GroupCog, name="stock"):
 
             Remember: You're Uncle Ron - trustworthy, thorough, and always acting in the best interest of the person asking. Markets are humbling, but rigorous analysis and discipline separate the winners from the losers over time.
             """,
-            model_settings=ModelSettings(tool_choice="auto"),
+            model_settings=agents.ModelSettings(tool_choice="auto"),
             model="o4-mini",
             tools=[
-                get_price,
-                get_income_statement,
-                get_cash_flow_statement,
-                get_balance_sheet,
-                get_company_info,
-                get_price_history,
-                sandboxed_financial_analysis,
-                get_key_metrics,
-                get_analyst_recommendations,
-                get_insider_trades,
-                get_institutional_holders,
-                compare_stocks,
-                web_search,
-                get_news,
+                tools.get_price,
+                tools.get_income_statement,
+                tools.get_cash_flow_statement,
+                tools.get_balance_sheet,
+                tools.get_company_info,
+                tools.get_price_history,
+                tools.sandboxed_financial_analysis,
+                tools.get_key_metrics,
+                tools.get_analyst_recommendations,
+                tools.get_insider_trades,
+                tools.get_institutional_holders,
+                tools.compare_stocks,
+                tools.web_search,
+                tools.get_news,
             ],
         )
 
     @staticmethod
-    async def fetch_ticker_info(symbol: str):
-        """Fetch ticker info asynchronously using yfinance."""
-
-        def get_info():
-            ticker = yf.Ticker(symbol)
-            return ticker.info
-
-        return await asyncio.to_thread(get_info)
+    async def fetch_ticker_info(symbol: str, kind: InfoKind = "quote"):
+        """Fetch ticker info through the shared ticker info cache."""
+        return await ticker_info.get(symbol, kind)
 
     @staticmethod
     async def fetch_history(symbol: str, period: str = "1mo", interval: str = "1d"):
-        """Fetch historical ticker data asynchronously."""
-
-        def get_history():
-            ticker = yf.Ticker(symbol)
-            return ticker.history(period=period, interval=interval)
-
-        return await asyncio.to_thread(get_history)
+        """Fetch historical ticker data through the local history store."""
+        return await history_store.history(symbol, period, interval)
 
     async def generate_price_chart(
-        self, symbol: str, period: str = "1mo", interval: str = "1d"
+        self,
+        symbol: str,
+        period: str = "1mo",
+        interval: str = "1d",
+        style: ChartStyle = "line",
+        volume: bool = False,
     ):
         """Generate and return a BytesIO image buffer of price chart."""
+        symbol = symbol.upper()
+        options = self.chart_options(style, volume)
+        key = ((symbol,), period, interval, options)
+        if png := self.chart_cache.recent(
+            key, history_store.refresh_interval(interval)
+        ):
+            return io.BytesIO(png)
+
         hist = await self.fetch_history(symbol, period, interval)
         if hist.empty:
             return None
 
-        plt.figure(figsize=(8, 4))
-        plt.plot(hist.index, hist["Close"], label=symbol.upper(), linewidth=2)
-        plt.title(f"{symbol.upper()} - {period} ({interval})")
-        plt.xlabel("Date")
-        plt.ylabel("Price (USD)")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png")
-        buf.seek(0)
-        plt.close()
-        return buf
+        digest, png = self.chart_cache.lookup(key, {symbol: hist})
+        if png is None:
+            png = await self.chart_renderer.render(
+                f"{symbol} - {period} ({interval})",
+                [series_from_history(symbol, hist)],
+                options,
+            )
+        self.chart_cache.store(key, digest, png)
+        return io.BytesIO(png)
 
     @app_commands.command(
         name="price", description="Get the current price and change for a stock."
@@ -352,7 +362,7 @@ class Stocks(commands.GroupCog, name="stock"):
     )
     async def info(self, interaction: Interaction, symbol: str):
         await interaction.response.defer(thinking=True)
-        info = await self.fetch_ticker_info(symbol)
+        info = await self.fetch_ticker_info(symbol, "fundamentals")
         name = info.get("longName") or info.get("shortName") or symbol.upper()
         summary = info.get("longBusinessSummary", "No summary available.")
         sector = info.get("sector", "N/A")
@@ -388,6 +398,8 @@ class Stocks(commands.GroupCog, name="stock"):
     @app_commands.describe(
         period="Data period (e.g. 1d, 5d, 1mo, 6mo, 1y, 5y, max)",
         interval="Candle interval (e.g. 1d, 1h, 15m)",
+        style="Draw a line or candlesticks (default: line)",
+        volume="Add a volume panel below the price (default: False)",
     )
     async def chart(
         self,
@@ -395,9 +407,13 @@ class Stocks(commands.GroupCog, name="stock"):
         symbol: str,
         period: str = "1mo",
         interval: str = "1d",
+        style: ChartStyle = "line",
+        volume: bool = False,
     ):
         await interaction.response.defer(thinking=True)
-        chart_buf = await self.generate_price_chart(symbol, period, interval)
+        chart_buf = await self.generate_price_chart(
+            symbol, period, interval, style, volume
+        )
         if not chart_buf:
             embed = EmbedBuilder.error_embed(
                 "No Data", f"No chart data found for `{symbol}`."
@@ -429,33 +445,28 @@ class Stocks(commands.GroupCog, name="stock"):
         self, tickers: list[str], period: str = "1mo", interval: str = "1d"
     ):
         """Generate a comparative chart for multiple tickers."""
+        options = self.chart_options()
+        key = (tuple(tickers), period, interval, options)
+        if png := self.chart_cache.recent(
+            key, history_store.refresh_interval(interval)
+        ):
+            return io.BytesIO(png)
 
-        async def get_history(symbol: str):
-            hist = await self.fetch_history(symbol, period, interval)
-            return symbol, hist
-
-        histories = await asyncio.gather(*[get_history(sym) for sym in tickers])
-        histories = [(sym, hist) for sym, hist in histories if not hist.empty]
+        histories = await history_store.history_many(tickers, period, interval)
+        histories = {sym: hist for sym, hist in histories.items() if not hist.empty}
 
         if not histories:
             return None
 
-        plt.figure(figsize=(8, 4))
-        for symbol, hist in histories:
-            plt.plot(hist.index, hist["Close"], label=symbol.upper(), linewidth=2)
-
-        plt.title(f"Comparison: {', '.join([s for s, _ in histories])}")
-        plt.xlabel("Date")
-        plt.ylabel("Price (USD)")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png")
-        buf.seek(0)
-        plt.close()
-        return buf
+        digest, png = self.chart_cache.lookup(key, histories)
+        if png is None:
+            png = await self.chart_renderer.render(
+                f"Comparison: {', '.join(histories)}",
+                [series_from_history(sym, hist) for sym, hist in histories.items()],
+                options,
+            )
+        self.chart_cache.store(key, digest, png)
+        return io.BytesIO(png)
 
     @app_commands.command(
         name="compare", description="Compare up to 4 tickers’ daily performance."
@@ -490,18 +501,17 @@ class Stocks(commands.GroupCog, name="stock"):
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
 
-        async def fetch(symbol: str):
-            info = await self.fetch_ticker_info(symbol)
-            price = info.get("regularMarketPrice")
-            prev = info.get("regularMarketPreviousClose")
-            if not price or not prev:
-                return None
+        # One bulk download of recent daily bars instead of an .info call per
+        # symbol; prices are last daily closes, not live quotes
+        results = []
+        for symbol, quote in (await fetch_quotes(tickers)).items():
+            if not quote or not quote[1]:
+                continue
+            price, prev = quote
             change = price - prev
-            pct = change / prev * 100
-            return symbol, price, change, pct
+            results.append((symbol, price, change, change / prev * 100))
 
-        results = await asyncio.gather(*[fetch(sym) for sym in tickers])
-        if not (results := [r for r in results if r]):
+        if not results:
             embed = EmbedBuilder.error_embed(
                 "No Data", "No valid stock data retrieved."
             ).build()
@@ -522,6 +532,7 @@ class Stocks(commands.GroupCog, name="stock"):
         embed = (
             EmbedBuilder()
             .title("📊 Stock Comparison")
+            .description("Last close and change from the previous close")
             .color(0x00FFFF)
             .add_fields(fields)
             .footer("Data from Yahoo Finance")
@@ -554,6 +565,7 @@ class Stocks(commands.GroupCog, name="stock"):
         tools_text: str | None = None,
         idx: int | None = None,
         total: int | None = None,
+        cache_text: str | None = None,
     ) -> discord.Embed:
         embed = discord.Embed(
             title=f"📊 Analysis for {symbol}"
@@ -565,8 +577,33 @@ class Stocks(commands.GroupCog, name="stock"):
             embed.add_field(
                 name="🛠 Tools Used", value=f"```{tools_text}```", inline=False
             )
+        if cache_text:
+            embed.set_footer(text=cache_text)
         return embed
 
+    @staticmethod
+    def build_progress_embed(
+        symbol: str, tool_calls: list[str], partial_text: str
+    ) -> discord.Embed:
+        """Status embed shown while the analysis streams."""
+        description = ""
+        if tool_calls:
+            tools_text = "\n".join([f"• {tool}" for tool in tool_calls])
+            description = f"**Tools Used:**\n`{tools_text[-1500:]}`"
+        if partial_text:
+            # Only the tail fits; the full text is posted when the run ends
+            preview = partial_text[-PROGRESS_PREVIEW_CHARS:]
+            if len(preview) < len(partial_text):
+                preview = "…" + preview
+            description += f"\n\n{preview}"
+        return (
+            EmbedBuilder()
+            .title(f"🔄 Analyzing {symbol}...")
+            .description(description.strip() or "Starting analysis...")
+            .color(0xFFAA00)
+            .build()
+        )
+
     async def handle_stream_event(
         self,
         event,
@@ -574,9 +611,9 @@ class Stocks(commands.GroupCog, name="stock"):
         """
         Handle a single stream event and return a structured result.
         """
-        logger.info(f"Handling stream event: {event}")
+        logger.debug(f"Handling stream event: {event}")
 
-        if isinstance(event, RunItemStreamEvent):
+        if isinstance(event, agents.RunItemStreamEvent):
             item = event.item
             if item.type == "tool_call_item" and item.raw_item.id:
                 return StreamEventResult(
@@ -586,9 +623,11 @@ class Stocks(commands.GroupCog, name="stock"):
 
                 )
 
-        elif isinstance(event, RawResponsesStreamEvent):
-            if (delta_value := event.data.delta) is not None:
-                return StreamEventResult(text_delta=delta_value)
+        elif isinstance(event, agents.RawResponsesStreamEvent):
+            # Function-call argument deltas also carry `delta`; only answer
+            # text belongs in the progressive preview
+            if event.data.type == "response.output_text.delta":
+                return StreamEventResult(text_delta=event.data.delta)
 
             try:
                 if (response_obj := event.data.response) is not None and response_obj.output is not None:
@@ -651,37 +690,52 @@ class Stocks(commands.GroupCog, name="stock"):
             .build()
         )
         status_msg = await interaction.followup.send(embed=status_embed)
+        status = CoalescedEditor(status_msg)
 
-        response = Runner.run_streamed(
-            starting_agent=self.stock_analysis_agent, input=prompt, max_turns=15
-        )
+        # First use pays for importing the agents SDK and the tools module.
+        # Sandbox workers boot while the model works through its first turns
+        sandbox_pool.start()
+        await asyncio.to_thread(resolve, tools)
 
         tool_calls = []
         full_response = ""
 
         try:
-            async for event in response.stream_events():
-                result = await self.handle_stream_event(event)
-                logger.info(f"Got result: {result.text_delta}")
-                full_response += result.text_delta
-
-                if result.tool_id:
-                    tool_calls.append(f"{result.tool_name}: {result.tool_args}")
-
-                    tools_text = "\n".join([f"• {tool}" for tool in tool_calls])
-                    status_embed = (
-                        EmbedBuilder()
-                        .title(f"🔄 Analyzing {symbol}...")
-                        .description(f"**Tools Used:**\n`{tools_text}`")
-                        .color(0xFFAA00)
-                        .build()
+            # The run's task is created inside the block and inherits the memo
+            with tools.tool_memo() as memo:
+                response = agents.Runner.run_streamed(
+                    starting_agent=self.stock_analysis_agent,
+                    input=prompt,
+                    max_turns=15,
+                )
+                async for event in response.stream_events():
+                    result = await self.handle_stream_event(event)
+                    logger.debug(f"Got result: {result.text_delta}")
+                    full_response += result.text_delta
+
+                    if result.tool_id:
+                        tool_calls.append(f"{result.tool_name}: {result.tool_args}")
+                    elif not result.text_delta:
+                        continue
+
+                    # Coalesced: at most one edit per interval however fast
+                    # tool calls and text arrive
+                    status.update(
+                        embed=self.build_progress_embed(
+                            symbol, tool_calls, full_response
+                        )
                     )
-                    await status_msg.edit(embed=status_embed)
 
         except Exception as e:
+            await status.cancel()
             await status_msg.delete()
             raise e
 
+        await status.cancel()
+        logger.info(
+            f"✏️ Analysis of {symbol} made {status.edits} status edits "
+            f"for {status.requested} updates"
+        )
         await status_msg.delete()
 
         analysis_text = (
@@ -689,6 +743,12 @@ class Stocks(commands.GroupCog, name="stock"):
         )
 
         tools_text = "\n".join([f"• {tool}" for tool in tool_calls]) or "None"
+        cache_stats = memo.stats
+        logger.info(f"🧠 Tool memo for {symbol} analysis: {cache_stats}")
+        cache_text = (
+            f"{cache_stats['hits']} of {cache_stats['hits'] + cache_stats['misses']} "
+            "tool lookups served from this run's cache"
+        )
 
         if len(analysis_text) > 4000:
             chunks = [
@@ -701,6 +761,7 @@ class Stocks(commands.GroupCog, name="stock"):
                     tools_text=tools_text if idx == len(chunks) - 1 else None,
                     idx=idx + 1,
                     total=len(chunks),
+                    cache_text=cache_text if idx == len(chunks) - 1 else None,
                 )
                 for idx, chunk in enumerate(chunks)
             ]
@@ -709,7 +770,10 @@ class Stocks(commands.GroupCog, name="stock"):
             )
         else:
             embed = self.build_analysis_embed(
-                text=analysis_text, tools_text=tools_text, symbol=symbol
+                text=analysis_text,
+                tools_text=tools_text,
+                symbol=symbol,
+                cache_text=cache_text,
             )
             await interaction.followup.send(embed=embed)
 
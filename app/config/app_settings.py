@@ -19,6 +19,70 @@ class AppSettings(BaseSettings):
     qotd_model: str = "x-ai/grok-beta"
 
     reset_database: bool = False
+    force_sync: bool = False
+    startup_cache_file: str | None = None
+    prewarm_imports: bool = False  # Import lazily loaded modules after on_ready
+
+    # SQLite tuning applied to every new connection
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size: int = -64000  # Negative values are KiB, so 64 MiB
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_temp_store: str = "MEMORY"
+    sqlite_busy_timeout: int = 5000  # Milliseconds
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+
+    # Seconds before cached Yahoo Finance ticker info is refetched
+    ticker_quote_ttl: float = 60
+    ticker_fundamentals_ttl: float = 3600
+    ticker_cache_size: int = 512
+    history_store_dir: str = "data/market_history"
+
+    # Chart rendering process pool and default image geometry
+    chart_workers: int = 2
+    chart_width: float = 8.0  # Inches
+    chart_height: float = 4.0
+    chart_dpi: int = 100
+    chart_cache_size: int = 256  # Rendered images kept in memory
+
+    # Upper bound on the JSON size of each table an agent tool returns
+    tool_output_budget: int = 8000  # Bytes, roughly 2k tokens
+
+    # Pooled transport shared by the OpenAI/OpenRouter clients
+    http2: bool = True
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry: float = 120.0  # Seconds an idle connection is kept
+    http_connect_retries: int = 1
+    http_connect_timeout: float = 5.0
+    http_read_timeout: float = 120.0
+    http_pool_timeout: float = 10.0
+
+    # Minimum seconds between edits of a message updated while streaming
+    stream_edit_interval: float = 1.0
+
+    # Seconds before the /ask model list is refreshed from the provider
+    model_catalog_ttl: float = 3600
+
+    # Recent turns kept in memory per thread, and how many threads to track
+    conversation_buffer_turns: int = 50
+    conversation_buffer_threads: int = 256
+
+    # Prompt tokens of thread history sent with a mention, lowered further
+    # when the model's context window minus the reply is smaller
+    conversation_context_tokens: int = 6000
+    conversation_turn_tokens: int = 1000  # Longer turns are truncated
+    # Model that folds turns which no longer fit into a rolling summary;
+    # summaries are off while unset
+    conversation_summary_model: str | None = None
+    conversation_summary_tokens: int = 400
+
+    # Worker processes that run the agent's financial analysis code
+    sandbox_workers: int = 2
+    sandbox_timeout: float = 10.0  # Wall-clock seconds per analysis
+    sandbox_cpu_seconds: int = 10
+    sandbox_memory_mb: int = 1024
 
     developer_ids: list[int] = []
     log_level: int = logging.INFO
@@ -41,6 +105,18 @@ class AppSettings(BaseSettings):
         return v
 
 
+    @property
+    def sqlite_pragmas(self) -> dict[str, str | int]:
+        """Return the PRAGMA statements to run on each new SQLite connection."""
+        return {
+            "journal_mode": self.sqlite_journal_mode,
+            "synchronous": self.sqlite_synchronous,
+            "cache_size": self.sqlite_cache_size,
+            "mmap_size": self.sqlite_mmap_size,
+            "temp_store": self.sqlite_temp_store,
+            "busy_timeout": self.sqlite_busy_timeout,
+        }
+
     @property
     def cogs(self) -> list[str]:
         """Return a list of cog module import paths, excluding __pycache__ and disabled ones."""
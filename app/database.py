@@ -1,49 +1,97 @@
+import asyncio
 import os
 import shutil
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 from typing import Any
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
     AsyncEngine,
 )
-from sqlalchemy import select, update
+from sqlalchemy import case, delete, event, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 from app.models.database import (
     Base,
     GuildSettings,
     GuildSettingsSchema,
     GuildSettingUpdate,
     ThreadSettings,
+    ThreadSettingsSchema,
 )
-from app.models.links import LinkEntry
-from app.models.slaps import SlapEntry
+from app.models.links import (
+    LinkEntry,
+    LinkHostnameCount,
+    LinkUserCount,
+    LinkUserHostnameCount,
+)
+from app.models.slaps import SlapEntry, SlapUserCount
 from sqlalchemy import func
 
+from app.utils.cache import LRUCache
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# INSERT constructs supporting ON CONFLICT DO UPDATE, by dialect name
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
 
 class Database:
-    def __init__(self, db_url: str | None = None):
+    def __init__(
+        self,
+        db_url: str | None = None,
+        guild_cache_size: int = 1024,
+        thread_cache_size: int = 4096,
+        link_batch_size: int = 100,
+        link_flush_interval: float = 0.5,
+        link_buffer_limit: int = 10_000,
+    ):
         if db_url is None:
             base_dir = Path(__file__).resolve().parent
             db_url = f"sqlite+aiosqlite:///{base_dir / 'guild_settings.db'}"
         self.db_url = db_url
         self.engine: AsyncEngine | None = None
         self.session_factory: async_sessionmaker[AsyncSession] | None = None
+        self.guild_settings_cache: LRUCache[int, GuildSettingsSchema] = LRUCache(
+            maxsize=guild_cache_size
+        )
+        # None marks a thread known to have no settings row
+        self.thread_settings_cache: LRUCache[int, ThreadSettingsSchema | None] = (
+            LRUCache(maxsize=thread_cache_size)
+        )
+
+        # Write-behind buffer for link entries, flushed every
+        # `link_batch_size` rows or `link_flush_interval` seconds. Rows kept
+        # after failed flushes are capped at `link_buffer_limit`.
+        self.link_batch_size = link_batch_size
+        self.link_flush_interval = link_flush_interval
+        self.link_buffer_limit = link_buffer_limit
+        self._link_buffer: list[dict[str, Any]] = []
+        self._link_flush_event = asyncio.Event()
+        self._link_flush_lock = asyncio.Lock()
+        self._link_flush_task: asyncio.Task | None = None
+        self._link_flush_stopping = False
+
+    @property
+    def sqlite_path(self) -> Path | None:
+        """Path of the SQLite database file, or None for other databases."""
+        if not self.db_url.startswith("sqlite"):
+            return None
+        return Path(self.db_url.replace("sqlite+aiosqlite:///", ""))
 
     def backup_and_reset_database(self) -> None:
         """Backup existing database and prepare for fresh creation."""
-        if not self.db_url.startswith("sqlite"):
+        if (db_file := self.sqlite_path) is None:
             logger.warning("⚠️ Database backup only supported for SQLite databases")
             return
 
-        db_path = self.db_url.replace("sqlite+aiosqlite:///", "")
-        db_file = Path(db_path)
-
         if db_file.exists():
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_path = (
@@ -63,34 +111,121 @@ class Database:
         else:
             logger.info("ℹ️ No existing database found to backup")
 
-    async def connect(self, reset_database: bool = False) -> None:
-        """Initialize database connection and create tables if they don't exist."""
+    async def connect(
+        self,
+        reset_database: bool = False,
+        pragmas: dict[str, str | int] | None = None,
+        pool_size: int | None = None,
+        max_overflow: int | None = None,
+        create_tables: bool = True,
+    ) -> None:
+        """Initialize database connection and create tables if they don't exist.
+
+        Args:
+            reset_database: Back up and remove the existing database first
+            pragmas: SQLite PRAGMA name/value pairs run on every new connection
+            pool_size: Number of pooled connections to keep open; ignored
+                unless the engine uses a queue pool
+            max_overflow: Extra connections allowed beyond `pool_size`
+            create_tables: Run `create_all`; skip when the schema is known current
+        """
         try:
             if reset_database:
                 logger.info("🔄 Database reset requested")
                 self.backup_and_reset_database()
 
             logger.info(f"🔌 Connecting to database at {self.db_url}")
-            self.engine = create_async_engine(self.db_url, echo=False)
+            self.guild_settings_cache.clear()
+            self.thread_settings_cache.clear()
+
+            url = make_url(self.db_url)
+            if url.get_backend_name() not in _UPSERT_INSERTS:
+                raise ValueError(
+                    f"Unsupported database backend {url.get_backend_name()!r}; "
+                    f"expected one of: {', '.join(_UPSERT_INSERTS)}"
+                )
+
+            engine_options: dict[str, Any] = {}
+            # Only queue pools are sized; in-memory SQLite gets a StaticPool,
+            # which rejects these options
+            if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+                if pool_size is not None:
+                    engine_options["pool_size"] = pool_size
+                if max_overflow is not None:
+                    engine_options["max_overflow"] = max_overflow
+
+            self.engine = create_async_engine(self.db_url, echo=False, **engine_options)
+            if pragmas and self.engine.dialect.name == "sqlite":
+                self._apply_sqlite_pragmas(pragmas)
             self.session_factory = async_sessionmaker(
                 self.engine, expire_on_commit=False
             )
 
-            async with self.engine.begin() as conn:
-                await conn.run_sync(Base.metadata.create_all)
-                logger.info("✅ Database tables created/verified")
+            if create_tables:
+                async with self.engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                    logger.info("✅ Database tables created/verified")
+
+            if self._link_flush_task is None or self._link_flush_task.done():
+                self._link_flush_stopping = False
+                self._link_flush_task = asyncio.create_task(self._link_flush_loop())
         except Exception as e:
             logger.error(f"❌ Failed to connect to database: {e}")
             raise
 
+    def _apply_sqlite_pragmas(self, pragmas: dict[str, str | int]) -> None:
+        """Run the given PRAGMAs on every connection the engine opens."""
+
+        @event.listens_for(self.engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, _connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+        logger.info(
+            "⚙️ SQLite pragmas: "
+            + ", ".join(f"{name}={value}" for name, value in pragmas.items())
+        )
+
     async def close(self) -> None:
-        """Close the database connection."""
+        """Drain pending writes and close the database connection."""
+        if self._link_flush_task:
+            # Let the flusher finish its batch and run once more, rather than
+            # cancelling it mid-commit
+            self._link_flush_stopping = True
+            self._link_flush_event.set()
+            await self._link_flush_task
+            self._link_flush_task = None
+
         if self.engine:
-            logger.info("🔌 Closing database connection")
-            await self.engine.dispose()
+            try:
+                await self.flush_link_entries()
+            except Exception as e:
+                logger.error(
+                    f"❌ Dropping {len(self._link_buffer)} unwritten link entries: {e}"
+                )
+                raise
+            finally:
+                logger.info("🔌 Closing database connection")
+                await self.engine.dispose()
+
+    @property
+    def guild_settings_cache_stats(self) -> dict[str, Any]:
+        """Hit/miss counters for the in-process guild settings cache."""
+        return self.guild_settings_cache.stats
 
     async def get_guild_settings(self, guild_id: int) -> GuildSettingsSchema:
-        """Get guild settings, creating default if not exists."""
+        """Get guild settings, creating default if not exists.
+
+        Results are served from an in-process cache that the update methods
+        keep current, so repeated lookups never touch the database.
+        """
+        if cached := self.guild_settings_cache.get(guild_id):
+            return cached
+
         if self.session_factory is None:
             raise RuntimeError("Database not connected. Call connect() first.")
         async with self.session_factory() as session:
@@ -103,7 +238,9 @@ class Database:
                 await session.commit()
                 await session.refresh(guild_settings)
 
-            return GuildSettingsSchema.model_validate(guild_settings)
+            schema = GuildSettingsSchema.model_validate(guild_settings)
+            self.guild_settings_cache.set(guild_id, schema)
+            return schema
 
     async def update_guild_setting(
         self, guild_id: int, setting: str, value: Any
@@ -112,13 +249,19 @@ class Database:
         update_data = GuildSettingUpdate(setting=setting, value=value)
 
         async with self.session_factory() as session:
-            await session.execute(
+            result = await session.execute(
                 update(GuildSettings)
                 .where(GuildSettings.guild_id == guild_id)
                 .values(**{update_data.setting: update_data.value})
             )
             await session.commit()
 
+        if result.rowcount and (cached := self.guild_settings_cache.pop(guild_id)):
+            self.guild_settings_cache.set(
+                guild_id,
+                cached.model_copy(update={update_data.setting: update_data.value}),
+            )
+
     async def update_guild_settings_json(
         self, guild_id: int, settings_dict: dict[str, Any]
     ) -> None:
@@ -137,6 +280,10 @@ class Database:
             guild_settings.set_settings_dict(settings_dict)
             await session.commit()
 
+            self.guild_settings_cache.set(
+                guild_id, GuildSettingsSchema.model_validate(guild_settings)
+            )
+
     async def get_guild_settings_json(self, guild_id: int) -> GuildSettings | None:
         """Get the JSON settings for a guild."""
         async with self.session_factory() as session:
@@ -153,20 +300,27 @@ class Database:
         settings = await self.get_guild_settings(guild_id)
         return getattr(settings, feature, False)
 
+    @property
+    def thread_settings_cache_stats(self) -> dict[str, Any]:
+        """Hit/miss counters for the in-process thread settings cache."""
+        return self.thread_settings_cache.stats
+
     async def set_thread_model(self, guild_id: int, thread_id: int, model: str) -> None:
         async with self.session_factory() as session:
-            result = await session.execute(
-                select(ThreadSettings).where(ThreadSettings.thread_id == thread_id)
+            await _upsert_thread_settings(
+                session,
+                [{"thread_id": thread_id, "guild_id": guild_id, "model": model}],
+                update=["model"],
             )
-            if thread := result.scalar_one_or_none():
-                thread.model = model
-            else:
-                thread = ThreadSettings(
-                    thread_id=thread_id, guild_id=guild_id, model=model
-                )
-                session.add(thread)
             await session.commit()
 
+        # The other parameters are unknown for a new row, so only patch an
+        # entry that is already cached
+        if cached := self.thread_settings_cache.pop(thread_id):
+            self.thread_settings_cache.set(
+                thread_id, cached.model_copy(update={"model": model})
+            )
+
     async def set_thread_ai_parameters(
         self, 
         guild_id: int, 
@@ -176,47 +330,60 @@ class Database:
         max_tokens: int = 500
     ) -> None:
         """Set AI parameters for a thread."""
+        schema = ThreadSettingsSchema(
+            thread_id=thread_id,
+            guild_id=guild_id,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
         async with self.session_factory() as session:
-            result = await session.execute(
-                select(ThreadSettings).where(ThreadSettings.thread_id == thread_id)
+            await _upsert_thread_settings(
+                session,
+                [schema.model_dump()],
+                update=["model", "temperature", "max_tokens"],
             )
-            if thread := result.scalar_one_or_none():
-                thread.model = model
-                thread.temperature = temperature
-                thread.max_tokens = max_tokens
-            else:
-                thread = ThreadSettings(
-                    thread_id=thread_id, 
-                    guild_id=guild_id, 
-                    model=model,
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
-                session.add(thread)
             await session.commit()
+        self.thread_settings_cache.set(thread_id, schema)
+
+    async def get_thread_settings(self, thread_id: int) -> ThreadSettingsSchema | None:
+        """Get a thread's settings row, or None if it has none.
+
+        Served from an in-process cache kept current by the setters; absent
+        threads are cached too, so repeated mentions cost no queries.
+        """
+        cached = self.thread_settings_cache.get(thread_id)
+        if cached is not None or thread_id in self.thread_settings_cache:
+            return cached
 
-    async def get_thread_model(self, thread_id: int) -> str | None:
         async with self.session_factory() as session:
             result = await session.execute(
                 select(ThreadSettings).where(ThreadSettings.thread_id == thread_id)
             )
-            if thread := result.scalar_one_or_none():
-                return thread.model
-            return None
+            thread = result.scalar_one_or_none()
+
+        schema = ThreadSettingsSchema.model_validate(thread) if thread else None
+        self.thread_settings_cache.set(thread_id, schema)
+        return schema
+
+    def forget_thread(self, thread_id: int) -> None:
+        """Drop a thread's cached settings, e.g. once it is archived or deleted."""
+        self.thread_settings_cache.pop(thread_id)
+
+    async def get_thread_model(self, thread_id: int) -> str | None:
+        if thread := await self.get_thread_settings(thread_id):
+            return thread.model
+        return None
 
     async def get_thread_ai_parameters(self, thread_id: int) -> dict[str, Any] | None:
         """Get AI parameters for a thread."""
-        async with self.session_factory() as session:
-            result = await session.execute(
-                select(ThreadSettings).where(ThreadSettings.thread_id == thread_id)
-            )
-            if thread := result.scalar_one_or_none():
-                return {
-                    "model": thread.model,
-                    "temperature": thread.temperature or 0.7,
-                    "max_tokens": thread.max_tokens or 500
-                }
-            return None
+        if thread := await self.get_thread_settings(thread_id):
+            return {
+                "model": thread.model,
+                "temperature": thread.temperature or 0.7,
+                "max_tokens": thread.max_tokens or 500
+            }
+        return None
 
     async def get_session(self) -> AsyncSession:
         """Get a database session."""
@@ -227,24 +394,149 @@ class Database:
     async def store_link_entry(
         self, guild_id: int, user_id: int, hostname: str, url: str
     ) -> None:
-        """Store a link entry in the database."""
+        """Store a link entry in the database immediately."""
+        row = dict(guild_id=guild_id, user_id=user_id, hostname=hostname, url=url)
         async with self.session_factory() as session:
-            link_entry = LinkEntry(
-                guild_id=guild_id, user_id=user_id, hostname=hostname, url=url
-            )
-            session.add(link_entry)
+            await self._insert_link_rows(session, [row])
             await session.commit()
 
+    def queue_link_entry(
+        self, guild_id: int, user_id: int, hostname: str, url: str
+    ) -> None:
+        """Buffer a link entry to be written by the background flusher."""
+        self._link_buffer.append(
+            dict(guild_id=guild_id, user_id=user_id, hostname=hostname, url=url)
+        )
+        if len(self._link_buffer) >= self.link_batch_size:
+            self._link_flush_event.set()
+
+    async def flush_link_entries(self) -> int:
+        """Write all buffered link entries in a single transaction.
+
+        Returns:
+            Number of rows written
+        """
+        async with self._link_flush_lock:
+            if not self._link_buffer:
+                return 0
+
+            rows, self._link_buffer = self._link_buffer, []
+            try:
+                async with self.session_factory() as session:
+                    await self._insert_link_rows(session, rows)
+                    await session.commit()
+            except Exception:
+                # Keep the rows for the next flush, ahead of newer entries
+                self._link_buffer[:0] = rows
+                if (excess := len(self._link_buffer) - self.link_buffer_limit) > 0:
+                    del self._link_buffer[:excess]
+                    logger.error(
+                        f"❌ Link buffer is full, dropped the {excess} oldest entries"
+                    )
+                raise
+
+            logger.debug(f"Flushed {len(rows)} link entries")
+            return len(rows)
+
+    async def _link_flush_loop(self) -> None:
+        """Flush buffered link entries when the batch fills or the interval elapses."""
+        failures = 0
+        while not self._link_flush_stopping:
+            try:
+                await asyncio.wait_for(
+                    self._link_flush_event.wait(), timeout=self.link_flush_interval
+                )
+            except TimeoutError:
+                pass
+            self._link_flush_event.clear()
+
+            try:
+                await self.flush_link_entries()
+            except Exception as e:
+                # Warn once per outage rather than on every retry
+                if not failures:
+                    logger.warning(
+                        f"⚠️ Link flush failed, retrying every "
+                        f"{self.link_flush_interval}s: {e}"
+                    )
+                failures += 1
+                continue
+            if failures:
+                logger.info(f"✅ Link flush recovered after {failures} failed attempts")
+                failures = 0
+
+    @staticmethod
+    async def _insert_link_rows(
+        session: AsyncSession, rows: list[dict[str, Any]]
+    ) -> None:
+        """Insert link entry rows as one multi-row INSERT and bump the counters."""
+        await session.execute(insert(LinkEntry).values(rows))
+
+        user_counts = Counter((r["guild_id"], r["user_id"]) for r in rows)
+        hostname_counts = Counter((r["guild_id"], r["hostname"]) for r in rows)
+        user_hostname_counts = Counter(
+            (r["guild_id"], r["user_id"], r["hostname"]) for r in rows
+        )
+
+        await _upsert_counts(
+            session,
+            LinkUserCount,
+            [
+                dict(guild_id=guild_id, user_id=user_id, link_count=count)
+                for (guild_id, user_id), count in user_counts.items()
+            ],
+            ["link_count"],
+        )
+        await _upsert_counts(
+            session,
+            LinkHostnameCount,
+            [
+                dict(guild_id=guild_id, hostname=hostname, link_count=count)
+                for (guild_id, hostname), count in hostname_counts.items()
+            ],
+            ["link_count"],
+        )
+        await _upsert_counts(
+            session,
+            LinkUserHostnameCount,
+            [
+                dict(
+                    guild_id=guild_id,
+                    user_id=user_id,
+                    hostname=hostname,
+                    link_count=count,
+                )
+                for (guild_id, user_id, hostname), count in user_hostname_counts.items()
+            ],
+            ["link_count"],
+        )
+
+    async def rebuild_counters(self, guild_id: int | None = None) -> None:
+        """Rebuild the materialized link and slap counters from the raw entries.
+
+        Args:
+            guild_id: Only rebuild this guild's counters; rebuild all if None
+        """
+        await self.flush_link_entries()
+
+        async with self.session_factory() as session:
+            await _rebuild_counter_tables(session, guild_id)
+            await session.commit()
+
+        logger.info(
+            f"🔁 Rebuilt leaderboard counters for "
+            f"{f'guild {guild_id}' if guild_id is not None else 'all guilds'}"
+        )
+
     async def get_link_leaderboard(
         self, guild_id: int
     ) -> tuple[list[tuple[int, int]], list[tuple[str, int]], int] | None:
         """Get link leaderboard data for a guild."""
         async with self.session_factory() as session:
             user_query = (
-                select(LinkEntry.user_id, func.count(LinkEntry.id).label("link_count"))
-                .where(LinkEntry.guild_id == guild_id)
-                .group_by(LinkEntry.user_id)
-                .order_by(func.count(LinkEntry.id).desc())
+                select(LinkUserCount.user_id, LinkUserCount.link_count)
+                .where(LinkUserCount.guild_id == guild_id)
+                .order_by(LinkUserCount.link_count.desc())
                 .limit(5)
             )
 
@@ -257,10 +549,9 @@ class Database:
                 user_stats = []
 
             domain_query = (
-                select(LinkEntry.hostname, func.count(LinkEntry.id).label("link_count"))
-                .where(LinkEntry.guild_id == guild_id)
-                .group_by(LinkEntry.hostname)
-                .order_by(func.count(LinkEntry.id).desc())
+                select(LinkHostnameCount.hostname, LinkHostnameCount.link_count)
+                .where(LinkHostnameCount.guild_id == guild_id)
+                .order_by(LinkHostnameCount.link_count.desc())
                 .limit(5)
             )
 
@@ -272,8 +563,8 @@ class Database:
             ):
                 domain_stats = []
 
-            total_query = select(func.count(LinkEntry.id)).where(
-                LinkEntry.guild_id == guild_id
+            total_query = select(func.sum(LinkUserCount.link_count)).where(
+                LinkUserCount.guild_id == guild_id
             )
             total_links = (await session.execute(total_query)).scalar() or 0
 
@@ -287,6 +578,9 @@ class Database:
     ) -> tuple[list[tuple[str, int]], int, int]:
         """Get link statistics for a specific user in a guild.
 
+        The user's total and rank are computed in SQL alongside the top domains,
+        so the whole lookup is a single statement.
+
         Returns:
             Tuple containing:
             - List of (hostname, link_count) tuples for user's top domains
@@ -294,42 +588,43 @@ class Database:
             - User's rank in the guild
         """
         async with self.session_factory() as session:
-            # Get user's top domains
-            domain_query = (
-                select(LinkEntry.hostname, func.count(LinkEntry.id).label("link_count"))
-                .where(LinkEntry.guild_id == guild_id, LinkEntry.user_id == user_id)
-                .group_by(LinkEntry.hostname)
-                .order_by(func.count(LinkEntry.id).desc())
-                .limit(5)
+            total_links = (
+                select(LinkUserCount.link_count)
+                .where(
+                    LinkUserCount.guild_id == guild_id,
+                    LinkUserCount.user_id == user_id,
+                )
+                .scalar_subquery()
             )
-
-            domain_stats = [
-                (hostname, count)
-                for hostname, count in (await session.execute(domain_query))
-            ]
-
-            # Get total count for user
-            total_query = select(func.count(LinkEntry.id)).where(
-                LinkEntry.guild_id == guild_id, LinkEntry.user_id == user_id
+            others = aliased(LinkUserCount)
+            user_rank = (
+                select(func.count() + 1)
+                .where(others.guild_id == guild_id, others.link_count > total_links)
+                .scalar_subquery()
             )
-            total_links = (await session.execute(total_query)).scalar() or 0
 
-            # Get user rank
-            rank_query = (
-                select(LinkEntry.user_id, func.count(LinkEntry.id).label("link_count"))
-                .where(LinkEntry.guild_id == guild_id)
-                .group_by(LinkEntry.user_id)
-                .order_by(func.count(LinkEntry.id).desc())
+            stats_query = (
+                select(
+                    LinkUserHostnameCount.hostname,
+                    LinkUserHostnameCount.link_count,
+                    total_links,
+                    user_rank,
+                )
+                .where(
+                    LinkUserHostnameCount.guild_id == guild_id,
+                    LinkUserHostnameCount.user_id == user_id,
+                )
+                .order_by(LinkUserHostnameCount.link_count.desc())
+                .limit(5)
             )
 
-            all_users = [
-                (uid, count) for uid, count in (await session.execute(rank_query))
-            ]
-            user_rank = next(
-                (i + 1 for i, (uid, _) in enumerate(all_users) if uid == user_id), 0
-            )
+            rows = (await session.execute(stats_query)).all()
+            if not rows:
+                return [], 0, 0
 
-            return domain_stats, total_links, user_rank
+            domain_stats = [(hostname, count) for hostname, count, _, _ in rows]
+            _, _, total, rank = rows[0]
+            return domain_stats, total, rank
 
     async def store_slap_entry(
         self, guild_id: int, slapper_id: int, slapped_id: int
@@ -340,6 +635,18 @@ class Database:
                 guild_id=guild_id, slapper_id=slapper_id, slapped_id=slapped_id
             )
             session.add(slap_entry)
+            await _upsert_counts(
+                session,
+                SlapUserCount,
+                [dict(guild_id=guild_id, user_id=slapped_id, slapped_count=1)],
+                ["slapped_count"],
+            )
+            await _upsert_counts(
+                session,
+                SlapUserCount,
+                [dict(guild_id=guild_id, user_id=slapper_id, slapper_count=1)],
+                ["slapper_count"],
+            )
             await session.commit()
 
     async def get_slap_leaderboard(
@@ -355,12 +662,11 @@ class Database:
         async with self.session_factory() as session:
             # Get users who got slapped the most
             slapped_query = (
-                select(
-                    SlapEntry.slapped_id, func.count(SlapEntry.id).label("slap_count")
+                select(SlapUserCount.user_id, SlapUserCount.slapped_count)
+                .where(
+                    SlapUserCount.guild_id == guild_id, SlapUserCount.slapped_count > 0
                 )
-                .where(SlapEntry.guild_id == guild_id)
-                .group_by(SlapEntry.slapped_id)
-                .order_by(func.count(SlapEntry.id).desc())
+                .order_by(SlapUserCount.slapped_count.desc())
                 .limit(10)
             )
 
@@ -370,8 +676,8 @@ class Database:
             ]
 
             # Get total slaps count
-            total_query = select(func.count(SlapEntry.id)).where(
-                SlapEntry.guild_id == guild_id
+            total_query = select(func.sum(SlapUserCount.slapped_count)).where(
+                SlapUserCount.guild_id == guild_id
             )
             total_slaps = (await session.execute(total_query)).scalar() or 0
 
@@ -385,6 +691,9 @@ class Database:
     ) -> tuple[int, int, int, int]:
         """Get slap statistics for a specific user in a guild.
 
+        Ranks are computed in SQL as one plus the number of users with a higher
+        count, so the whole lookup is a single statement.
+
         Returns:
             Tuple containing:
             - Number of times the user got slapped
@@ -393,65 +702,120 @@ class Database:
             - User's rank in slapping others (1 = most active slapper)
         """
         async with self.session_factory() as session:
-            # Get times user got slapped
-            slapped_count_query = select(func.count(SlapEntry.id)).where(
-                SlapEntry.guild_id == guild_id, SlapEntry.slapped_id == user_id
+            others = aliased(SlapUserCount)
+
+            def rank_of(counter: str):
+                own_count = getattr(SlapUserCount, counter)
+                higher = (
+                    select(func.count())
+                    .where(
+                        others.guild_id == SlapUserCount.guild_id,
+                        getattr(others, counter) > own_count,
+                    )
+                    .scalar_subquery()
+                )
+                return case((own_count > 0, higher + 1), else_=0)
+
+            stats_query = select(
+                SlapUserCount.slapped_count,
+                SlapUserCount.slapper_count,
+                rank_of("slapped_count"),
+                rank_of("slapper_count"),
+            ).where(
+                SlapUserCount.guild_id == guild_id, SlapUserCount.user_id == user_id
             )
-            times_slapped = (await session.execute(slapped_count_query)).scalar() or 0
 
-            # Get times user slapped others
-            slapper_count_query = select(func.count(SlapEntry.id)).where(
-                SlapEntry.guild_id == guild_id, SlapEntry.slapper_id == user_id
-            )
-            times_slapping = (await session.execute(slapper_count_query)).scalar() or 0
+            if not (row := (await session.execute(stats_query)).one_or_none()):
+                return 0, 0, 0, 0
 
-            # Get user rank for getting slapped
-            slapped_rank_query = (
-                select(
-                    SlapEntry.slapped_id, func.count(SlapEntry.id).label("slap_count")
-                )
-                .where(SlapEntry.guild_id == guild_id)
-                .group_by(SlapEntry.slapped_id)
-                .order_by(func.count(SlapEntry.id).desc())
-            )
+            times_slapped, times_slapping, slapped_rank, slapper_rank = row
+            return times_slapped, times_slapping, slapped_rank, slapper_rank
 
-            all_slapped_users = [
-                (uid, count)
-                for uid, count in (await session.execute(slapped_rank_query))
-            ]
-            slapped_rank = next(
-                (
-                    i + 1
-                    for i, (uid, _) in enumerate(all_slapped_users)
-                    if uid == user_id
-                ),
-                0,
-            )
 
-            # Get user rank for slapping others
-            slapper_rank_query = (
-                select(
-                    SlapEntry.slapper_id, func.count(SlapEntry.id).label("slap_count")
-                )
-                .where(SlapEntry.guild_id == guild_id)
-                .group_by(SlapEntry.slapper_id)
-                .order_by(func.count(SlapEntry.id).desc())
+async def _upsert_counts(
+    session: AsyncSession,
+    model: type[Base],
+    rows: list[dict[str, Any]],
+    counters: list[str],
+) -> None:
+    """Insert counter rows, adding to the existing counters on conflict."""
+    if not rows:
+        return
+
+    stmt = _upsert_insert(session, model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[c.name for c in model.__table__.primary_key.columns],
+        set_={
+            counter: getattr(model, counter) + getattr(stmt.excluded, counter)
+            for counter in counters
+        },
+    )
+    await session.execute(stmt, rows)
+
+
+def _upsert_insert(session: AsyncSession, model: type[Base]):
+    """An INSERT into `model` that supports `on_conflict_do_update`."""
+    return _UPSERT_INSERTS[session.bind.dialect.name](model)
+
+
+async def _upsert_thread_settings(
+    session: AsyncSession, rows: list[dict[str, Any]], update: list[str]
+) -> None:
+    """Insert thread settings rows, overwriting `update` columns on conflict."""
+    stmt = _upsert_insert(session, ThreadSettings)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ThreadSettings.thread_id],
+        set_={column: getattr(stmt.excluded, column) for column in update},
+    )
+    await session.execute(stmt, rows)
+
+
+async def _rebuild_counter_tables(
+    session: AsyncSession, guild_id: int | None = None
+) -> None:
+    """Replace the materialized counters with aggregates of the raw entries."""
+
+    def scoped(stmt, model):
+        return stmt.where(model.guild_id == guild_id) if guild_id is not None else stmt
+
+    for model in (
+        LinkUserCount,
+        LinkHostnameCount,
+        LinkUserHostnameCount,
+        SlapUserCount,
+    ):
+        await session.execute(scoped(delete(model), model))
+
+    link_count = func.count(LinkEntry.id)
+    for model, columns in (
+        (LinkUserCount, [LinkEntry.guild_id, LinkEntry.user_id]),
+        (LinkHostnameCount, [LinkEntry.guild_id, LinkEntry.hostname]),
+        (
+            LinkUserHostnameCount,
+            [LinkEntry.guild_id, LinkEntry.user_id, LinkEntry.hostname],
+        ),
+    ):
+        await session.execute(
+            insert(model).from_select(
+                [c.key for c in columns] + ["link_count"],
+                scoped(select(*columns, link_count), LinkEntry).group_by(*columns),
             )
-
-            all_slapper_users = [
-                (uid, count)
-                for uid, count in (await session.execute(slapper_rank_query))
-            ]
-            slapper_rank = next(
-                (
-                    i + 1
-                    for i, (uid, _) in enumerate(all_slapper_users)
-                    if uid == user_id
-                ),
-                0,
+        )
+
+    slap_count = func.count(SlapEntry.id)
+    for user_column, counter in (
+        (SlapEntry.slapped_id, "slapped_count"),
+        (SlapEntry.slapper_id, "slapper_count"),
+    ):
+        rows = [
+            {"guild_id": g, "user_id": u, counter: c}
+            for g, u, c in await session.execute(
+                scoped(
+                    select(SlapEntry.guild_id, user_column, slap_count), SlapEntry
+                ).group_by(SlapEntry.guild_id, user_column)
             )
-
-            return times_slapped, times_slapping, slapped_rank, slapper_rank
+        ]
+        await _upsert_counts(session, SlapUserCount, rows, [counter])
 
 
 db = Database(db_url=os.getenv("DB_URL"))
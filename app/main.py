@@ -1,14 +1,27 @@
+import argparse
+import asyncio
 import logging
 import os
-import subprocess
-import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
 from discord.ext import commands
 from discord import Intents
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
 
 from app.config.app_settings import settings
 from app.database import db
+from app.models.database import Base
+from app.utils.http import http_transports
+from app.utils.lazy_import import prewarm_lazy_modules
+from app.utils.startup_cache import StartupCache, fingerprint, schema_fingerprint
 from app.utils.logger import setup_logging, get_logger
 
 log_file = os.getenv("LOG_FILE", None)
@@ -23,63 +36,160 @@ setup_logging(
 
 logger = get_logger(__name__)
 
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Last revision before the counter tables and indexes; databases without a
+# version table match its schema
+UNVERSIONED_BASE = "ea3c3f5c41ce"
+
+
+def _upgrade_database(db_url: str) -> bool:
+    """Upgrade the database to the Alembic head revision.
+
+    Runs synchronously, so call it from a worker thread.
+
+    Returns:
+        True if migrations were applied, False if already at head
+    """
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "alembic"))
+    config.attributes["configure_logger"] = False
+
+    # Alembic runs on a synchronous driver against the same database file
+    url = make_url(db_url)
+    url = url.set(drivername=url.drivername.split("+")[0])
+    head = ScriptDirectory.from_config(config).get_current_head()
+
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.begin() as connection:
+            config.attributes["connection"] = connection
+            current = MigrationContext.configure(connection).get_current_revision()
+            if current == head:
+                logger.info(f"✅ Database already at head revision ({head})")
+                return False
+
+            if current is None:
+                # Unversioned databases were created by create_all from the
+                # models as of UNVERSIONED_BASE; the baseline migrations do
+                # not apply to them. Fill in missing tables, stamp that
+                # revision, and run the later migrations for their backfills
+                # and indexes.
+                logger.info(
+                    f"🆕 Creating schema and stamping revision {UNVERSIONED_BASE}"
+                )
+                Base.metadata.create_all(connection)
+                command.stamp(config, UNVERSIONED_BASE)
+                current = UNVERSIONED_BASE
+
+            logger.info(f"🔄 Migrating database from {current} to {head}")
+            command.upgrade(config, "head")
+            return True
+    finally:
+        engine.dispose()
+
 
 async def run_migrations():
-    """Run Alembic migrations on startup."""
+    """Run Alembic migrations on startup without blocking the event loop."""
     try:
-        # Get the project root directory (where alembic.ini is located)
-        project_root = Path(__file__).parent.parent
-        
         logger.info("🔄 Running database migrations...")
-        
-        # Run alembic upgrade head
-        result = subprocess.run(
-            [sys.executable, "-m", "alembic", "upgrade", "head"],
-            cwd=project_root,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        logger.info("✅ Database migrations completed successfully")
-        if result.stdout:
-            logger.debug(f"Migration output: {result.stdout}")
-            
-    except subprocess.CalledProcessError as e:
-        logger.error(f"❌ Migration failed with exit code {e.returncode}")
-        logger.error(f"Error output: {e.stderr}")
-        logger.error(f"Standard output: {e.stdout}")
-        raise
+        if await asyncio.to_thread(_upgrade_database, db.db_url):
+            logger.info("✅ Database migrations completed successfully")
     except Exception as e:
-        logger.error(f"❌ Unexpected error during migration: {e}")
+        logger.error(f"❌ Migration failed: {e}")
         raise
 
 
+@contextmanager
+def log_duration(phase: str):
+    """Log how long the wrapped startup phase took."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        logger.info(f"⏱️ {phase} took {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def startup_cache_path() -> Path:
+    """Keep the startup cache beside the SQLite file so it shares its volume."""
+    if settings.startup_cache_file:
+        return Path(settings.startup_cache_file)
+    if db.sqlite_path is not None:
+        return db.sqlite_path.parent / "startup_cache.json"
+    return PROJECT_ROOT / "startup_cache.json"
+
+
 class UncleRon(commands.AutoShardedBot):
-    def __init__(self):
+    def __init__(self, force_sync: bool = False):
         super().__init__(
             command_prefix=settings.prefix,
             description="Uncle Ron Bot",
             intents=Intents.all(),
         )
+        self.force_sync = force_sync or settings.force_sync
+        self.startup_cache = StartupCache(startup_cache_path())
+        self.prewarm_task: asyncio.Task | None = None
 
     async def setup_hook(self):
         """This runs before the bot is marked 'ready'."""
-        # Run migrations first
-        await run_migrations()
-        
-        await db.connect(reset_database=settings.reset_database)
-        logger.info("🗄️ Database connected")
-
-        for cog in settings.cogs:
-            try:
-                await self.load_extension(cog)
-                logger.info(f"Loaded {cog}")
-            except Exception as e:
-                logger.exception(f"❌ Failed to load cog: {cog} ({e})")
-
-        await self.tree.sync()
-        logger.info("🌍 Synced all slash commands")
+        with log_duration("Startup"):
+            # Run migrations first
+            with log_duration("Migrations"):
+                await run_migrations()
+
+            schema_key = f"schema:{db.db_url}"
+            schema_hash = schema_fingerprint(Base.metadata)
+            create_tables = (
+                self.force_sync
+                or settings.reset_database
+                or not self.startup_cache.is_current(schema_key, schema_hash)
+            )
+
+            with log_duration("Database connect"):
+                await db.connect(
+                    reset_database=settings.reset_database,
+                    pragmas=settings.sqlite_pragmas,
+                    pool_size=settings.db_pool_size,
+                    max_overflow=settings.db_max_overflow,
+                    create_tables=create_tables,
+                )
+            if create_tables:
+                self.startup_cache.record(schema_key, schema_hash)
+            else:
+                logger.info("🗄️ Schema unchanged; skipped create_all")
+            logger.info("🗄️ Database connected")
+
+            with log_duration("Cog loading"):
+                for cog in settings.cogs:
+                    try:
+                        with log_duration(f"Loading {cog}"):
+                            await self.load_extension(cog)
+                        logger.info(f"Loaded {cog}")
+                    except Exception as e:
+                        logger.exception(f"❌ Failed to load cog: {cog} ({e})")
+
+            tree_key = f"command_tree:{self.application_id}"
+            tree_hash = fingerprint(
+                [command.to_dict(self.tree) for command in self.tree.get_commands()]
+            )
+            if self.force_sync or not self.startup_cache.is_current(
+                tree_key, tree_hash
+            ):
+                with log_duration("Command tree sync"):
+                    await self.tree.sync()
+                self.startup_cache.record(tree_key, tree_hash)
+                logger.info("🌍 Synced all slash commands")
+            else:
+                logger.info("🌍 Slash commands unchanged; skipped sync")
+
+    async def close(self):
+        """Shut down the bot and flush any pending database writes."""
+        if self.prewarm_task is not None:
+            self.prewarm_task.cancel()
+        await super().close()
+        await http_transports.aclose()
+        await db.close()
+        logger.info("🗄️ Database closed")
 
     async def on_ready(self):
         logger.info(f"🤖 Logged in as {self.user} (ID: {self.user.id})")
@@ -91,6 +201,10 @@ class UncleRon(commands.AutoShardedBot):
                 f"🏰 Guild: {guild.name} (ID: {guild.id}) - {guild.member_count} members"
             )
 
+        # on_ready fires again after reconnects, so only prewarm once
+        if settings.prewarm_imports and self.prewarm_task is None:
+            self.prewarm_task = asyncio.create_task(prewarm_lazy_modules())
+
     async def on_guild_join(self, guild):
         logger.info(
             f"➕ Joined guild: {guild.name} (ID: {guild.id}) - {guild.member_count} members"
@@ -105,7 +219,15 @@ class UncleRon(commands.AutoShardedBot):
 
 
 def main():
-    bot = UncleRon()
+    parser = argparse.ArgumentParser(description="Run the Uncle Ron bot.")
+    parser.add_argument(
+        "--force-sync",
+        action="store_true",
+        help="Always run create_all and sync the slash command tree on startup",
+    )
+    args = parser.parse_args()
+
+    bot = UncleRon(force_sync=args.force_sync)
     logger.info("🚀 Starting Uncle Ron Bot")
     bot.run(token=settings.token, log_level=settings.log_level)
 
@@ -115,6 +115,18 @@ class GuildSettingUpdate(BaseModel):
         return v
 
 
+class ThreadSettingsSchema(BaseModel):
+    """Pydantic schema for a thread's AI parameters."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    thread_id: int
+    guild_id: int
+    model: str
+    temperature: float | None = None
+    max_tokens: int | None = None
+
+
 class ThreadSettings(Base):
     __tablename__ = "thread_settings"
 
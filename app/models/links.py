@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any
 
-from sqlalchemy import BigInteger, Integer, String, Text, DateTime, func
+from sqlalchemy import BigInteger, Index, Integer, String, Text, DateTime, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.database import Base
@@ -9,6 +9,10 @@ from app.models.database import Base
 
 class LinkEntry(Base):
     __tablename__ = "link_entries"
+    __table_args__ = (
+        Index("ix_link_entries_guild_user", "guild_id", "user_id", "hostname"),
+        Index("ix_link_entries_guild_hostname", "guild_id", "hostname"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     guild_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
@@ -29,3 +33,40 @@ class LinkEntry(Base):
             "url": self.url,
             "created_at": self.created_at,
         }
+
+
+class LinkUserCount(Base):
+    """Materialized per-guild link count for each user."""
+
+    __tablename__ = "link_user_counts"
+    __table_args__ = (
+        Index("ix_link_user_counts_guild_count", "guild_id", "link_count"),
+    )
+
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    link_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class LinkHostnameCount(Base):
+    """Materialized per-guild link count for each hostname."""
+
+    __tablename__ = "link_hostname_counts"
+    __table_args__ = (
+        Index("ix_link_hostname_counts_guild_count", "guild_id", "link_count"),
+    )
+
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    hostname: Mapped[str] = mapped_column(String(255), primary_key=True)
+    link_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class LinkUserHostnameCount(Base):
+    """Materialized per-guild link count for each (user, hostname) pair."""
+
+    __tablename__ = "link_user_hostname_counts"
+
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    hostname: Mapped[str] = mapped_column(String(255), primary_key=True)
+    link_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any
 
-from sqlalchemy import BigInteger, Integer, DateTime, func
+from sqlalchemy import BigInteger, Index, Integer, DateTime, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.database import Base
@@ -9,6 +9,10 @@ from app.models.database import Base
 
 class SlapEntry(Base):
     __tablename__ = "slap_entries"
+    __table_args__ = (
+        Index("ix_slap_entries_guild_slapped", "guild_id", "slapped_id"),
+        Index("ix_slap_entries_guild_slapper", "guild_id", "slapper_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     guild_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
@@ -31,3 +35,22 @@ class SlapEntry(Base):
             "slapped_id": self.slapped_id,
             "created_at": self.created_at,
         }
+
+
+class SlapUserCount(Base):
+    """Materialized per-guild slap counters for each user."""
+
+    __tablename__ = "slap_user_counts"
+    __table_args__ = (
+        Index("ix_slap_user_counts_guild_slapped", "guild_id", "slapped_count"),
+        Index("ix_slap_user_counts_guild_slapper", "guild_id", "slapper_count"),
+    )
+
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    slapped_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )  # Times the user got slapped
+    slapper_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )  # Times the user slapped others
@@ -0,0 +1,195 @@
+"""Token-budgeted prompts for conversations in threads."""
+
+import math
+import re
+from dataclasses import dataclass
+from functools import cached_property
+
+import tiktoken
+from openai.types.chat import (
+    ChatCompletionAssistantMessageParam,
+    ChatCompletionMessageParam,
+    ChatCompletionSystemMessageParam,
+    ChatCompletionUserMessageParam,
+)
+
+from app.utils.ai.conversation import Summary, Turn
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Role and separator tokens the chat format adds around every message
+MESSAGE_OVERHEAD = 4
+
+# Reply room kept free on top of max_tokens, for tokenizer disagreement
+SAFETY_MARGIN = 256
+
+_PIECES = re.compile(r"\w+|[^\w\s]|\s+")
+
+
+class TokenCounter:
+    """Counts and truncates text in tokens of the `encoding` BPE vocabulary."""
+
+    def __init__(self, encoding: str = "o200k_base"):
+        self.encoding_name = encoding
+
+    @cached_property
+    def _encoding(self) -> tiktoken.Encoding | None:
+        try:
+            encoding = tiktoken.get_encoding(self.encoding_name)
+        except Exception as e:
+            logger.warning(
+                f"⚠️ Failed to load tiktoken {self.encoding_name}, "
+                f"estimating token counts instead: {e}"
+            )
+            return None
+        logger.info(f"📏 Counting tokens with tiktoken {self.encoding_name}")
+        return encoding
+
+    def load(self) -> bool:
+        """
+        Load the encoding now rather than on the first count, as it may be
+        downloaded. Returns whether tiktoken is in use. Blocks; run it in a
+        worker thread.
+        """
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return sum(_estimate(piece) for piece in _PIECES.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut `text` to at most `max_tokens` tokens, marking the cut with "…"."""
+        if self.count(text) <= max_tokens:
+            return text
+        max_tokens = max(0, max_tokens - self.count("…"))
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            # A cut inside a multi-byte character decodes to U+FFFD
+            return self._encoding.decode(tokens[:max_tokens]).rstrip("\ufffd") + "…"
+
+        used = 0
+        for match in _PIECES.finditer(text):
+            used += _estimate(match.group())
+            if used > max_tokens:
+                return text[: match.start()] + "…"
+        return text
+
+
+def _estimate(piece: str) -> int:
+    if piece.isspace():
+        # Runs of whitespace mostly merge into the following token
+        return 1 if "\n" in piece or len(piece) > 1 else 0
+    if piece.isascii():
+        # Common words are one token; long or rare ones split every few letters
+        return max(1, math.ceil(len(piece) / 4))
+    # Non-Latin scripts and emoji take about a token per character or more
+    return len(piece.encode()) // 3 or 1
+
+
+token_counter = TokenCounter()
+
+
+def context_budget(context_length: int | None, max_tokens: int, limit: int) -> int:
+    """Prompt tokens to spend: `limit`, or less if the model's window is smaller."""
+    if context_length is None:
+        return limit
+    return max(0, min(limit, context_length - max_tokens - SAFETY_MARGIN))
+
+
+@dataclass
+class PackedContext:
+    messages: list[ChatCompletionMessageParam]
+    tokens: int
+    # Turns that did not fit, oldest first
+    dropped: list[Turn]
+
+
+def pack_conversation(
+    system_prompt: str,
+    turns: list[Turn],
+    question: str,
+    budget: int,
+    *,
+    turn_tokens: int,
+    summary: Summary | None = None,
+    counter: TokenCounter = token_counter,
+) -> PackedContext:
+    """
+    Build chat messages from the system prompt, `summary`, as many of the
+    most recent `turns` as fit in `budget` tokens, and the question. The
+    system prompt and question are always sent; each turn is truncated to
+    `turn_tokens` first, so one long message cannot crowd out the rest.
+    """
+    head: list[ChatCompletionMessageParam] = [
+        ChatCompletionSystemMessageParam(role="system", content=system_prompt)
+    ]
+    if summary is not None:
+        head.append(
+            ChatCompletionSystemMessageParam(
+                role="system",
+                content=f"Summary of the earlier conversation:\n{summary.text}",
+            )
+        )
+    tail = ChatCompletionUserMessageParam(role="user", content=question)
+
+    used = sum(counter.count(m["content"]) + MESSAGE_OVERHEAD for m in [*head, tail])
+    packed: list[ChatCompletionMessageParam] = []
+    kept = len(turns)
+    for i in range(len(turns) - 1, -1, -1):
+        turn = turns[i]
+        if not (content := turn.content.strip()):
+            kept = i
+            continue
+        content = counter.truncate(content, turn_tokens)
+        if turn.is_bot:
+            message = ChatCompletionAssistantMessageParam(
+                role="assistant", content=content
+            )
+        else:
+            message = ChatCompletionUserMessageParam(
+                role="user", content=f"{turn.author_name}: {content}"
+            )
+        cost = counter.count(message["content"]) + MESSAGE_OVERHEAD
+        if used + cost > budget:
+            break
+        used += cost
+        packed.append(message)
+        kept = i
+
+    packed.reverse()
+    return PackedContext([*head, *packed, tail], used, turns[:kept])
+
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a Discord thread for an assistant "
+    "that can no longer see its older messages. Merge the new messages into "
+    "the summary. Keep names, decisions, facts and open questions; drop "
+    "small talk. Reply with the updated summary only, in a few short "
+    "paragraphs at most."
+)
+
+
+def summary_messages(
+    previous: Summary | None,
+    turns: list[Turn],
+    *,
+    turn_tokens: int,
+    counter: TokenCounter = token_counter,
+) -> list[ChatCompletionMessageParam]:
+    """Messages asking a model to fold `turns` into the `previous` summary."""
+    lines = [
+        f"{'Assistant' if turn.is_bot else turn.author_name}: "
+        f"{counter.truncate(turn.content.strip(), turn_tokens)}"
+        for turn in turns
+    ]
+    current = previous.text if previous is not None else "(empty)"
+    return [
+        ChatCompletionSystemMessageParam(role="system", content=SUMMARY_PROMPT),
+        ChatCompletionUserMessageParam(
+            role="user",
+            content=f"Summary so far:\n{current}\n\nNew messages:\n"
+            + "\n".join(lines),
+        ),
+    ]
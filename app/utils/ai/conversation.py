@@ -0,0 +1,202 @@
+"""Per-thread conversation memory for AI replies in threads."""
+
+import asyncio
+import re
+from collections import deque
+from dataclasses import dataclass
+
+import discord
+
+from app.utils.cache import LRUCache
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# The bot's own answers, as sent by /ask and by thread mentions
+_ANSWER = re.compile(
+    r"🤖 \*\*(?:AI Response|Answer \(using [^)]*\)):\*\*\n```\n(.*)\n```$", re.DOTALL
+)
+# The question an /ask answer is for, quoted above it
+_QUESTION = re.compile(
+    r"💡 \*\*Question from <@!?(\d+)>:\*\*\n```\n(.*?)\n```\n\n🤖", re.DOTALL
+)
+# Messages an answer continues in once it outgrows Discord's length limit
+_CONTINUATION = re.compile(r"```\n(.*)\n```", re.DOTALL)
+
+
+@dataclass(frozen=True, slots=True)
+class Turn:
+    message_id: int
+    author_name: str
+    content: str
+    is_bot: bool
+
+
+@dataclass(frozen=True, slots=True)
+class Summary:
+    text: str
+    # Newest message the summary covers
+    through_id: int
+
+
+class ConversationMemory:
+    """Bounded buffers of recent turns for the `max_threads` most active threads."""
+
+    def __init__(self, max_turns: int = 50, max_threads: int = 256):
+        self.max_turns = max_turns
+        self._threads: LRUCache[int, deque[Turn]] = LRUCache(max_threads)
+        self._summaries: LRUCache[int, Summary] = LRUCache(max_threads)
+        self._backfills: dict[int, asyncio.Task] = {}
+
+    def record(self, message: discord.Message) -> None:
+        """Add a user's message to its thread's buffer, if the thread is tracked."""
+        if message.author.bot or not message.content.strip():
+            return
+        self._append(
+            message.channel.id,
+            Turn(message.id, message.author.display_name, message.content, False),
+        )
+
+    def record_question(
+        self, thread_id: int, interaction_id: int, author_name: str, question: str
+    ) -> None:
+        """Add a slash command's question, which never arrives as a message."""
+        self._append(thread_id, Turn(interaction_id, author_name, question, False))
+
+    def record_answer(self, thread_id: int, message_id: int, text: str) -> None:
+        """Add the bot's answer; `text` is the model output without formatting."""
+        self._append(thread_id, Turn(message_id, "", text, True))
+
+    def start_thread(self, thread_id: int) -> None:
+        """Track a thread the bot just created; it has no history to backfill."""
+        self._threads.set(thread_id, deque(maxlen=self.max_turns))
+
+    def edit(self, thread_id: int, message_id: int, content: str) -> None:
+        if (turns := self._threads.get(thread_id)) is None:
+            return
+        for i, turn in enumerate(turns):
+            if turn.message_id == message_id and not turn.is_bot:
+                turns[i] = Turn(message_id, turn.author_name, content, False)
+                return
+
+    def delete(self, thread_id: int, message_id: int) -> None:
+        if (turns := self._threads.get(thread_id)) is None:
+            return
+        for turn in turns:
+            if turn.message_id == message_id:
+                turns.remove(turn)
+                return
+
+    def forget(self, thread_id: int) -> None:
+        self._threads.pop(thread_id)
+        self._summaries.pop(thread_id)
+
+    def summary(self, thread_id: int) -> Summary | None:
+        return self._summaries.get(thread_id)
+
+    def set_summary(self, thread_id: int, summary: Summary) -> None:
+        self._summaries.set(thread_id, summary)
+
+    async def history(
+        self, thread: discord.Thread, before: discord.Message, limit: int = 20
+    ) -> list[Turn]:
+        """Return up to `limit` turns preceding `before`, oldest first."""
+        # While a backfill runs the thread's buffer only holds live turns
+        if (task := self._backfills.get(thread.id)) is not None:
+            turns = await asyncio.shield(task)
+        elif (turns := self._threads.get(thread.id)) is None:
+            turns = await self._backfill(thread, before)
+        earlier = [turn for turn in turns if turn.message_id < before.id]
+        return earlier[-limit:] if limit > 0 else []
+
+    def _append(self, thread_id: int, turn: Turn) -> None:
+        # Untracked threads are skipped; a backfill will pick the turn up
+        if (turns := self._threads.get(thread_id)) is not None:
+            turns.append(turn)
+
+    async def _backfill(
+        self, thread: discord.Thread, before: discord.Message
+    ) -> deque[Turn]:
+        if (task := self._backfills.get(thread.id)) is None:
+            # Track the thread right away so turns arriving during the fetch
+            # are kept, then merge the fetched history in front of them
+            live: deque[Turn] = deque(maxlen=self.max_turns)
+            self._threads.set(thread.id, live)
+            task = asyncio.create_task(self._fetch(thread, before, live))
+            self._backfills[thread.id] = task
+            task.add_done_callback(lambda _: self._backfills.pop(thread.id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self, thread: discord.Thread, before: discord.Message, live: deque[Turn]
+    ) -> deque[Turn]:
+        try:
+            messages = [
+                message
+                async for message in thread.history(limit=self.max_turns, before=before)
+            ]
+        except discord.HTTPException as e:
+            logger.warning(f"⚠️ Failed to backfill history for thread {thread.id}: {e}")
+            self._threads.pop(thread.id)
+            raise
+
+        # History pages newest first. The message that triggered the
+        # backfill was not tracked yet either.
+        messages.reverse()
+        messages.append(before)
+        fetched = _turns_from_history(messages)
+        by_id = {turn.message_id: turn for turn in fetched}
+        by_id.update((turn.message_id, turn) for turn in live)
+        merged = deque(
+            sorted(by_id.values(), key=lambda turn: turn.message_id),
+            maxlen=self.max_turns,
+        )
+        self._threads.set(thread.id, merged)
+        logger.debug(f"📜 Backfilled {len(fetched)} turns for thread {thread.id}")
+        return merged
+
+    @property
+    def stats(self) -> dict:
+        return {**self._threads.stats, "backfilling": len(self._backfills)}
+
+
+def _turns_from_history(messages: list[discord.Message]) -> list[Turn]:
+    """
+    Rebuild turns from thread messages, oldest first, the way they are
+    recorded live: an /ask answer gives the question it quotes and the
+    answer, joined across its continuation messages and keyed by the last.
+    """
+    turns: list[Turn] = []
+    # Position in `turns` of each bot's latest answer, while it may continue
+    open_answers: dict[int, int] = {}
+    for message in messages:
+        if not message.author.bot:
+            if message.content.strip():
+                name = message.author.display_name
+                turns.append(Turn(message.id, name, message.content, False))
+            continue
+
+        position = open_answers.pop(message.author.id, None)
+        if position is not None and (
+            match := _CONTINUATION.fullmatch(message.content)
+        ):
+            answer = turns[position]
+            turns[position] = Turn(message.id, "", answer.content + match[1], True)
+            open_answers[message.author.id] = position
+            continue
+
+        # Of other bot messages, only the answers themselves are conversation turns
+        if not (answer := _ANSWER.search(message.content)):
+            continue
+        if question := _QUESTION.match(message.content):
+            asker = int(question[1])
+            name = next(
+                (user.display_name for user in message.mentions if user.id == asker),
+                "User",
+            )
+            # Asked with a slash command, so the question has no message of
+            # its own; it sorts just before the answer
+            turns.append(Turn(message.id - 1, name, question[2], False))
+        open_answers[message.author.id] = len(turns)
+        turns.append(Turn(message.id, "", answer[1], True))
+    return turns
@@ -0,0 +1,119 @@
+"""Compact encoding of DataFrames returned by the agent tools."""
+
+import json
+from typing import Any, Literal
+
+from app.utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# How each OHLCV column combines when consecutive bars are merged
+BAR_AGGREGATIONS = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+    "Dividends": "sum",
+    "Stock Splits": "max",
+}
+
+type Reduction = Literal["bucket", "head", "tail"]
+
+
+def encode_table(
+    frame: "pd.DataFrame",
+    *,
+    max_rows: int | None = None,
+    budget_bytes: int | None = None,
+    significant_digits: int = 6,
+    reduce: Reduction = "tail",
+) -> dict[str, Any]:
+    """
+    Encode `frame` as {"index": [...], "columns": {name: [...]}}.
+
+    Rows beyond `max_rows`, or beyond what fits in `budget_bytes` of JSON,
+    are dropped: "bucket" merges consecutive rows (OHLCV-aware), "head" and
+    "tail" keep the first or last rows.
+    """
+    frame = frame.dropna(axis=1, how="all")
+    total_rows = len(frame)
+    rows = min(total_rows, max_rows) if max_rows else total_rows
+
+    while True:
+        encoded = _encode(_reduce(frame, rows, reduce), significant_digits)
+        if rows < total_rows:
+            encoded["total_rows"] = total_rows
+            encoded["reduced_by"] = reduce
+        if budget_bytes is None or rows <= 2:
+            return encoded
+        if len(json.dumps(encoded, separators=(",", ":"), default=str)) <= budget_bytes:
+            return encoded
+        rows //= 2
+
+
+def _reduce(frame: "pd.DataFrame", rows: int, reduce: Reduction) -> "pd.DataFrame":
+    if rows >= len(frame):
+        return frame
+    if reduce == "head":
+        return frame.head(rows)
+    if reduce == "tail":
+        return frame.tail(rows)
+
+    # Merge runs of consecutive rows, keeping the timestamp of each run's
+    # last row so the newest bar stays exact
+    groups = np.arange(len(frame)) * rows // len(frame)
+    aggregations = {
+        column: BAR_AGGREGATIONS.get(column, "last") for column in frame.columns
+    }
+    merged = frame.groupby(groups).agg(aggregations)
+    merged.index = frame.index[np.r_[np.flatnonzero(np.diff(groups)), len(frame) - 1]]
+    return merged
+
+
+def _encode(frame: "pd.DataFrame", significant_digits: int) -> dict[str, Any]:
+    return {
+        "index": _encode_labels(frame.index),
+        "columns": {
+            str(column): _encode_values(frame[column], significant_digits)
+            for column in frame.columns
+        },
+    }
+
+
+def _encode_labels(index: "pd.Index") -> list:
+    if isinstance(index, pd.DatetimeIndex):
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        intraday = (index != index.normalize()).any()
+        return list(index.strftime("%Y-%m-%d %H:%M" if intraday else "%Y-%m-%d"))
+    return [str(label) for label in index]
+
+
+def _encode_values(series: "pd.Series", significant_digits: int) -> list:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return [None if pd.isna(v) else v.strftime("%Y-%m-%d") for v in series]
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return [None if _missing(v) else v for v in series.astype(object)]
+
+    values = series.to_numpy(dtype=float)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return [None] * len(values)
+
+    # One precision per column, from its largest magnitude, so rounding is a
+    # single vectorized call and values print without float noise
+    magnitude = int(np.floor(np.log10(max(np.abs(values[finite]).max(), 1e-12))))
+    decimals = max(0, significant_digits - 1 - magnitude)
+    rounded = np.round(values, decimals)
+    if decimals == 0:
+        return [int(v) if ok else None for v, ok in zip(rounded, finite)]
+    return [float(v) if ok else None for v, ok in zip(rounded, finite)]
+
+
+def _missing(value: Any) -> bool:
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,141 @@
+"""In-memory catalog of the models offered by the AI provider."""
+
+import asyncio
+import bisect
+import re
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Model ids look like "vendor/family-size:variant"; each piece is searchable
+_TOKEN_SPLIT = re.compile(r"[/\-_:.\s]+")
+
+# Match tiers, best first
+_ID_PREFIX, _NAME_PREFIX, _TOKEN_PREFIX = 0, 1, 2
+
+
+@dataclass(frozen=True)
+class _Index:
+    ids: tuple[str, ...]
+    lowered: tuple[str, ...]
+    # Sorted (key, tier, model position) triples for bisecting on a prefix
+    keys: tuple[tuple[str, int, int], ...]
+
+    @classmethod
+    def build(cls, ids: list[str]) -> "_Index":
+        ids = sorted(set(ids), key=lambda i: (len(i), i))
+        lowered = tuple(i.lower() for i in ids)
+        keys = set()
+        for position, model in enumerate(lowered):
+            keys.add((model, _ID_PREFIX, position))
+            name = model.rpartition("/")[2]
+            keys.add((name, _NAME_PREFIX, position))
+            for token in _TOKEN_SPLIT.split(model):
+                if token:
+                    keys.add((token, _TOKEN_PREFIX, position))
+        return cls(tuple(ids), lowered, tuple(sorted(keys)))
+
+    def search(self, query: str, limit: int) -> list[str]:
+        query = query.strip().lower()
+        if not query:
+            return list(self.ids[:limit])
+
+        # Prefix hits come from the sorted keys; rank by tier, then by how
+        # short (usually how canonical) the id is
+        best: dict[int, int] = {}
+        start = bisect.bisect_left(self.keys, (query,))
+        for key, tier, position in self.keys[start:]:
+            if not key.startswith(query):
+                break
+            if tier < best.get(position, _TOKEN_PREFIX + 1):
+                best[position] = tier
+        ranked = sorted(best, key=lambda p: (best[p], p))
+
+        # Then plain substrings
+        if len(ranked) < limit:
+            seen = set(ranked)
+            ranked += [
+                p
+                for p, model in enumerate(self.lowered)
+                if query in model and p not in seen
+            ]
+
+        # Fuzzy subsequence matching ("gpt4o") only when nothing else
+        # matched; for short queries it mostly finds noise
+        if not ranked:
+            pattern = re.compile(".*?".join(map(re.escape, query)))
+            ranked = [p for p, model in enumerate(self.lowered) if pattern.search(model)]
+        return [self.ids[p] for p in ranked[:limit]]
+
+
+class ModelCatalog:
+    """
+    Models from `fetch`, refreshed in the background after `ttl` seconds.
+    `fetch` maps model ids to their context window in tokens, if known.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Mapping[str, int | None]]],
+        ttl: float = 3600,
+        retry_after: float = 60,
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._index = _Index.build([])
+        self._context_lengths: Mapping[str, int | None] = {}
+        self._loaded_at: float | None = None
+        self._attempted_at = float("-inf")
+        self._refresh: asyncio.Task | None = None
+
+    def refresh(self) -> asyncio.Task:
+        """Start a background refresh unless one is already running."""
+        if self._refresh is None or self._refresh.done():
+            self._attempted_at = time.monotonic()
+            self._refresh = asyncio.create_task(self._load())
+        return self._refresh
+
+    async def search(
+        self, query: str, limit: int = 25, wait: float = 2.0
+    ) -> list[str]:
+        """
+        Return up to `limit` model ids matching `query`. Only waits (up to
+        `wait` seconds) for the network while nothing has been loaded yet.
+        """
+        now = time.monotonic()
+        stale = self._loaded_at is None or now - self._loaded_at >= self.ttl
+        if stale and now - self._attempted_at >= self.retry_after:
+            self.refresh()
+        if self._loaded_at is None and self._refresh is not None:
+            try:
+                async with asyncio.timeout(wait):
+                    await asyncio.shield(self._refresh)
+            except Exception:
+                pass
+        return self._index.search(query, limit)
+
+    def context_length(self, model: str) -> int | None:
+        """Context window of `model`, or None if it is unknown or not loaded yet."""
+        return self._context_lengths.get(model)
+
+    async def _load(self) -> None:
+        try:
+            models = await self.fetch()
+        except Exception as e:
+            if self._loaded_at is None:
+                logger.warning(f"⚠️ Failed to load model catalog: {e}")
+            else:
+                logger.warning(
+                    f"⚠️ Failed to refresh model catalog, keeping "
+                    f"{len(self._index.ids)} cached models: {e}"
+                )
+            return
+        self._index = _Index.build(list(models))
+        self._context_lengths = models
+        self._loaded_at = time.monotonic()
+        logger.info(f"📚 Loaded {len(self._index.ids)} models into the catalog")
@@ -0,0 +1,278 @@
+"""Process-isolated execution of agent-supplied financial analysis code."""
+
+import asyncio
+import multiprocessing
+import os
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any
+
+from app.config.app_settings import settings
+from app.utils.lazy_import import lazy_import, resolve
+from app.utils.logger import get_logger
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = get_logger(__name__)
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Statement rows shipped to a worker: float64 values, period dates, line items
+type PackedFrame = tuple["np.ndarray", "np.ndarray", list[str]]
+
+# How long a run may wait for a free worker before giving up
+ACQUIRE_TIMEOUT = 30.0
+
+
+@dataclass(frozen=True)
+class SandboxLimits:
+    timeout: float = 10.0  # Wall-clock seconds per analysis
+    cpu_seconds: int = 10  # CPU seconds per analysis
+    memory_mb: int = 1024  # Address space on top of the imported libraries
+
+
+@dataclass(eq=False)
+class _Worker:
+    process: BaseProcess
+    conn: Connection
+
+
+def pack_frame(statement: "pd.DataFrame | None") -> PackedFrame | None:
+    """
+    Turn a yfinance statement (line items x periods) into plain arrays with
+    one row per period. A float64 block pickles as a single buffer, which is
+    much cheaper to send than a DataFrame of mixed object columns.
+    """
+    if statement is None:
+        return None
+    frame = statement.T.apply(pd.to_numeric, errors="coerce")
+    return (
+        frame.to_numpy(dtype=float),
+        frame.index.to_numpy(),
+        [str(column) for column in frame.columns],
+    )
+
+
+class SandboxPool:
+    """Runs analysis code on a pool of lazily started worker processes."""
+
+    def __init__(self, workers: int = 2, limits: SandboxLimits = SandboxLimits()):
+        self.workers = workers
+        self.limits = limits
+        self._idle: asyncio.Queue[_Worker] | None = None
+        self._live: set[_Worker] = set()
+        self._starting: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Begin starting the workers; call ahead of the first analysis."""
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.workers):
+                self._replace()
+
+    async def run(
+        self, analysis_code: str, frames: dict[str, PackedFrame | None]
+    ) -> dict[str, Any]:
+        """Execute `analysis_code` against `frames` and return its `output`."""
+        self.start()
+        try:
+            async with asyncio.timeout(ACQUIRE_TIMEOUT):
+                worker = await self._idle.get()
+        except TimeoutError:
+            return {"error": "Analysis failed: no sandbox worker is available"}
+
+        healthy = False
+        try:
+            worker.conn.send((analysis_code, frames))
+            if not await asyncio.to_thread(worker.conn.poll, self.limits.timeout):
+                logger.warning(
+                    f"⏱️ Sandbox analysis exceeded {self.limits.timeout}s, killing worker"
+                )
+                return {
+                    "error": f"Analysis timed out after {self.limits.timeout} seconds"
+                }
+            try:
+                result = worker.conn.recv()
+            except EOFError:
+                worker.process.join(timeout=1)
+                logger.warning(
+                    f"⚠️ Sandbox worker died with exit code {worker.process.exitcode}"
+                )
+                return {"error": "Analysis exceeded the sandbox CPU or memory limits"}
+            healthy = True
+            return result
+        finally:
+            if healthy:
+                self._idle.put_nowait(worker)
+            else:
+                self._discard(worker)
+                self._replace()
+
+    def close(self) -> None:
+        for task in self._starting:
+            task.cancel()
+        for worker in list(self._live):
+            self._discard(worker)
+        self._idle = None
+
+    def _replace(self) -> None:
+        task = asyncio.create_task(self._start_worker())
+        self._starting.add(task)
+        task.add_done_callback(self._starting.discard)
+
+    async def _start_worker(self) -> None:
+        idle = self._idle
+        try:
+            worker = await asyncio.to_thread(_spawn_worker, self.limits)
+        except Exception as e:
+            logger.error(f"❌ Failed to start sandbox worker: {e}")
+            return
+        if idle is not self._idle:
+            # The pool was closed while this worker was starting
+            _stop(worker)
+            return
+        self._live.add(worker)
+        idle.put_nowait(worker)
+
+    def _discard(self, worker: _Worker) -> None:
+        self._live.discard(worker)
+        _stop(worker)
+
+
+sandbox_pool = SandboxPool(
+    workers=settings.sandbox_workers,
+    limits=SandboxLimits(
+        timeout=settings.sandbox_timeout,
+        cpu_seconds=settings.sandbox_cpu_seconds,
+        memory_mb=settings.sandbox_memory_mb,
+    ),
+)
+
+
+def _spawn_worker(limits: SandboxLimits) -> _Worker:
+    # Spawn rather than fork: the bot process runs threads (asyncio.to_thread,
+    # aiosqlite) and forking those can deadlock the child
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe()
+    process = context.Process(
+        target=_worker_main, args=(child, limits), name="sandbox", daemon=True
+    )
+    process.start()
+    child.close()
+    try:
+        if parent.recv() != "ready":
+            raise RuntimeError("unexpected handshake")
+    except BaseException:
+        _stop(_Worker(process, parent))
+        raise
+    return _Worker(process, parent)
+
+
+def _stop(worker: _Worker) -> None:
+    worker.conn.close()
+    if worker.process.is_alive():
+        worker.process.kill()
+    worker.process.join(timeout=1)
+
+
+# ============================================================================
+# WORKER SIDE
+# ============================================================================
+
+
+def _worker_main(conn: Connection, limits: SandboxLimits) -> None:
+    # One BLAS thread per worker; the pool is the unit of parallelism
+    for var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = "1"
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+
+    _limit_memory(limits.memory_mb)
+    conn.send("ready")
+
+    while True:
+        try:
+            analysis_code, frames = conn.recv()
+        except EOFError:
+            return
+        _limit_cpu(limits.cpu_seconds)
+        result = run_analysis(analysis_code, frames)
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send({"error": f"Analysis output could not be returned: {e}"})
+
+
+def _limit_memory(memory_mb: int) -> None:
+    if resource is None:
+        return
+    try:
+        with open("/proc/self/statm") as statm:
+            baseline = int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    resource.setrlimit(resource.RLIMIT_AS, (baseline + memory_mb * 2**20, hard))
+
+
+def _limit_cpu(cpu_seconds: int) -> None:
+    # RLIMIT_CPU counts the process's whole lifetime, so move the soft limit
+    # past the time already used; SIGXCPU then ends the worker
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_seconds, hard))
+
+
+def _unpack_frame(packed: PackedFrame | None) -> "pd.DataFrame":
+    if packed is None:
+        return pd.DataFrame()
+    values, index, columns = packed
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def run_analysis(
+    analysis_code: str, frames: dict[str, PackedFrame | None]
+) -> dict[str, Any]:
+    """
+    Run `analysis_code` with `income`, `balance` and `cash` DataFrames and
+    restricted builtins. Results must be assigned to a dict named `output`.
+    """
+    safe_builtins = {
+        "abs": abs,
+        "min": min,
+        "max": max,
+        "sum": sum,
+        "len": len,
+        "round": round,
+    }
+
+    safe_locals = {
+        "income": _unpack_frame(frames.get("income")),
+        "balance": _unpack_frame(frames.get("balance")),
+        "cash": _unpack_frame(frames.get("cash")),
+        "np": resolve(np),
+        "pd": resolve(pd),
+        "output": {},
+    }
+
+    try:
+        # Execute code safely
+        exec(analysis_code, {"__builtins__": safe_builtins}, safe_locals)
+        output = safe_locals.get("output", {})
+        # Ensure we return a dict[str, Any]
+        result: dict[str, Any] = {}
+        if output is not None and isinstance(output, dict):
+            for k, v in output.items():
+                if isinstance(k, str):
+                    result[k] = v
+        return result
+    except Exception as e:
+        return {"error": f"Analysis failed: {e}"}
@@ -1,121 +1,187 @@
 import asyncio
+import functools
+import inspect
+from collections.abc import Awaitable, Callable, Hashable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Any
 
-import numpy as np
-import pandas as pd
-import yfinance as yf
 from agents import function_tool
-from duckduckgo_search import DDGS
 
+from app.config.app_settings import settings
+from app.utils.ai.encoding import encode_table
+from app.utils.ai.sandbox import pack_frame, sandbox_pool
+from app.utils.lazy_import import lazy_import
 from app.utils.logger import get_logger
+from app.utils.market_data import history_store, ticker_info
 
 logger = get_logger(__name__)
 
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+yf = lazy_import("yfinance")
+duckduckgo_search = lazy_import("duckduckgo_search")
 
-def _safe_financial_analysis(
-    analysis_code: str,
-    *,
-    income_statement: dict[str, Any] | None = None,
-    balance_sheet: dict[str, Any] | None = None,
-    cash_flow: dict[str, Any] | None = None,
-) -> dict[str, Any]:
-    """
-    Run dynamic financial analysis safely using a sandboxed environment.
 
-    Args:
-        income_statement: dict from get_income_statement
-        balance_sheet: dict from get_balance_sheet
-        cash_flow: dict from get_cash_flow_statement
-        analysis_code: Python code string to execute using `income`, `balance`, `cash`
-                       Must assign results to a variable named `output`.
-    Returns:
-        dict with results or error
+# ============================================================================
+# RUN-SCOPED MEMOIZATION
+# ============================================================================
+
+
+class ToolMemo:
+    """
+    Results of the tool calls made during one agent run, keyed by tool and
+    arguments. Concurrent identical calls share one in-flight task; failed
+    calls are forgotten so the agent can retry them. Only counted calls
+    (the tools themselves, not the data loads they share) feed the stats.
     """
 
-    income = (
-        pd.DataFrame(income_statement["data"]).T if income_statement else pd.DataFrame()
-    )
-    balance = pd.DataFrame(balance_sheet["data"]).T if balance_sheet else pd.DataFrame()
-    cash = pd.DataFrame(cash_flow["data"]).T if cash_flow else pd.DataFrame()
-
-    income = income.apply(pd.to_numeric, errors="coerce")
-    balance = balance.apply(pd.to_numeric, errors="coerce")
-    cash = cash.apply(pd.to_numeric, errors="coerce")
-
-    safe_builtins = {
-        "abs": abs,
-        "min": min,
-        "max": max,
-        "sum": sum,
-        "len": len,
-        "round": round,
-    }
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._results: dict[Hashable, asyncio.Task] = {}
+
+    async def call[T](
+        self, key: Hashable, factory: Callable[[], Awaitable[T]], counted: bool = True
+    ) -> T:
+        if (task := self._results.get(key)) is None:
+            task = asyncio.ensure_future(factory())
+            task.add_done_callback(functools.partial(self._forget_failure, key))
+            self._results[key] = task
+            if counted:
+                self.misses += 1
+        elif counted:
+            self.hits += 1
+        return await asyncio.shield(task)
+
+    def _forget_failure(self, key: Hashable, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is not None:
+            if self._results.get(key) is task:
+                del self._results[key]
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._results),
+        }
 
-    safe_locals = {
-        "income": income,
-        "balance": balance,
-        "cash": cash,
-        "np": np,
-        "pd": pd,
-        "output": {},
-    }
 
+_run_memo: ContextVar[ToolMemo | None] = ContextVar("tool_run_memo", default=None)
+
+
+@contextmanager
+def tool_memo() -> Iterator[ToolMemo]:
+    """
+    Memoize tool calls for the duration of the block. The agents SDK runs
+    tools in tasks created inside the block, which inherit the memo.
+    """
+    memo = ToolMemo()
+    token = _run_memo.set(memo)
     try:
-        # Execute code safely
-        exec(analysis_code, {"__builtins__": safe_builtins}, safe_locals)
-        output = safe_locals.get("output", {})
-        # Ensure we return a dict[str, Any]
-        result: dict[str, Any] = {}
-        if output is not None and isinstance(output, dict):
-            for k, v in output.items():
-                if isinstance(k, str):
-                    result[k] = v
-        return result
-    except Exception as e:
-        return {"error": f"Analysis failed: {e}"}
-
-
-def _fetch_price(ticker: str, period: str = "1d"):
-    """Fetch current or recent price data."""
-    stock = yf.Ticker(ticker)
-    data = stock.history(period=period)
+        yield memo
+    finally:
+        _run_memo.reset(token)
+
+
+async def _memo_call[T](
+    key: Hashable, factory: Callable[[], Awaitable[T]], counted: bool = True
+) -> T:
+    if (memo := _run_memo.get()) is None:
+        return await factory()
+    return await memo.call(key, factory, counted)
+
+
+def _memo_key_part(name: str, value: Any) -> Hashable:
+    if isinstance(value, list):
+        return tuple(_memo_key_part(name, v) for v in value)
+    if isinstance(value, str) and name in ("ticker", "tickers"):
+        return value.upper()
+    return value
+
+
+def _memoized(func):
+    """Share results of `func` between identical calls within one run."""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__name__,) + tuple(
+            (name, _memo_key_part(name, value))
+            for name, value in bound.arguments.items()
+        )
+        return await _memo_call(key, lambda: func(*args, **kwargs))
+
+    return wrapper
+
+
+def _price(ticker: str, period: str, data: "pd.DataFrame"):
+    """Summarize current or recent price data."""
     if data.empty:
         return {"error": f"Could not fetch price for {ticker}"}
     price = data["Close"].iloc[-1]
     return {"ticker": ticker, "price": round(float(price), 2), "period": period}
 
 
-def _fetch_income_statement(ticker: str, period: str = "annual"):
-    """Fetch income statement - annual or quarterly."""
-    stock = yf.Ticker(ticker)
-    df = stock.income_stmt if period == "annual" else stock.quarterly_income_stmt
-    if df is None or df.empty:
-        return {"error": f"Could not fetch {period} income statement for {ticker}"}
-    return {"ticker": ticker, "period": period, "data": df.to_dict()}
+# yfinance attribute names for each statement, annual then quarterly
+_STATEMENTS = {
+    "income statement": ("income_stmt", "quarterly_income_stmt"),
+    "cash flow statement": ("cashflow", "quarterly_cashflow"),
+    "balance sheet": ("balance_sheet", "quarterly_balance_sheet"),
+}
 
 
-def _fetch_cash_flow(ticker: str, period: str = "annual") -> dict[str, Any]:
-    """Fetch cash flow statement - annual or quarterly."""
-    stock = yf.Ticker(ticker)
-    df = stock.cashflow if period == "annual" else stock.quarterly_cashflow
-    if df is None or df.empty:
-        return {"error": f"Could not fetch {period} cash flow statement for {ticker}"}
-    return {"ticker": ticker, "period": period, "data": df.to_dict()}
+def _fetch_statement(
+    ticker: str, statement: str, period: str = "annual"
+) -> "pd.DataFrame | None":
+    """Fetch a raw financial statement frame (line items x periods)."""
+    annual, quarterly = _STATEMENTS[statement]
+    df = getattr(yf.Ticker(ticker), annual if period == "annual" else quarterly)
+    return None if df is None or df.empty else df
 
 
-def _fetch_balance_sheet(ticker: str, period: str = "annual"):
-    """Fetch balance sheet - annual or quarterly."""
-    stock = yf.Ticker(ticker)
-    df = stock.balance_sheet if period == "annual" else stock.quarterly_balance_sheet
-    if df is None or df.empty:
-        return {"error": f"Could not fetch {period} balance sheet for {ticker}"}
-    return {"ticker": ticker, "period": period, "data": df.to_dict()}
+def _statement_result(
+    ticker: str, statement: str, period: str, df: "pd.DataFrame | None"
+) -> dict[str, Any]:
+    if df is None:
+        return {"error": f"Could not fetch {period} {statement} for {ticker}"}
+    # One row per period and one column per line item reads best columnar
+    return {
+        "ticker": ticker,
+        "period": period,
+        "data": encode_table(
+            df.T.sort_index(), budget_bytes=settings.tool_output_budget
+        ),
+    }
 
 
-def _fetch_company_info(ticker: str):
-    """Fetch comprehensive company information."""
-    stock = yf.Ticker(ticker)
-    info = stock.info
+async def _load_statement(
+    ticker: str, statement: str, period: str = "annual"
+) -> "pd.DataFrame | None":
+    """
+    Fetch a raw statement once per run; the statement tools and the
+    sandbox's data loader share the result. These loads are not tool
+    lookups, so they are left out of the memo's stats.
+    """
+    return await _memo_call(
+        ("statement", ticker, statement, period),
+        lambda: asyncio.to_thread(_fetch_statement, ticker, statement, period),
+        counted=False,
+    )
+
+
+async def _statement_tool(ticker: str, statement: str, period: str) -> dict[str, Any]:
+    df = await _load_statement(ticker, statement, period)
+    return await asyncio.to_thread(_statement_result, ticker, statement, period, df)
+
+
+def _company_info(ticker: str, info: dict[str, Any]):
+    """Summarize comprehensive company information."""
     if not info:
         return {"error": f"Could not fetch info for {ticker}"}
 
@@ -141,39 +207,41 @@ def _fetch_company_info(ticker: str):
     }
 
 
-def _fetch_price_history(ticker: str, period: str = "1y", interval: str = "1d"):
-    """Fetch historical price data with flexible periods."""
-    stock = yf.Ticker(ticker)
-    df = stock.history(period=period, interval=interval)
+def _price_history(ticker: str, period: str, interval: str, df: "pd.DataFrame"):
+    """Summarize historical price data with flexible periods."""
     if df.empty:
         return {"error": f"Could not fetch price history for {ticker}"}
 
+    close = df["Close"].to_numpy(dtype=float)
+    returns = np.diff(close) / close[:-1]
     return {
         "ticker": ticker,
         "period": period,
         "interval": interval,
-        "data": df.to_dict(),
+        # Long periods are merged into fewer OHLCV bars to fit the budget
+        "data": encode_table(
+            df[["Open", "High", "Low", "Close", "Volume"]],
+            budget_bytes=settings.tool_output_budget,
+            reduce="bucket",
+        ),
         "summary": {
             "start_date": str(df.index[0]),
             "end_date": str(df.index[-1]),
-            "start_price": float(df["Close"].iloc[0]),
-            "end_price": float(df["Close"].iloc[-1]),
-            "high": float(df["High"].max()),
-            "low": float(df["Low"].min()),
-            "avg_volume": float(df["Volume"].mean()),
-            "return_pct": round(
-                ((df["Close"].iloc[-1] / df["Close"].iloc[0]) - 1) * 100, 2
-            ),
-            "volatility": round(float(df["Close"].pct_change().std() * 100), 2),
+            "start_price": round(float(close[0]), 4),
+            "end_price": round(float(close[-1]), 4),
+            "high": round(float(df["High"].to_numpy().max()), 4),
+            "low": round(float(df["Low"].to_numpy().min()), 4),
+            "avg_volume": round(float(df["Volume"].to_numpy().mean())),
+            "return_pct": round(float(close[-1] / close[0] - 1) * 100, 2),
+            "volatility": round(float(returns.std(ddof=1)) * 100, 2)
+            if len(returns) > 1
+            else None,
         },
     }
 
 
-def _fetch_key_metrics(ticker: str):
-    """Fetch pre-calculated financial metrics and ratios."""
-    stock = yf.Ticker(ticker)
-    info = stock.info
-
+def _key_metrics(ticker: str, info: dict[str, Any]):
+    """Summarize pre-calculated financial metrics and ratios."""
     return {
         "ticker": ticker,
         "valuation": {
@@ -217,11 +285,10 @@ def _fetch_key_metrics(ticker: str):
     }
 
 
-def _fetch_analyst_recommendations(ticker: str):
+def _fetch_analyst_recommendations(ticker: str, info: dict[str, Any]):
     """Fetch analyst recommendations and price targets."""
     stock = yf.Ticker(ticker)
     recommendations = stock.recommendations
-    info = stock.info
 
     result = {
         "ticker": ticker,
@@ -237,8 +304,11 @@ def _fetch_analyst_recommendations(ticker: str):
     }
 
     if recommendations is not None and not recommendations.empty:
-        recent = recommendations.tail(20)
-        result["recent_recommendations"] = recent.to_dict()
+        result["recent_recommendations"] = encode_table(
+            recommendations,
+            max_rows=20,
+            budget_bytes=settings.tool_output_budget,
+        )
 
     return result
 
@@ -251,11 +321,14 @@ def _fetch_insider_trades(ticker: str):
     if insider_trades is None or insider_trades.empty:
         return {"error": f"No insider trading data available for {ticker}"}
 
-    recent = insider_trades.head(30)
-
     return {
         "ticker": ticker,
-        "recent_trades": recent.to_dict(),
+        "recent_trades": encode_table(
+            insider_trades,
+            max_rows=30,
+            budget_bytes=settings.tool_output_budget,
+            reduce="head",
+        ),
         "trade_count": len(insider_trades),
     }
 
@@ -269,15 +342,22 @@ def _fetch_institutional_holders(ticker: str):
     result = {"ticker": ticker}
 
     if institutional is not None and not institutional.empty:
-        result["top_institutions"] = institutional.head(15).to_dict()
+        result["top_institutions"] = encode_table(
+            institutional,
+            max_rows=15,
+            budget_bytes=settings.tool_output_budget,
+            reduce="head",
+        )
 
     if major is not None and not major.empty:
-        result["ownership_summary"] = major.to_dict()
+        result["ownership_summary"] = encode_table(major)
 
     return result if len(result) > 1 else {"error": f"No holder data for {ticker}"}
 
 
-def _compare_stocks(tickers: list[str], metrics: list[str] | None = None):
+def _compare_stocks(
+    infos: dict[str, dict[str, Any]], metrics: list[str] | None = None
+):
     """Compare key metrics across multiple stocks."""
     if metrics is None:
         metrics = [
@@ -297,10 +377,7 @@ def _compare_stocks(tickers: list[str], metrics: list[str] | None = None):
         ]
 
     comparison = {}
-    for ticker in tickers:
-        ticker = ticker.upper()
-        stock = yf.Ticker(ticker)
-        info = stock.info
+    for ticker, info in infos.items():
         comparison[ticker] = {
             "company_name": info.get("longName"),
             "sector": info.get("sector"),
@@ -313,7 +390,7 @@ def _compare_stocks(tickers: list[str], metrics: list[str] | None = None):
 def _web_search(query: str, max_results: int = 5):
     """Perform a web search."""
     results = []
-    with DDGS() as ddgs:
+    with duckduckgo_search.DDGS() as ddgs:
         for r in ddgs.text(query, max_results=max_results):
             results.append(
                 {"title": r["title"], "url": r["href"], "snippet": r["body"]}
@@ -324,7 +401,7 @@ def _web_search(query: str, max_results: int = 5):
 def _search_news(query: str, max_results: int = 5):
     """Search for recent news articles."""
     results = []
-    with DDGS() as ddgs:
+    with duckduckgo_search.DDGS() as ddgs:
         for r in ddgs.news(query, max_results=max_results):
             results.append(
                 {
@@ -344,6 +421,7 @@ def _search_news(query: str, max_results: int = 5):
 
 
 @function_tool
+@_memoized
 async def get_price(ticker: str, period: str = "1d") -> dict:
     """
     Get the latest price for a given stock ticker.
@@ -353,10 +431,11 @@ async def get_price(ticker: str, period: str = "1d") -> dict:
         period: Time period for price data. Options: '1d', '5d', '1mo', '3mo', '6mo', '1y'
     """
     ticker = ticker.upper()
-    return await asyncio.to_thread(_fetch_price, ticker, period)
+    return _price(ticker, period, await history_store.history(ticker, period, "1d"))
 
 
 @function_tool
+@_memoized
 async def get_income_statement(ticker: str, period: str = "annual") -> dict:
     """
     Fetch income statement for the ticker.
@@ -366,10 +445,11 @@ async def get_income_statement(ticker: str, period: str = "annual") -> dict:
         period: 'annual' for yearly data or 'quarterly' for quarterly data
     """
     ticker = ticker.upper()
-    return await asyncio.to_thread(_fetch_income_statement, ticker, period)
+    return await _statement_tool(ticker, "income statement", period)
 
 
 @function_tool
+@_memoized
 async def get_cash_flow_statement(ticker: str, period: str = "annual") -> dict:
     """
     Fetch cash flow statement for the ticker.
@@ -379,10 +459,11 @@ async def get_cash_flow_statement(ticker: str, period: str = "annual") -> dict:
         period: 'annual' for yearly data or 'quarterly' for quarterly data
     """
     ticker = ticker.upper()
-    return await asyncio.to_thread(_fetch_cash_flow, ticker, period)
+    return await _statement_tool(ticker, "cash flow statement", period)
 
 
 @function_tool
+@_memoized
 async def get_balance_sheet(ticker: str, period: str = "annual") -> dict:
     """
     Fetch balance sheet for the ticker.
@@ -392,10 +473,11 @@ async def get_balance_sheet(ticker: str, period: str = "annual") -> dict:
         period: 'annual' for yearly data or 'quarterly' for quarterly data
     """
     ticker = ticker.upper()
-    return await asyncio.to_thread(_fetch_balance_sheet, ticker, period)
+    return await _statement_tool(ticker, "balance sheet", period)
 
 
 @function_tool
+@_memoized
 async def get_company_info(ticker: str) -> dict:
     """
     Get comprehensive company information including sector, industry, market cap,
@@ -405,10 +487,11 @@ async def get_company_info(ticker: str) -> dict:
         ticker: Stock ticker symbol
     """
     ticker = ticker.upper()
-    return await asyncio.to_thread(_fetch_company_info, ticker)
+    return _company_info(ticker, await ticker_info.get(ticker, "fundamentals"))
 
 
 @function_tool
+@_memoized
 async def get_price_history(
     ticker: str, period: str = "1y", interval: str = "1d"
 ) -> dict:
@@ -422,10 +505,12 @@ async def get_price_history(
                   Note: Intraday data (1m-1h) only available for last 60 days
     """
     ticker = ticker.upper()
-    return await asyncio.to_thread(_fetch_price_history, ticker, period, interval)
+    df = await history_store.history(ticker, period, interval)
+    return await asyncio.to_thread(_price_history, ticker, period, interval, df)
 
 
 @function_tool
+@_memoized
 async def get_key_metrics(ticker: str) -> dict:
     """
     Get key financial metrics and ratios pre-calculated by yfinance.
@@ -435,10 +520,11 @@ async def get_key_metrics(ticker: str) -> dict:
         ticker: Stock ticker symbol
     """
     ticker = ticker.upper()
-    return await asyncio.to_thread(_fetch_key_metrics, ticker)
+    return _key_metrics(ticker, await ticker_info.get(ticker, "fundamentals"))
 
 
 @function_tool
+@_memoized
 async def get_analyst_recommendations(ticker: str) -> dict:
     """
     Get analyst recommendations and price targets for the stock.
@@ -447,10 +533,12 @@ async def get_analyst_recommendations(ticker: str) -> dict:
         ticker: Stock ticker symbol
     """
     ticker = ticker.upper()
-    return await asyncio.to_thread(_fetch_analyst_recommendations, ticker)
+    info = await ticker_info.get(ticker, "quote")
+    return await asyncio.to_thread(_fetch_analyst_recommendations, ticker, info)
 
 
 @function_tool
+@_memoized
 async def get_insider_trades(ticker: str) -> dict:
     """
     Get recent insider trading activity (buys/sells by executives and large shareholders).
@@ -463,6 +551,7 @@ async def get_insider_trades(ticker: str) -> dict:
 
 
 @function_tool
+@_memoized
 async def get_institutional_holders(ticker: str) -> dict:
     """
     Get major institutional holders and their positions.
@@ -475,6 +564,7 @@ async def get_institutional_holders(ticker: str) -> dict:
 
 
 @function_tool
+@_memoized
 async def compare_stocks(
     tickers: list[str], metrics: list[str] | None = None
 ) -> dict[str, Any]:
@@ -489,10 +579,14 @@ async def compare_stocks(
                  'earningsGrowth', 'debtToEquity', 'currentRatio', 'freeCashflow', 'dividendYield'
     """
     tickers = [t.upper() for t in tickers]
-    return await asyncio.to_thread(_compare_stocks, tickers, metrics)
+    infos = await asyncio.gather(
+        *[ticker_info.get(ticker, "fundamentals") for ticker in tickers]
+    )
+    return _compare_stocks(dict(zip(tickers, infos)), metrics)
 
 
 @function_tool
+@_memoized
 async def web_search(query: str, max_results: int = 5) -> list:
     """
     Perform a web search for recent information about companies or industries.
@@ -505,6 +599,7 @@ async def web_search(query: str, max_results: int = 5) -> list:
 
 
 @function_tool
+@_memoized
 async def get_news(query: str, max_results: int = 5) -> list:
     """
     Search for recent company news articles.
@@ -527,25 +622,28 @@ async def sandboxed_financial_analysis(ticker: str, analysis_code: str) -> dict:
 
     income_statement, balance_sheet, cash_flow = await asyncio.gather(
         *[
-            asyncio.to_thread(_fetch_income_statement, ticker, "annual"),
-            asyncio.to_thread(_fetch_balance_sheet, ticker, "annual"),
-            asyncio.to_thread(_fetch_cash_flow, ticker, "annual"),
+            _load_statement(ticker, "income statement"),
+            _load_statement(ticker, "balance sheet"),
+            _load_statement(ticker, "cash flow statement"),
         ],
         return_exceptions=True,
     )
 
-    if any(
-        isinstance(e, Exception) for e in [income_statement, balance_sheet, cash_flow]
-    ):
-        logger.error(
-            f"Error fetching financial data for {ticker}: {income_statement or balance_sheet or cash_flow}"
-        )
+    errors = [
+        e
+        for e in (income_statement, balance_sheet, cash_flow)
+        if isinstance(e, Exception)
+    ]
+    if errors:
+        # The statements are DataFrames now, so pick the error out explicitly
+        logger.error(f"Error fetching financial data for {ticker}: {errors[0]}")
         raise Exception("Error fetching financial data")
 
-    return await asyncio.to_thread(
-        _safe_financial_analysis,
-        analysis_code,
-        income_statement,
-        balance_sheet,
-        cash_flow,
+    frames = await asyncio.to_thread(
+        lambda: {
+            "income": pack_frame(income_statement),
+            "balance": pack_frame(balance_sheet),
+            "cash": pack_frame(cash_flow),
+        }
     )
+    return await sandbox_pool.run(analysis_code, frames)
@@ -0,0 +1,271 @@
+"""
+Price chart rendering off the event loop.
+
+Charts are drawn with matplotlib's object-oriented Agg API in a small pool of
+worker processes, so a render neither blocks the gateway heartbeats nor
+touches pyplot's global state.
+"""
+
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Literal
+
+from app.utils.cache import LRUCache
+from app.utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+type ChartStyle = Literal["line", "candlestick"]
+
+
+@dataclass(frozen=True)
+class ChartOptions:
+    width: float = 8.0  # Inches
+    height: float = 4.0
+    dpi: int = 100
+    style: ChartStyle = "line"
+    volume: bool = False
+
+
+@dataclass
+class ChartSeries:
+    """Plain arrays for one symbol, cheap to pickle into a worker."""
+
+    label: str
+    timestamps: "np.ndarray"  # datetime64, exchange local time
+    close: "np.ndarray"
+    open: "np.ndarray | None" = None
+    high: "np.ndarray | None" = None
+    low: "np.ndarray | None" = None
+    volume: "np.ndarray | None" = field(default=None, repr=False)
+
+
+def series_from_history(label: str, history: "pd.DataFrame") -> ChartSeries:
+    """Convert a yfinance history frame into a ChartSeries."""
+    index = history.index
+    if index.tz is not None:
+        index = index.tz_localize(None)
+
+    def column(name: str):
+        return history[name].to_numpy(dtype=float) if name in history else None
+
+    return ChartSeries(
+        label=label,
+        timestamps=index.to_numpy(),
+        close=column("Close"),
+        open=column("Open"),
+        high=column("High"),
+        low=column("Low"),
+        volume=column("Volume"),
+    )
+
+
+class ChartRenderer:
+    """Renders charts to PNG bytes on a lazily started process pool."""
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._pool: ProcessPoolExecutor | None = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Forking a process that already runs threads (asyncio.to_thread,
+            # aiosqlite) can deadlock the child, so always spawn
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+            )
+        return self._pool
+
+    async def render(
+        self, title: str, series: list[ChartSeries], options: ChartOptions
+    ) -> bytes:
+        """Render `series` on one chart and return the PNG bytes."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.pool, render_chart, title, series, options
+        )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+type ChartKey = tuple[tuple[str, ...], str, str, ChartOptions]
+
+
+class ChartCache:
+    """
+    Rendered PNGs addressed by a digest of the chart parameters and the data
+    they were drawn from.
+
+    Each parameter set also remembers its last digest and when it was
+    computed. Until the underlying bars could have changed, a repeat request
+    is answered without reading the history at all.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self._images: LRUCache[str, bytes] = LRUCache(maxsize)
+        self._latest: LRUCache[ChartKey, tuple[str, float]] = LRUCache(maxsize)
+
+    def recent(self, key: ChartKey, max_age: float) -> bytes | None:
+        """Return the last image for `key` if it was checked within `max_age` seconds."""
+        if (latest := self._latest.get(key)) is None:
+            return None
+        digest, checked_at = latest
+        if time.monotonic() - checked_at >= max_age:
+            return None
+        return self._images.get(digest)
+
+    def lookup(
+        self, key: ChartKey, histories: dict[str, "pd.DataFrame"]
+    ) -> tuple[str, bytes | None]:
+        """Return the digest for `key` drawn from `histories` and its image, if cached."""
+        digest = self.digest(key, histories)
+        return digest, self._images.get(digest)
+
+    def store(self, key: ChartKey, digest: str, png: bytes) -> None:
+        self._images.set(digest, png)
+        self._latest.set(key, (digest, time.monotonic()))
+
+    @staticmethod
+    def digest(key: ChartKey, histories: dict[str, "pd.DataFrame"]) -> str:
+        # The first and last bar pin down the window; the last close changes
+        # while the current bar is still forming
+        parts = [repr(key)]
+        for symbol, frame in sorted(histories.items()):
+            if frame.empty:
+                parts.append(f"{symbol}:empty")
+                continue
+            parts.append(
+                f"{symbol}:{frame.index[0].value}:{frame.index[-1].value}"
+                f":{float(frame['Close'].iloc[-1])!r}"
+            )
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    @property
+    def stats(self) -> dict:
+        return self._images.stats
+
+
+# ============================================================================
+# WORKER SIDE
+# ============================================================================
+
+# Figures are reused between renders of the same geometry; creating one is a
+# noticeable part of a small chart's cost
+_figures: dict[tuple, object] = {}
+
+
+def _warm_worker() -> None:
+    import matplotlib.dates  # noqa: F401
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: F401
+
+
+def _figure(options: ChartOptions):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    key = (options.width, options.height, options.dpi)
+    if (figure := _figures.get(key)) is None:
+        figure = Figure(figsize=(options.width, options.height), dpi=options.dpi)
+        FigureCanvasAgg(figure)
+        _figures[key] = figure
+    figure.clear()
+    return figure
+
+
+def render_chart(title: str, series: list[ChartSeries], options: ChartOptions) -> bytes:
+    """Draw `series` with the OO Agg API and return PNG bytes."""
+    import matplotlib.dates as mdates
+
+    figure = _figure(options)
+    show_volume = options.volume and any(s.volume is not None for s in series)
+    if show_volume:
+        price_ax, volume_ax = figure.subplots(
+            2, 1, sharex=True, gridspec_kw={"height_ratios": [3, 1]}
+        )
+    else:
+        price_ax, volume_ax = figure.subplots(), None
+
+    candles = options.style == "candlestick" and len(series) == 1
+    for s in series:
+        x = mdates.date2num(s.timestamps)
+        if candles and s.open is not None and s.high is not None and s.low is not None:
+            _draw_candles(price_ax, x, s)
+        else:
+            price_ax.plot(x, s.close, label=s.label, linewidth=2)
+        if volume_ax is not None and s.volume is not None:
+            _draw_bars(
+                volume_ax,
+                x,
+                np.zeros_like(s.volume),
+                s.volume,
+                color="tab:blue",
+                alpha=0.5 if len(series) > 1 else 0.8,
+            )
+
+    price_ax.set_title(title)
+    price_ax.set_ylabel("Price (USD)")
+    price_ax.grid(True)
+    if not candles:
+        price_ax.legend()
+    if volume_ax is not None:
+        volume_ax.set_ylabel("Volume")
+        volume_ax.grid(True)
+
+    bottom_ax = volume_ax or price_ax
+    bottom_ax.set_xlabel("Date")
+    bottom_ax.xaxis_date()
+    bottom_ax.xaxis.set_major_formatter(
+        mdates.ConciseDateFormatter(bottom_ax.xaxis.get_major_locator())
+    )
+    figure.tight_layout()
+
+    buf = io.BytesIO()
+    figure.canvas.print_png(buf)
+    return buf.getvalue()
+
+
+def _draw_bars(ax, x: "np.ndarray", bottom, top, **kwargs) -> None:
+    """
+    Draw one bar per x as a single PolyCollection; `ax.bar` creates a
+    Rectangle artist per bar, which dominates the render time of long series.
+    """
+    from matplotlib.collections import PolyCollection
+
+    half = (float(np.median(np.diff(x))) if len(x) > 1 else 1.0) * 0.35
+    left, right = x - half, x + half
+    verts = np.stack(
+        [
+            np.column_stack([left, bottom]),
+            np.column_stack([left, top]),
+            np.column_stack([right, top]),
+            np.column_stack([right, bottom]),
+        ],
+        axis=1,
+    )
+    ax.add_collection(PolyCollection(verts, **kwargs))
+    ax.autoscale_view()
+
+
+def _draw_candles(ax, x: "np.ndarray", s: ChartSeries) -> None:
+    colors = np.where(s.close >= s.open, "tab:green", "tab:red")
+    ax.vlines(x, s.low, s.high, colors=colors, linewidth=1)
+    _draw_bars(
+        ax,
+        x,
+        np.minimum(s.open, s.close),
+        np.maximum(s.open, s.close),
+        facecolors=colors,
+        edgecolors=colors,
+    )
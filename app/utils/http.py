@@ -0,0 +1,73 @@
+"""Process-wide pooled HTTP transports."""
+
+import httpx
+
+from app.config.app_settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """Forwards requests to a pooled transport that only its registry may close."""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class TransportRegistry:
+    """Named, lazily created transports shared by every client built from them."""
+
+    def __init__(self):
+        self._transports: dict[str, httpx.AsyncHTTPTransport] = {}
+
+    def transport(self, name: str = "default") -> httpx.AsyncHTTPTransport:
+        """Return the pooled transport registered as `name`, creating it on first use."""
+        if (transport := self._transports.get(name)) is None:
+            transport = httpx.AsyncHTTPTransport(
+                http2=settings.http2,
+                limits=httpx.Limits(
+                    max_connections=settings.http_max_connections,
+                    max_keepalive_connections=settings.http_max_keepalive_connections,
+                    keepalive_expiry=settings.http_keepalive_expiry,
+                ),
+                retries=settings.http_connect_retries,
+            )
+            self._transports[name] = transport
+            logger.info(f"🔌 Created pooled HTTP transport '{name}'")
+        return transport
+
+    def client(self, name: str = "default", **kwargs) -> httpx.AsyncClient:
+        """
+        Build an AsyncClient on the shared transport `name`. Keyword
+        arguments (event hooks, headers, ...) apply to this client only.
+        """
+        kwargs.setdefault(
+            "timeout",
+            httpx.Timeout(
+                settings.http_read_timeout,
+                connect=settings.http_connect_timeout,
+                pool=settings.http_pool_timeout,
+            ),
+        )
+        return httpx.AsyncClient(
+            transport=_SharedTransport(self.transport(name)), **kwargs
+        )
+
+    async def aclose(self) -> None:
+        """Close every transport; call once on shutdown."""
+        transports, self._transports = self._transports, {}
+        for name, transport in transports.items():
+            try:
+                await transport.aclose()
+            except Exception as e:
+                logger.error(f"❌ Failed to close HTTP transport '{name}': {e}")
+
+
+http_transports = TransportRegistry()
@@ -0,0 +1,73 @@
+"""
+Deferred imports for heavy dependencies that only some commands need.
+"""
+
+import asyncio
+import importlib
+import time
+from types import ModuleType
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_registry: dict[str, "LazyModule"] = {}
+
+
+class LazyModule:
+    """
+    Stand-in for a module that imports it on first attribute access.
+
+    Its own attributes are underscored so they never shadow the module's.
+    """
+
+    def __init__(self, name: str):
+        self._lazy_name = name
+        self._lazy_module: ModuleType | None = None
+
+    def _lazy_load(self) -> ModuleType:
+        if self._lazy_module is None:
+            self._lazy_module = importlib.import_module(self._lazy_name)
+        return self._lazy_module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._lazy_load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return f"<LazyModule {self._lazy_name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a shared lazy proxy for `name`, registering it for prewarming."""
+    if name not in _registry:
+        _registry[name] = LazyModule(name)
+    return _registry[name]
+
+
+def resolve(module: LazyModule) -> ModuleType:
+    """Import the module behind a lazy proxy if needed and return it."""
+    return module._lazy_load()
+
+
+async def prewarm_lazy_modules() -> None:
+    """Import every registered lazy module in a worker thread."""
+    attempted: set[str] = set()
+    # Loading a module can register more lazy imports, so keep going until
+    # nothing new shows up
+    while pending := [name for name in _registry if name not in attempted]:
+        for name in pending:
+            attempted.add(name)
+            await _prewarm(name, _registry[name])
+
+
+async def _prewarm(name: str, module: LazyModule) -> None:
+    if module._lazy_module is not None:
+        return
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(resolve, module)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to prewarm {name}: {e}")
+        return
+    logger.info(f"🔥 Prewarmed {name} in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,416 @@
+"""
+Shared access to Yahoo Finance data for the stocks cog and the agent tools.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal
+
+from app.config.app_settings import settings
+from app.utils.cache import LRUCache
+from app.utils.lazy_import import lazy_import
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+yf = lazy_import("yfinance")
+
+# Quote fields (price, previous close) go stale in seconds, while company
+# profile and ratio fields barely move within a day. Both come back in the
+# same `.info` payload, so callers say which freshness they need.
+type InfoKind = Literal["quote", "fundamentals"]
+
+
+class TickerInfoCache:
+    """
+    Per-symbol cache of `yf.Ticker(symbol).info` with single-flight fetching.
+
+    Concurrent lookups for a symbol that is not cached share one request.
+    Returned dicts are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, ttls: dict[InfoKind, float], maxsize: int = 512):
+        self.ttls = ttls
+        self._entries: LRUCache[str, tuple[float, dict[str, Any]]] = LRUCache(maxsize)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def get(self, symbol: str, kind: InfoKind = "quote") -> dict[str, Any]:
+        """Return `.info` for `symbol`, refetching if older than the TTL for `kind`."""
+        symbol = symbol.upper()
+        if (entry := self._entries.get(symbol)) is not None:
+            fetched_at, info = entry
+            if time.monotonic() - fetched_at < self.ttls[kind]:
+                return info
+
+        if (task := self._inflight.get(symbol)) is None:
+            task = asyncio.create_task(self._fetch(symbol))
+            self._inflight[symbol] = task
+            task.add_done_callback(lambda t: self._fetch_done(symbol, t))
+
+        # Shield so one caller giving up does not cancel the others' fetch
+        return await asyncio.shield(task)
+
+    async def _fetch(self, symbol: str) -> dict[str, Any]:
+        def get_info():
+            return yf.Ticker(symbol).info or {}
+
+        info = await asyncio.to_thread(get_info)
+        self._entries.set(symbol, (time.monotonic(), info))
+        return info
+
+    def _fetch_done(self, symbol: str, task: asyncio.Task) -> None:
+        self._inflight.pop(symbol, None)
+        if not task.cancelled() and (e := task.exception()) is not None:
+            logger.warning(f"⚠️ Failed to fetch ticker info for {symbol}: {e}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {**self._entries.stats, "inflight": len(self._inflight)}
+
+
+ticker_info = TickerInfoCache(
+    ttls={
+        "quote": settings.ticker_quote_ttl,
+        "fundamentals": settings.ticker_fundamentals_ttl,
+    },
+    maxsize=settings.ticker_cache_size,
+)
+
+
+# Longest lookback Yahoo serves for intraday intervals; older tails cannot be
+# topped up and are refetched in full instead
+INTRADAY_LOOKBACK_DAYS = {
+    "1m": 7,
+    "2m": 60,
+    "5m": 60,
+    "15m": 60,
+    "30m": 60,
+    "60m": 730,
+    "90m": 60,
+    "1h": 730,
+}
+
+# Recorded as `covered_from` once the full ("max") history has been stored
+_COVERED_FROM_START = -(2**63)
+
+
+@dataclass
+class _StoredHistory:
+    frame: "pd.DataFrame"
+    covered_from: int  # Earliest UTC nanosecond timestamp requested from Yahoo
+    fetched_at: float  # Unix time of the last download
+
+
+class HistoryStore:
+    """
+    Local OHLCV bars, one columnar `.npz` file per symbol and interval.
+
+    Reads serve stored bars and only download the tail since the last stored
+    bar, or the whole period when the store does not reach back far enough.
+    Symbols requested together are downloaded together in one bulk request.
+    """
+
+    def __init__(self, root: Path, intraday_ttl: float = 60, daily_ttl: float = 900):
+        self.root = root
+        self.intraday_ttl = intraday_ttl
+        self.daily_ttl = daily_ttl
+        self._locks: defaultdict[tuple[str, str], asyncio.Lock] = defaultdict(
+            asyncio.Lock
+        )
+
+    async def history(
+        self,
+        symbol: str,
+        period: str = "1mo",
+        interval: str = "1d",
+        max_age: float | None = None,
+    ) -> "pd.DataFrame":
+        """Return bars for `symbol` like `yf.Ticker(symbol).history(period, interval)`."""
+        symbol = symbol.upper()
+        return (await self.history_many([symbol], period, interval, max_age))[symbol]
+
+    async def history_many(
+        self,
+        symbols: list[str],
+        period: str = "1mo",
+        interval: str = "1d",
+        max_age: float | None = None,
+    ) -> dict[str, "pd.DataFrame"]:
+        """
+        Return bars for several symbols, fetching whatever is missing or stale
+        in a single download.
+
+        `max_age` overrides how old stored bars may be before the tail is refreshed.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        async with AsyncExitStack() as stack:
+            # Take the per-file locks in a fixed order so overlapping calls cannot deadlock
+            for symbol in sorted(symbols):
+                await stack.enter_async_context(self._locks[(symbol, interval)])
+            return await asyncio.to_thread(
+                self.load_many, symbols, period, interval, max_age
+            )
+
+    def load_many(
+        self,
+        symbols: list[str],
+        period: str,
+        interval: str,
+        max_age: float | None = None,
+    ) -> dict[str, "pd.DataFrame"]:
+        """Blocking implementation of `history_many`; callers must serialize per file."""
+        now = pd.Timestamp.now(tz="UTC")
+        try:
+            start = _period_start(period, now)
+        except ValueError:
+            # Unknown period syntax; let yfinance interpret it and skip the store
+            return _download(symbols, period=period, interval=interval)
+        ttl = self.refresh_interval(interval) if max_age is None else max_age
+
+        stored: dict[str, _StoredHistory] = {}
+        missing, stale = [], []
+        for symbol in symbols:
+            entry = self._read(self._path(symbol, interval))
+            if entry is None or not self._reaches(entry, start, interval, now):
+                missing.append(symbol)
+                continue
+            stored[symbol] = entry
+            if now.timestamp() - entry.fetched_at >= ttl:
+                stale.append(symbol)
+
+        if missing:
+            frames = _download(missing, period=period, interval=interval)
+            for symbol in missing:
+                frame = frames[symbol]
+                if start is None:
+                    covered_from = _COVERED_FROM_START
+                elif frame.empty:
+                    covered_from = start.value
+                else:
+                    # Day periods can reach back past `start` over weekends
+                    covered_from = min(start, frame.index[0]).value
+                stored[symbol] = _StoredHistory(frame, covered_from, now.timestamp())
+                if not frame.empty:
+                    self._write(self._path(symbol, interval), stored[symbol])
+
+        if stale:
+            since = min(_tail_start(stored[symbol]) for symbol in stale)
+            tails = _download(stale, start=since.to_pydatetime(), interval=interval)
+            for symbol in stale:
+                entry = _merge_tail(stored[symbol], tails[symbol], now)
+                if entry is None:
+                    entry = self._refetch(symbol, interval, stored[symbol], now)
+                stored[symbol] = entry
+                self._write(self._path(symbol, interval), entry)
+
+        return {
+            symbol: _slice(stored[symbol].frame, period, start) for symbol in symbols
+        }
+
+    @staticmethod
+    def _refetch(
+        symbol: str, interval: str, stored: "_StoredHistory", now
+    ) -> "_StoredHistory":
+        """Download the whole span the store covers for `symbol` again."""
+        if stored.covered_from == _COVERED_FROM_START:
+            frames = _download([symbol], period="max", interval=interval)
+        else:
+            covered_from = pd.Timestamp(stored.covered_from, tz="UTC")
+            frames = _download(
+                [symbol], start=covered_from.to_pydatetime(), interval=interval
+            )
+        return _StoredHistory(frames[symbol], stored.covered_from, now.timestamp())
+
+    def _reaches(self, stored: "_StoredHistory", start, interval: str, now) -> bool:
+        """Whether the stored bars can answer a request starting at `start`."""
+        if start is None:
+            if stored.covered_from != _COVERED_FROM_START:
+                return False
+        elif stored.covered_from > start.value:
+            return False
+
+        if (days := INTRADAY_LOOKBACK_DAYS.get(interval)) and not stored.frame.empty:
+            oldest_fetchable = now - pd.Timedelta(days=days)
+            return stored.frame.index[-1] >= oldest_fetchable
+        return True
+
+    def refresh_interval(self, interval: str) -> float:
+        """Seconds stored bars for `interval` are served before the tail is refetched."""
+        return self.intraday_ttl if interval in INTRADAY_LOOKBACK_DAYS else self.daily_ttl
+
+    def _path(self, symbol: str, interval: str) -> Path:
+        return self.root / f"{re.sub(r'[^A-Za-z0-9._-]', '_', symbol)}_{interval}.npz"
+
+    @staticmethod
+    def _read(path: Path) -> "_StoredHistory | None":
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                index = pd.to_datetime(data["index"], unit="ns", utc=True)
+                if tz := str(data["tz"]):
+                    index = index.tz_convert(tz)
+                index = index.rename(str(data["index_name"]) or None)
+                columns = [str(c) for c in data["columns"]]
+                frame = pd.DataFrame(
+                    {c: data[f"col_{i}"] for i, c in enumerate(columns)}, index=index
+                )
+                return _StoredHistory(
+                    frame, int(data["covered_from"]), float(data["fetched_at"])
+                )
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable price history {path}: {e}")
+            return None
+
+    @staticmethod
+    def _write(path: Path, stored: "_StoredHistory") -> None:
+        frame = stored.frame
+        tz = frame.index.tz
+        arrays = {
+            "index": (frame.index.tz_convert("UTC") if tz else frame.index)
+            .as_unit("ns")
+            .asi8,
+            "tz": np.array(str(tz) if tz else ""),
+            "index_name": np.array(frame.index.name or ""),
+            "columns": np.array([str(c) for c in frame.columns]),
+            "covered_from": np.array(stored.covered_from, dtype=np.int64),
+            "fetched_at": np.array(stored.fetched_at),
+        }
+        for i, column in enumerate(frame.columns):
+            arrays[f"col_{i}"] = frame[column].to_numpy()
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp.npz")
+            np.savez(tmp, **arrays)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write price history {path}: {e}")
+
+
+def _download(symbols: list[str], **kwargs) -> dict[str, "pd.DataFrame"]:
+    """Fetch bars for `symbols`, using one bulk request when there are several."""
+    if len(symbols) == 1:
+        return {symbols[0]: yf.Ticker(symbols[0]).history(**kwargs)}
+
+    data = yf.download(
+        symbols,
+        group_by="ticker",
+        actions=True,
+        auto_adjust=True,
+        ignore_tz=False,
+        progress=False,
+        **kwargs,
+    )
+    frames = {}
+    tickers = set(data.columns.get_level_values(0)) if not data.empty else set()
+    for symbol in symbols:
+        if symbol not in tickers:
+            frames[symbol] = pd.DataFrame()
+            continue
+        # Rows exist for every ticker's trading days; drop the ones this
+        # symbol did not trade on
+        frame = data[symbol].dropna(how="all").copy()
+        frame.columns.name = None
+        if frame.index.tz is None:
+            frame.index = frame.index.tz_localize("UTC")
+        frames[symbol] = frame
+    return frames
+
+
+def _tail_start(stored: _StoredHistory) -> "pd.Timestamp":
+    """Where a top-up download for `stored` has to start."""
+    if stored.frame.empty:
+        return pd.Timestamp(stored.covered_from, tz="UTC")
+    return stored.frame.index[-1].tz_convert("UTC")
+
+
+def _merge_tail(
+    stored: _StoredHistory, tail: "pd.DataFrame", now
+) -> "_StoredHistory | None":
+    """
+    Append freshly downloaded bars to `stored`.
+
+    Returns None when the tail brings a new dividend or split: prices are
+    back-adjusted, so every earlier bar changes and the span must be refetched.
+    """
+    frame = stored.frame
+    if not frame.empty:
+        tail = tail[tail.index >= frame.index[-1]]
+    if tail.empty:
+        return _StoredHistory(frame, stored.covered_from, now.timestamp())
+
+    new_bars = tail if frame.empty else tail[tail.index > frame.index[-1]]
+    actions = [c for c in ("Dividends", "Stock Splits") if c in tail.columns]
+    if not frame.empty and actions and (new_bars[actions].fillna(0) != 0).any(axis=None):
+        return None
+
+    if not frame.empty and frame.index.tz is not None:
+        tail = tail.tz_convert(frame.index.tz)
+    merged = pd.concat([frame[frame.index < tail.index[0]], tail])
+    return _StoredHistory(merged, stored.covered_from, now.timestamp())
+
+
+def _period_start(period: str, now) -> "pd.Timestamp | None":
+    """Translate a yfinance `period` into its start time, or None for `max`."""
+    if period == "max":
+        return None
+    if period == "ytd":
+        return now.normalize().replace(month=1, day=1)
+    if not (match := re.fullmatch(r"(\d+)(d|mo|y)", period)):
+        raise ValueError(f"Unsupported period: {period}")
+
+    count, unit = int(match[1]), match[2]
+    if unit == "d":
+        return now - pd.Timedelta(days=count)
+    if unit == "mo":
+        return now - pd.DateOffset(months=count)
+    return now - pd.DateOffset(years=count)
+
+
+def _slice(frame: "pd.DataFrame", period: str, start) -> "pd.DataFrame":
+    """Cut stored bars down to what yfinance would return for `period`."""
+    if start is None or frame.empty:
+        return frame.copy()
+    if match := re.fullmatch(r"(\d+)d", period):
+        # Day periods count trading sessions, not calendar days
+        sessions = frame.index.normalize().unique()
+        return frame[frame.index >= sessions[-int(match[1]) :][0]].copy()
+    return frame[frame.index >= start].copy()
+
+
+history_store = HistoryStore(Path(settings.history_store_dir))
+
+
+async def fetch_quotes(symbols: list[str]) -> dict[str, tuple[float, float] | None]:
+    """
+    Return the last daily close and the close before it for each symbol, or
+    None when Yahoo has no data, from one bulk download of recent daily bars.
+
+    While the market is open the last bar is the current session, so its
+    close tracks the regular-hours price; pre- and post-market trades are
+    not included, unlike `regularMarketPrice` from `.info`.
+    """
+    histories = await history_store.history_many(
+        symbols, "5d", "1d", max_age=settings.ticker_quote_ttl
+    )
+    quotes = {}
+    for symbol, frame in histories.items():
+        closes = frame["Close"].dropna() if "Close" in frame else frame
+        quotes[symbol] = (
+            (float(closes.iloc[-1]), float(closes.iloc[-2]))
+            if len(closes) >= 2
+            else None
+        )
+    return quotes
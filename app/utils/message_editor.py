@@ -0,0 +1,161 @@
+"""Rate-friendly edits of a message that changes while a response streams."""
+
+import asyncio
+import contextlib
+import time
+from typing import Any
+
+import discord
+
+from app.config.app_settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Discord's limit on message content
+MESSAGE_LIMIT = 2000
+
+# When a chunk must be split, prefer the last newline within this many
+# characters of the limit over cutting mid-line
+SPLIT_LOOKBACK = 200
+
+
+class CoalescedEditor:
+    """Edits `message` with the latest requested fields, at most once per `interval`."""
+
+    def __init__(
+        self,
+        message: discord.Message | discord.WebhookMessage,
+        interval: float = settings.stream_edit_interval,
+        max_interval: float = 5.0,
+    ):
+        self.message = message
+        self.interval = interval
+        self.max_interval = max_interval
+        self.edits = 0
+        self.requested = 0
+        self._pending: dict[str, Any] | None = None
+        self._last_edit = 0.0
+        self._flush_now = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def update(self, **fields: Any) -> None:
+        """Request an edit; replaces any edit that has not been sent yet."""
+        self.requested += 1
+        self._pending = fields
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self) -> None:
+        """Send the pending edit now and wait until every edit has been applied."""
+        self._flush_now.set()
+        if self._pending is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+        if self._task is not None:
+            await self._task
+        self._flush_now.clear()
+
+    async def cancel(self) -> None:
+        """Drop pending edits, e.g. before the message is deleted."""
+        self._pending = None
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    async def _run(self) -> None:
+        while self._pending is not None:
+            delay = self._last_edit + self.interval - time.monotonic()
+            if delay > 0 and not self._flush_now.is_set():
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(delay):
+                        await self._flush_now.wait()
+
+            fields, self._pending = self._pending, None
+            started = time.monotonic()
+            try:
+                await self.message.edit(**fields)
+                self.edits += 1
+            except discord.HTTPException as e:
+                logger.warning(f"⚠️ Failed to edit message {self.message.id}: {e}")
+            self._last_edit = time.monotonic()
+
+            # discord.py waits out a 429 inside `edit`; an edit that took
+            # longer than the interval means we are editing too often
+            if self._last_edit - started > self.interval:
+                self.interval = min(self.interval * 2, self.max_interval)
+
+
+class StreamedReply:
+    """
+    Streams text into `channel` below `header`, wrapped in `fence` (a code
+    block by default). Text that outgrows a message continues in a new one;
+    finished messages are never edited again.
+    """
+
+    def __init__(
+        self,
+        channel: discord.abc.Messageable,
+        header: str,
+        fence: tuple[str, str] = ("```\n", "\n```"),
+        placeholder: str = "…",
+    ):
+        self.channel = channel
+        self.header = header
+        self.fence = fence
+        self.placeholder = placeholder
+        self.messages: list[discord.Message] = []
+        self._editor: CoalescedEditor | None = None
+        self._text = ""  # Text of the message currently being streamed
+
+    @property
+    def capacity(self) -> int:
+        """Characters of text the current message can hold."""
+        prefix = self.header if len(self.messages) <= 1 else ""
+        return MESSAGE_LIMIT - len(prefix) - len(self.fence[0]) - len(self.fence[1])
+
+    async def start(self) -> discord.Message:
+        """Send the first message with the header and a placeholder."""
+        message = await self.channel.send(self._render(self.header, self.placeholder))
+        self.messages.append(message)
+        self._editor = CoalescedEditor(message)
+        return message
+
+    async def append(self, delta: str) -> None:
+        if not delta:
+            return
+        if self._editor is None:
+            await self.start()
+        self._text += delta
+        while len(self._text) > self.capacity:
+            cut = self._split_point(self._text, self.capacity)
+            done, self._text = self._text[:cut], self._text[cut:]
+            await self._finish_message(done)
+            message = await self.channel.send(
+                self._render("", self._text[: self.capacity] or self.placeholder)
+            )
+            self.messages.append(message)
+            self._editor = CoalescedEditor(message)
+        self._editor.update(content=self._render(self._prefix, self._text))
+
+    async def finish(self) -> None:
+        """Write the final text of the current message and wait for it."""
+        if self._editor is None:
+            await self.start()
+        await self._finish_message(self._text or self.placeholder)
+
+    @property
+    def _prefix(self) -> str:
+        return self.header if len(self.messages) == 1 else ""
+
+    async def _finish_message(self, text: str) -> None:
+        self._editor.update(content=self._render(self._prefix, text))
+        await self._editor.flush()
+
+    def _render(self, prefix: str, text: str) -> str:
+        return f"{prefix}{self.fence[0]}{text}{self.fence[1]}"
+
+    @staticmethod
+    def _split_point(text: str, limit: int) -> int:
+        newline = text.rfind("\n", limit - SPLIT_LOOKBACK, limit)
+        return newline + 1 if newline > 0 else limit
@@ -0,0 +1,65 @@
+"""
+Fingerprints of startup work that only needs redoing when its inputs change.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import MetaData
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def fingerprint(payload: Any) -> str:
+    """Return a stable SHA-256 hex digest of a JSON-serializable payload."""
+    serialized = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def schema_fingerprint(metadata: MetaData) -> str:
+    """Fingerprint the DDL that `metadata.create_all` would emit."""
+    dialect = sqlite.dialect()
+    statements = []
+    for table in metadata.sorted_tables:
+        statements.append(str(CreateTable(table).compile(dialect=dialect)))
+        statements.extend(
+            str(CreateIndex(index).compile(dialect=dialect))
+            for index in sorted(table.indexes, key=lambda i: i.name or "")
+        )
+    return fingerprint(statements)
+
+
+class StartupCache:
+    """Small JSON file mapping startup steps to the fingerprint they last ran with."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._entries: dict[str, str] = self._load()
+
+    def _load(self) -> dict[str, str]:
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable startup cache {self.path}: {e}")
+            return {}
+
+    def is_current(self, key: str, value: str) -> bool:
+        """Return True if `key` was last recorded with this fingerprint."""
+        return self._entries.get(key) == value
+
+    def record(self, key: str, value: str) -> None:
+        """Store the fingerprint for `key` and persist the cache."""
+        self._entries[key] = value
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self._entries, indent=2, sort_keys=True))
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write startup cache {self.path}: {e}")
@@ -0,0 +1,134 @@
+"""
+Measure chart rendering throughput and how much it stalls the event loop.
+
+Renders the same synthetic charts twice: the old way, with pyplot on the
+event loop thread, and through ChartRenderer's process pool. Reports charts
+per second, render latency and the longest gap between event loop ticks,
+which is how late a gateway heartbeat would have been sent.
+
+Usage:
+    python -m benchmarks.chart_rendering --charts 40 --workers 2 --bars 250
+"""
+
+import argparse
+import asyncio
+import io
+import statistics
+import time
+
+import numpy as np
+
+from app.utils.charts import ChartOptions, ChartRenderer, ChartSeries
+
+
+def synthetic_series(label: str, bars: int, seed: int) -> ChartSeries:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    open_ = close * (1 + rng.normal(0, 0.003, bars))
+    return ChartSeries(
+        label=label,
+        timestamps=np.arange(bars) * np.timedelta64(1, "D")
+        + np.datetime64("2024-01-01"),
+        close=close,
+        open=open_,
+        high=np.maximum(open_, close) * 1.005,
+        low=np.minimum(open_, close) * 0.995,
+        volume=rng.integers(1_000_000, 5_000_000, bars).astype(float),
+    )
+
+
+def render_with_pyplot(series: list[ChartSeries]) -> bytes:
+    """The previous implementation: pyplot state machine on the caller's thread."""
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 4))
+    for s in series:
+        plt.plot(s.timestamps, s.close, label=s.label, linewidth=2)
+    plt.title("Benchmark")
+    plt.xlabel("Date")
+    plt.ylabel("Price (USD)")
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    buf = io.BytesIO()
+    plt.savefig(buf, format="png")
+    plt.close()
+    return buf.getvalue()
+
+
+async def watch_loop(stop: asyncio.Event, gaps: list[float]) -> None:
+    """Record the time between ticks of a 10 ms sleep loop."""
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.01)
+        now = time.perf_counter()
+        gaps.append((now - last - 0.01) * 1000)
+        last = now
+
+
+async def run(label: str, render, charts: int) -> None:
+    stop = asyncio.Event()
+    gaps: list[float] = []
+    watcher = asyncio.create_task(watch_loop(stop, gaps))
+    await asyncio.sleep(0.05)
+
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        start = time.perf_counter()
+        await render(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(charts)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await watcher
+
+    print(f"\n=== {label} ===")
+    print(f"charts/s         {charts / elapsed:8.1f}")
+    print(f"latency ms  p50  {statistics.median(latencies):8.1f}")
+    print(f"latency ms  max  {max(latencies):8.1f}")
+    print(f"loop stall ms max {max(gaps or [0]):7.1f}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--charts", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--bars", type=int, default=250)
+    args = parser.parse_args()
+
+    single = [synthetic_series("AAPL", args.bars, 1)]
+    compare = [synthetic_series(s, args.bars, i) for i, s in enumerate("ABCD")]
+    workloads = [single, compare]
+
+    async def pyplot_render(i: int) -> bytes:
+        return render_with_pyplot(workloads[i % 2])
+
+    await run("pyplot on the event loop", pyplot_render, args.charts)
+
+    renderer = ChartRenderer(max_workers=args.workers)
+    # Start the workers outside the timed run, as the bot does on first use
+    await asyncio.gather(
+        *[
+            renderer.render("warmup", single, ChartOptions())
+            for _ in range(args.workers)
+        ]
+    )
+
+    async def pool_render(i: int) -> bytes:
+        return await renderer.render("Benchmark", workloads[i % 2], ChartOptions())
+
+    await run(f"process pool, {args.workers} workers", pool_render, args.charts)
+
+    async def candle_render(i: int) -> bytes:
+        options = ChartOptions(style="candlestick", volume=True)
+        return await renderer.render("Benchmark", single, options)
+
+    await run("process pool, candlestick + volume", candle_render, args.charts)
+    renderer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
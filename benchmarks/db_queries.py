@@ -0,0 +1,179 @@
+"""
+Benchmark every Database read method against a large synthetic SQLite database.
+
+Seeds link and slap history, then times each read method and prints its query
+plans twice: once with the guild-scoped composite indexes dropped ("before")
+and once with them in place ("after").
+
+Usage:
+    python -m benchmarks.db_queries --links 2000000 --slaps 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import event
+
+from app.database import Database
+from app.models.database import Base
+
+GUILDS = 50
+USERS_PER_GUILD = 2000
+HOSTNAMES = [f"site{i}.example.com" for i in range(500)]
+
+
+def seed(db_path: Path, links: int, slaps: int) -> None:
+    """Bulk insert synthetic link and slap entries."""
+    rng = random.Random(42)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    def guild():
+        return rng.randrange(1, GUILDS + 1)
+
+    def user():
+        return rng.randrange(1, USERS_PER_GUILD + 1)
+
+    def link_rows():
+        for i in range(links):
+            hostname = rng.choice(HOSTNAMES)
+            yield guild(), user(), hostname, f"https://{hostname}/{i}"
+
+    conn.executemany(
+        "INSERT INTO link_entries (guild_id, user_id, hostname, url, created_at) "
+        "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+        link_rows(),
+    )
+    conn.executemany(
+        "INSERT INTO slap_entries (guild_id, slapper_id, slapped_id, created_at) "
+        "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+        ((guild(), user(), user()) for _ in range(slaps)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def composite_indexes() -> list:
+    """Return the guild-scoped composite indexes declared on the models."""
+    return [
+        index
+        for table in Base.metadata.sorted_tables
+        for index in table.indexes
+        if len(index.columns) > 1
+    ]
+
+
+def set_indexes(db_path: Path, enabled: bool) -> None:
+    conn = sqlite3.connect(db_path)
+    for index in composite_indexes():
+        if enabled:
+            columns = ", ".join(c.name for c in index.columns)
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {index.name} ON {index.table.name} ({columns})"
+            )
+        else:
+            conn.execute(f"DROP INDEX IF EXISTS {index.name}")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+async def run_phase(db_path: Path, label: str, iterations: int) -> None:
+    db = Database(db_url=f"sqlite+aiosqlite:///{db_path}")
+    await db.connect()
+
+    statements: list[tuple[str, tuple]] = []
+
+    @event.listens_for(db.engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    guild_id, user_id = 1, 1
+    methods = {
+        "get_guild_settings": lambda: db.get_guild_settings(guild_id),
+        "get_guild_settings_json": lambda: db.get_guild_settings_json(guild_id),
+        "get_thread_model": lambda: db.get_thread_model(1),
+        "get_thread_ai_parameters": lambda: db.get_thread_ai_parameters(1),
+        "get_link_leaderboard": lambda: db.get_link_leaderboard(guild_id),
+        "get_user_link_stats": lambda: db.get_user_link_stats(guild_id, user_id),
+        "get_slap_leaderboard": lambda: db.get_slap_leaderboard(guild_id),
+        "get_user_slap_stats": lambda: db.get_user_slap_stats(guild_id, user_id),
+        "rebuild_counters": lambda: db.rebuild_counters(guild_id),
+    }
+
+    def clear_caches() -> None:
+        # Settings reads are otherwise served from memory after the first call
+        db.guild_settings_cache.clear()
+        db.thread_settings_cache.clear()
+
+    print(f"\n=== {label} ===")
+    plans = sqlite3.connect(db_path)
+    for name, call in methods.items():
+        clear_caches()
+        statements.clear()
+        await call()
+        captured = list(statements)
+
+        timings = []
+        for _ in range(iterations):
+            clear_caches()
+            start = time.perf_counter()
+            await call()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        print(
+            f"{name:<26} median {statistics.median(timings):9.3f} ms"
+            f"   p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:9.3f} ms"
+        )
+        for statement, parameters in captured:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            for row in plans.execute(f"EXPLAIN QUERY PLAN {statement}", parameters):
+                print(f"    {row[-1]}")
+
+    plans.close()
+    await db.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--links", type=int, default=2_000_000)
+    parser.add_argument("--slaps", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--db", type=Path, help="Reuse or create this database file")
+    args = parser.parse_args()
+
+    db_path = args.db or Path(tempfile.mkdtemp()) / "bench.db"
+    if not db_path.exists():
+        bootstrap = Database(db_url=f"sqlite+aiosqlite:///{db_path}")
+        await bootstrap.connect()
+        await bootstrap.close()
+
+        start = time.perf_counter()
+        seed(db_path, args.links, args.slaps)
+        print(
+            f"Seeded {args.links:,} links and {args.slaps:,} slaps "
+            f"in {time.perf_counter() - start:.1f}s ({db_path})"
+        )
+
+        bootstrap = Database(db_url=f"sqlite+aiosqlite:///{db_path}")
+        await bootstrap.connect()
+        await bootstrap.rebuild_counters()
+        await bootstrap.close()
+
+    set_indexes(db_path, enabled=False)
+    await run_phase(db_path, "before: without composite indexes", args.iterations)
+
+    set_indexes(db_path, enabled=True)
+    await run_phase(db_path, "after: with composite indexes", args.iterations)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,159 @@
+"""
+Measure the latency saved by sharing pooled connections to the model API.
+
+Starts a mock OpenAI chat completions server behind a local proxy. The
+proxy adds a fixed delay to every new connection, standing in for the TCP
+and TLS handshakes to a remote API. Three "cogs" then take turns sending
+chat completions through the OpenAI SDK, in three setups:
+
+- a fresh httpx client per request, which is what every call costs once
+  httpx's default 5 s keep-alive has expired;
+- one default httpx client per cog, the previous setup;
+- clients from the shared transport registry.
+
+For each setup it reports request latency and how many connections the
+proxy saw. Pass --idle above 5 to watch the default clients reconnect
+between requests the way the bot's sparse traffic made them.
+
+Usage:
+    python -m benchmarks.http_transport --requests 30 --handshake-ms 60 --server-ms 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from aiohttp import web
+from openai import AsyncOpenAI
+
+from app.utils.http import http_transports
+
+COGS = ("ai", "qotd", "stocks")
+
+
+def completion_body() -> dict:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "mock",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "ok"},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+async def start_mock_server(server_ms: float) -> web.AppRunner:
+    async def completions(request: web.Request) -> web.Response:
+        await request.read()
+        await asyncio.sleep(server_ms / 1000)
+        return web.json_response(completion_body())
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+class HandshakeProxy:
+    """TCP proxy that delays each new connection by `handshake_ms`."""
+
+    def __init__(self, upstream_port: int, handshake_ms: float):
+        self.upstream_port = upstream_port
+        self.handshake_ms = handshake_ms
+        self.connections = 0
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer) -> None:
+        self.connections += 1
+        await asyncio.sleep(self.handshake_ms / 1000)
+        up_reader, up_writer = await asyncio.open_connection(
+            "127.0.0.1", self.upstream_port
+        )
+
+        async def pipe(src, dst) -> None:
+            try:
+                while data := await src.read(65536):
+                    dst.write(data)
+                    await dst.drain()
+            except ConnectionError:
+                pass
+            finally:
+                dst.close()
+
+        await asyncio.gather(pipe(reader, up_writer), pipe(up_reader, writer))
+
+
+async def run(label: str, clients, proxy: HandshakeProxy, requests: int, idle: float):
+    proxy.connections = 0
+    latencies = []
+    for i in range(requests):
+        client = clients(COGS[i % len(COGS)])
+        start = time.perf_counter()
+        await client.chat.completions.create(
+            model="mock", messages=[{"role": "user", "content": "hi"}]
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        if idle:
+            await asyncio.sleep(idle)
+
+    print(f"\n=== {label} ===")
+    print(f"latency ms  mean {statistics.mean(latencies):8.1f}")
+    print(f"latency ms  p50  {statistics.median(latencies):8.1f}")
+    print(f"latency ms  max  {max(latencies):8.1f}")
+    print(f"connections      {proxy.connections:8d}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--handshake-ms", type=float, default=60)
+    parser.add_argument("--server-ms", type=float, default=20)
+    parser.add_argument("--idle", type=float, default=0.0)
+    args = parser.parse_args()
+
+    runner = await start_mock_server(args.server_ms)
+    upstream_port = runner.addresses[0][1]
+    proxy = HandshakeProxy(upstream_port, args.handshake_ms)
+    base_url = f"http://127.0.0.1:{await proxy.start()}/v1"
+
+    def openai(http_client: httpx.AsyncClient) -> AsyncOpenAI:
+        return AsyncOpenAI(base_url=base_url, api_key="bench", http_client=http_client)
+
+    await run(
+        "fresh client per request",
+        lambda cog: openai(httpx.AsyncClient()),
+        proxy,
+        args.requests,
+        args.idle,
+    )
+
+    per_cog = {cog: openai(httpx.AsyncClient()) for cog in COGS}
+    await run(
+        "default client per cog", per_cog.__getitem__, proxy, args.requests, args.idle
+    )
+
+    shared = {cog: openai(http_transports.client("bench")) for cog in COGS}
+    await run(
+        "shared pooled transport", shared.__getitem__, proxy, args.requests, args.idle
+    )
+
+    await http_transports.aclose()
+    proxy.server.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+Measure read/write contention on SQLite with and without the tuning profile.
+
+Runs concurrent writers (store_slap_entry) and readers (get_slap_leaderboard,
+get_user_slap_stats), each in its own process so the event loop is not the
+bottleneck, against a fresh database for a fixed duration, first
+with SQLite's defaults (rollback journal, synchronous=FULL) and then with the
+pragmas from AppSettings.sqlite_pragmas, and reports throughput and reader
+latency percentiles for each.
+
+Usage:
+    python -m benchmarks.sqlite_contention --writers 1 --readers 4 --seconds 10
+
+Each worker is a separate process, so use no more workers than CPU cores or
+the numbers will mostly measure the scheduler.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+
+from app.config.app_settings import AppSettings
+from app.database import Database
+
+# The AppSettings defaults; model_construct skips the env files, so local
+# overrides do not leak into the comparison
+TUNED_PRAGMAS = AppSettings.model_construct().sqlite_pragmas
+DEFAULT_PRAGMAS = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "busy_timeout": 5000,
+}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def _worker(
+    role: str, seed: int, db_path: Path, pragmas: dict, deadline: float
+) -> tuple[str, list[float], int]:
+    db = Database(db_url=f"sqlite+aiosqlite:///{db_path}")
+    await db.connect(pragmas=pragmas, pool_size=1, max_overflow=0)
+
+    rng = random.Random(seed)
+    latencies: list[float] = []
+    errors = 0
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            if role == "write":
+                await db.store_slap_entry(
+                    1, rng.randrange(1, 500), rng.randrange(1, 500)
+                )
+            elif rng.random() < 0.5:
+                await db.get_slap_leaderboard(1)
+            else:
+                await db.get_user_slap_stats(1, rng.randrange(1, 500))
+            latencies.append((time.perf_counter() - start) * 1000)
+        except OperationalError:
+            # "database is locked" once busy_timeout runs out
+            errors += 1
+
+    await db.close()
+    return role, latencies, errors
+
+
+def worker(*args) -> tuple[str, list[float], int]:
+    """Run one reader or writer in its own process and event loop."""
+    return asyncio.run(_worker(*args))
+
+
+async def run_profile(
+    label: str, pragmas: dict, writers: int, readers: int, seconds: float
+) -> None:
+    db_path = Path(tempfile.mkdtemp()) / "contention.db"
+    db = Database(db_url=f"sqlite+aiosqlite:///{db_path}")
+    await db.connect(pragmas=pragmas)
+    await db.close()
+
+    roles = ["write"] * writers + ["read"] * readers
+    deadline = time.time() + 2 + seconds  # Leave time for the workers to start
+    with ProcessPoolExecutor(max_workers=len(roles)) as pool:
+        results = await asyncio.gather(
+            *[
+                asyncio.wrap_future(
+                    pool.submit(worker, role, seed, db_path, pragmas, deadline)
+                )
+                for seed, role in enumerate(roles)
+            ]
+        )
+
+    write_latencies = [ms for r, lat, _ in results if r == "write" for ms in lat]
+    read_latencies = [ms for r, lat, _ in results if r == "read" for ms in lat]
+    errors = sum(e for _, _, e in results)
+
+    print(f"\n=== {label} ===")
+    print(f"writes/s {len(write_latencies) / seconds:10.1f}")
+    print(f"reads/s  {len(read_latencies) / seconds:10.1f}")
+    print(
+        f"write ms  p50 {statistics.median(write_latencies or [0]):8.2f}"
+        f"  p99 {percentile(write_latencies, 0.99):8.2f}"
+    )
+    print(
+        f"read ms   p50 {statistics.median(read_latencies or [0]):8.2f}"
+        f"  p99 {percentile(read_latencies, 0.99):8.2f}"
+    )
+    print(f"errors   {errors}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=1)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    await run_profile(
+        "default: rollback journal, synchronous=FULL",
+        DEFAULT_PRAGMAS,
+        args.writers,
+        args.readers,
+        args.seconds,
+    )
+    await run_profile(
+        "tuned: WAL, synchronous=NORMAL, mmap, cache",
+        TUNED_PRAGMAS,
+        args.writers,
+        args.readers,
+        args.seconds,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Measure how long each cog takes to import, using `python -X importtime`.
+
+Imports every cog from AppSettings.cogs in a fresh interpreter, reports the
+cumulative import time of the cog and the heaviest packages it pulled in, and
+fails if any cog drags in a module that is meant to be loaded lazily.
+
+Usage:
+    python -m benchmarks.startup_imports --top 10
+"""
+
+import argparse
+import subprocess
+import sys
+from dataclasses import dataclass
+
+# Modules that should only be imported once a command needs them
+LAZY_MODULES = (
+    "matplotlib",
+    "yfinance",
+    "pandas",
+    "numpy",
+    "duckduckgo_search",
+    "agents",
+)
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> list[ImportRecord]:
+    """Parse the `import time:` lines written by -X importtime."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append(
+            ImportRecord(name.strip(), int(self_us), int(cumulative_us), depth)
+        )
+    return records
+
+
+def measure(module: str) -> list[ImportRecord]:
+    try:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Importing {module} failed:\n{e.stderr[-2000:]}") from e
+    return parse_importtime(result.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "modules", nargs="*", help="Modules to import (defaults to every cog)"
+    )
+    args = parser.parse_args()
+
+    if not (modules := args.modules):
+        from app.config.app_settings import settings
+
+        modules = sorted(settings.cogs)
+
+    # Everything the cogs share (discord, sqlalchemy, settings) is imported
+    # first so each cog is charged only for what it adds on top
+    baseline = {r.module for r in measure("app.database, app.utils, discord")}
+
+    violations = []
+    for module in modules:
+        records = measure(f"app.database, app.utils, discord, {module}")
+        added = [r for r in records if r.module not in baseline]
+        total = next((r.cumulative_us for r in added if r.module == module), 0)
+        print(f"\n=== {module}: {total / 1000:.1f} ms ===")
+
+        roots = sorted(
+            (r for r in added if r.module.split(".")[0] == r.module),
+            key=lambda r: r.cumulative_us,
+            reverse=True,
+        )
+        for record in roots[: args.top]:
+            print(f"    {record.cumulative_us / 1000:9.1f} ms  {record.module}")
+
+        for record in added:
+            if record.module in LAZY_MODULES:
+                violations.append((module, record.module))
+
+    if violations:
+        print("\nEagerly imported modules that should be lazy:")
+        for module, lazy in violations:
+            print(f"    {module} -> {lazy}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,6 @@
 #!/bin/bash
 set -e
 
-echo "🔄 Running database migrations..."
-alembic upgrade head
-
+# Migrations run in-process during startup (see app.main.run_migrations)
 echo "🚀 Starting Uncle Ron Bot..."
-exec uv run python -m app.main
\ No newline at end of file
+exec uv run python -m app.main "$@"
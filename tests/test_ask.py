@@ -0,0 +1,198 @@
+"""/ask: thread setup overlapped with a streamed model request."""
+
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from app.cogs import ai
+from app.cogs.ai import AI
+
+
+class FakeMessage:
+    _ids = iter(range(1000, 2000))
+
+    def __init__(self, content: str):
+        self.id = next(self._ids)
+        self.content = content
+
+    async def edit(self, content: str) -> None:
+        self.content = content
+
+
+class FakeThread:
+    id = 50
+    mention = "<#50>"
+
+    def __init__(self, can_delete: bool = True):
+        self.messages: list[FakeMessage] = []
+        self.deleted = False
+        self.can_delete = can_delete
+
+    async def send(self, content: str) -> FakeMessage:
+        self.messages.append(message := FakeMessage(content))
+        return message
+
+    async def delete(self) -> None:
+        if not self.can_delete:
+            raise discord.Forbidden(SimpleNamespace(status=403, reason="Forbidden"), "")
+        self.deleted = True
+
+
+class FakeChannel:
+    id = 5
+    type = discord.ChannelType.text
+
+    def __init__(self, thread: FakeThread, delay: float = 0, error: Exception | None = None):
+        self.thread = thread
+        self.delay = delay
+        self.error = error
+
+    async def create_thread(self, **kwargs) -> FakeThread:
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.thread
+
+
+class FakeStream:
+    def __init__(self, deltas: list[str], error: Exception | None = None):
+        self.deltas = deltas
+        self.error = error
+        self.closed = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for delta in self.deltas:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+        if self.error:
+            raise self.error
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def make_cog(monkeypatch, stream: FakeStream, delay: float = 0, error: Exception | None = None) -> AI:
+    async def create(**kwargs):
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return stream
+
+    async def nothing(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(ai.db, "get_thread_model", nothing)
+    monkeypatch.setattr(ai.db, "set_thread_ai_parameters", nothing)
+    monkeypatch.setattr(ai.settings, "stream_edit_interval", 0)
+    cog = AI(SimpleNamespace())
+    cog.__dict__["client"] = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    return cog
+
+
+def make_interaction(channel: FakeChannel):
+    async def nothing(*args, **kwargs):
+        return None
+
+    return SimpleNamespace(
+        id=77,
+        channel=channel,
+        guild=SimpleNamespace(id=3),
+        user=SimpleNamespace(mention="@asker", display_name="asker"),
+        response=SimpleNamespace(send_message=nothing),
+        edit_original_response=nothing,
+    )
+
+
+def ask(cog: AI, interaction) -> None:
+    asyncio.run(AI.ask.callback(cog, interaction, "why?", "model", 0.5, 100))
+
+
+def test_answer_is_streamed_and_remembered(monkeypatch):
+    thread = FakeThread()
+    cog = make_cog(monkeypatch, FakeStream(["because ", "reasons"]))
+
+    ask(cog, make_interaction(FakeChannel(thread)))
+
+    assert "because reasons" in thread.messages[-1].content
+    turns = list(cog.conversations._threads.get(thread.id))
+    assert [(t.content, t.is_bot) for t in turns] == [
+        ("why?", False),
+        ("because reasons", True),
+    ]
+
+
+def test_broken_stream_marks_the_answer_as_cut_off(monkeypatch):
+    thread = FakeThread()
+    stream = FakeStream(["half an "], error=RuntimeError("connection reset"))
+    cog = make_cog(monkeypatch, stream)
+
+    with pytest.raises(RuntimeError, match="connection reset"):
+        ask(cog, make_interaction(FakeChannel(thread)))
+
+    assert stream.closed
+    assert "half an \n❌ The answer was cut off." in thread.messages[-1].content
+    turns = list(cog.conversations._threads.get(thread.id))
+    assert [t.content for t in turns] == ["why?", "half an "]
+
+
+def test_failed_request_discards_the_new_thread(monkeypatch):
+    thread = FakeThread()
+    cog = make_cog(monkeypatch, FakeStream([]), error=RuntimeError("400 unknown model"))
+
+    with pytest.raises(RuntimeError, match="unknown model"):
+        ask(cog, make_interaction(FakeChannel(thread, delay=0.05)))
+
+    assert thread.deleted
+    assert cog.conversations._threads.get(thread.id) is None
+
+
+def test_failed_request_marks_a_thread_that_cannot_be_deleted(monkeypatch):
+    thread = FakeThread(can_delete=False)
+    cog = make_cog(monkeypatch, FakeStream([]), error=RuntimeError("400 unknown model"))
+
+    with pytest.raises(RuntimeError):
+        ask(cog, make_interaction(FakeChannel(thread)))
+
+    assert thread.messages[-1].content == ai.ASK_FAILED
+
+
+def test_failed_request_in_an_existing_thread_notes_the_failure(monkeypatch):
+    thread = FakeThread()
+    thread.type = discord.ChannelType.public_thread
+    cog = make_cog(monkeypatch, FakeStream([]), delay=0.05, error=RuntimeError("503"))
+
+    with pytest.raises(RuntimeError):
+        ask(cog, make_interaction(thread))
+
+    assert not thread.deleted
+    assert "❌ The model request failed." in thread.messages[-1].content
+
+
+def test_failed_thread_creation_closes_the_stream(monkeypatch):
+    stream = FakeStream(["unused"])
+    cog = make_cog(monkeypatch, stream)
+    channel = FakeChannel(FakeThread(), error=ValueError("no permission"))
+
+    with pytest.raises(ValueError, match="no permission"):
+        ask(cog, make_interaction(channel))
+
+    assert stream.closed
+
+
+def test_every_failure_is_logged(monkeypatch):
+    logged = []
+    monkeypatch.setattr(ai.logger, "error", logged.append)
+    cog = make_cog(monkeypatch, FakeStream([]), error=RuntimeError("model down"))
+    channel = FakeChannel(FakeThread(), error=ValueError("no permission"))
+
+    with pytest.raises(ValueError):
+        ask(cog, make_interaction(channel))
+
+    assert any("no permission" in line for line in logged)
+    assert any("model down" in line for line in logged)
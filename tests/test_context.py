@@ -0,0 +1,49 @@
+"""Token-budgeted context assembly."""
+
+import tiktoken
+
+from app.utils.ai.context import TokenCounter, pack_conversation
+from app.utils.ai.conversation import Turn
+
+
+def byte_counter() -> TokenCounter:
+    """A counter with a one-token-per-byte encoding, so tests stay offline."""
+    counter = TokenCounter()
+    counter.__dict__["_encoding"] = tiktoken.Encoding(
+        name="bytes",
+        pat_str=r"[\s\S]",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+    return counter
+
+
+def estimating_counter() -> TokenCounter:
+    counter = TokenCounter()
+    counter.__dict__["_encoding"] = None
+    return counter
+
+
+def test_truncate_respects_the_limit():
+    for counter in (byte_counter(), estimating_counter()):
+        text = "word " * 200
+        cut = counter.truncate(text, 25)
+        assert cut.endswith("…")
+        assert counter.count(cut) <= 25
+        assert counter.truncate("short", 25) == "short"
+
+
+def test_pack_keeps_the_newest_turns_that_fit():
+    counter = byte_counter()
+    turns = [Turn(i, "user", f"message {i:02d}", i % 2 == 0) for i in range(1, 21)]
+
+    packed = pack_conversation(
+        "system", turns, "me: question", budget=120, turn_tokens=100, counter=counter
+    )
+
+    assert packed.tokens <= 120
+    assert packed.messages[0] == {"role": "system", "content": "system"}
+    assert packed.messages[-1] == {"role": "user", "content": "me: question"}
+    kept = packed.messages[1:-1]
+    assert kept[-1] == {"role": "assistant", "content": "message 20"}
+    assert [t.message_id for t in packed.dropped] == list(range(1, 21 - len(kept)))
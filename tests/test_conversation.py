@@ -0,0 +1,115 @@
+"""Per-thread conversation memory."""
+
+import asyncio
+from types import SimpleNamespace
+
+from app.utils.ai.conversation import ConversationMemory
+
+
+BOT = SimpleNamespace(id=99, bot=True, display_name="bot")
+
+
+def message(message_id: int, content: str, bot: bool = False, mentions=()):
+    author = BOT if bot else SimpleNamespace(
+        id=message_id, bot=False, display_name=f"user{message_id}"
+    )
+    return SimpleNamespace(
+        id=message_id,
+        content=content,
+        author=author,
+        channel=SimpleNamespace(id=1),
+        mentions=list(mentions),
+    )
+
+
+class FakeThread:
+    id = 1
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.fetches = 0
+
+    def history(self, limit, before):
+        self.fetches += 1
+
+        async def pages():
+            await asyncio.sleep(0.01)
+            for m in reversed([m for m in self.messages if m.id < before.id]):
+                yield m
+
+        return pages()
+
+
+def test_concurrent_mentions_share_one_backfill():
+    async def scenario():
+        memory = ConversationMemory(max_turns=50)
+        thread = FakeThread([message(i, f"message {i}") for i in range(1, 11)])
+        first, second = message(11, "first mention"), message(12, "second mention")
+
+        memory.record(first)
+        pending = asyncio.create_task(memory.history(thread, first))
+        await asyncio.sleep(0)
+        # The second mention arrives while the backfill is still running
+        memory.record(second)
+        turns = await asyncio.gather(pending, memory.history(thread, second))
+        return *turns, thread.fetches
+
+    first, second, fetches = asyncio.run(scenario())
+
+    assert fetches == 1
+    assert [turn.message_id for turn in first] == list(range(1, 11))
+    assert [turn.message_id for turn in second][-11:] == list(range(1, 12))
+
+
+def test_bot_answers_are_parsed_from_history():
+    async def scenario():
+        memory = ConversationMemory()
+        thread = FakeThread(
+            [
+                message(1, "question"),
+                message(2, "🚀 Hey, I'm gathering the conversation history...", bot=True),
+                message(3, "🤖 **AI Response:**\n```\nthe answer\n```", bot=True),
+            ]
+        )
+        return await memory.history(thread, message(4, "follow-up"))
+
+    turns = asyncio.run(scenario())
+
+    assert [(turn.content, turn.is_bot) for turn in turns] == [
+        ("question", False),
+        ("the answer", True),
+    ]
+
+
+def test_ask_answers_are_rebuilt_with_their_question_and_continuations():
+    asker = SimpleNamespace(id=7, display_name="asker")
+
+    async def scenario():
+        memory = ConversationMemory()
+        thread = FakeThread(
+            [
+                message(
+                    10,
+                    "💡 **Question from <@7>:**\n```\nwhy?\n```\n\n"
+                    "🤖 **Answer (using m):**\n```\nbecause \n```",
+                    bot=True,
+                    mentions=[asker],
+                ),
+                message(11, "```\nof this \n```", bot=True),
+                # Someone talking while the answer streams doesn't end it
+                message(12, "interesting"),
+                message(13, "```\nand that\n```", bot=True),
+                message(14, "🚀 Hey, I'm gathering the conversation history...", bot=True),
+                # No longer an answer's continuation, so not a turn
+                message(15, "```\nstray\n```", bot=True),
+            ]
+        )
+        return await memory.history(thread, message(16, "follow-up"))
+
+    turns = asyncio.run(scenario())
+
+    assert [(t.message_id, t.author_name, t.content, t.is_bot) for t in turns] == [
+        (9, "asker", "why?", False),
+        (12, "user12", "interesting", False),
+        (13, "", "because of this and that", True),
+    ]
@@ -0,0 +1,194 @@
+"""Database manager behaviour around the link write-behind buffer."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+
+from app import database
+from app.database import Database, _upsert_counts, _upsert_thread_settings
+from app.models.links import LinkEntry, LinkUserCount
+
+
+async def count_links(db: Database) -> int:
+    async with db.session_factory() as session:
+        return (await session.execute(select(func.count(LinkEntry.id)))).scalar()
+
+
+def test_failed_flush_keeps_rows(tmp_path, monkeypatch):
+    async def scenario():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}")
+        await db.connect()
+        db.queue_link_entry(1, 10, "example.com", "https://example.com/a")
+
+        async def fail(session, rows):
+            raise RuntimeError("database is locked")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(db, "_insert_link_rows", fail)
+            with pytest.raises(RuntimeError):
+                await db.flush_link_entries()
+
+        db.queue_link_entry(1, 10, "example.com", "https://example.com/b")
+        written = await db.flush_link_entries()
+        total = await count_links(db)
+        await db.close()
+        return written, total
+
+    assert asyncio.run(scenario()) == (2, 2)
+
+
+def test_close_waits_for_a_flush_in_progress(tmp_path):
+    async def scenario():
+        path = tmp_path / "bot.db"
+        db = Database(f"sqlite+aiosqlite:///{path}", link_batch_size=3)
+        await db.connect()
+
+        insert_rows = db._insert_link_rows
+        started = asyncio.Event()
+
+        async def slow_insert(session, rows):
+            started.set()
+            await asyncio.sleep(0.05)
+            await insert_rows(session, rows)
+
+        db._insert_link_rows = slow_insert
+        for i in range(3):
+            db.queue_link_entry(1, 10, "example.com", f"https://example.com/{i}")
+        await started.wait()
+        await db.close()
+
+        reopened = Database(f"sqlite+aiosqlite:///{path}")
+        await reopened.connect()
+        total = await count_links(reopened)
+        await reopened.close()
+        return total
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_pool_options_are_ignored_for_in_memory_sqlite():
+    async def scenario():
+        db = Database("sqlite+aiosqlite://")
+        await db.connect(pool_size=5, max_overflow=10)
+        settings = await db.get_guild_settings(1)
+        await db.close()
+        return settings.guild_id
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_pool_options_size_file_databases(tmp_path):
+    async def scenario():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}")
+        await db.connect(pool_size=3, max_overflow=2)
+        size = db.engine.pool.size()
+        await db.close()
+        return size
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_connect_refuses_backends_without_upserts():
+    db = Database("mysql+aiomysql://bot@localhost/bot")
+    with pytest.raises(ValueError, match="Unsupported database backend 'mysql'"):
+        asyncio.run(db.connect())
+    assert db.engine is None
+
+
+def test_counter_upserts_compile_for_postgresql():
+    statements = []
+
+    async def execute(stmt, rows):
+        statements.append(stmt)
+
+    session = SimpleNamespace(
+        bind=SimpleNamespace(dialect=postgresql.dialect()), execute=execute
+    )
+    rows = [dict(guild_id=1, user_id=10, link_count=2)]
+    asyncio.run(_upsert_counts(session, LinkUserCount, rows, ["link_count"]))
+
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (guild_id, user_id) DO UPDATE" in sql
+    assert "link_count = (link_user_counts.link_count + excluded.link_count)" in sql
+
+
+def test_thread_settings_upserts_compile_for_postgresql():
+    statements = []
+
+    async def execute(stmt, rows):
+        statements.append(stmt)
+
+    session = SimpleNamespace(
+        bind=SimpleNamespace(dialect=postgresql.dialect()), execute=execute
+    )
+    rows = [dict(thread_id=5, guild_id=1, model="m")]
+    asyncio.run(_upsert_thread_settings(session, rows, update=["model"]))
+
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (thread_id) DO UPDATE SET model = excluded.model" in sql
+
+
+async def fail(session, rows):
+    raise RuntimeError("database is locked")
+
+
+def test_requeued_rows_are_capped_dropping_the_oldest(tmp_path, monkeypatch):
+    async def scenario():
+        db = Database(
+            f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", link_buffer_limit=3
+        )
+        await db.connect()
+        for i in range(5):
+            db.queue_link_entry(1, 10, "example.com", f"https://example.com/{i}")
+        with monkeypatch.context() as patch:
+            patch.setattr(db, "_insert_link_rows", fail)
+            with pytest.raises(RuntimeError):
+                await db.flush_link_entries()
+        kept = [row["url"] for row in db._link_buffer]
+        await db.close()
+        return kept
+
+    assert asyncio.run(scenario()) == [f"https://example.com/{i}" for i in (2, 3, 4)]
+
+
+def test_flush_loop_warns_once_per_outage(tmp_path, monkeypatch):
+    warnings, infos = [], []
+    monkeypatch.setattr(database.logger, "warning", warnings.append)
+    monkeypatch.setattr(database.logger, "info", infos.append)
+
+    async def scenario():
+        db = Database(
+            f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", link_flush_interval=0.01
+        )
+        await db.connect()
+        insert_rows = db._insert_link_rows
+        db._insert_link_rows = fail
+        db.queue_link_entry(1, 10, "example.com", "https://example.com/a")
+        await asyncio.sleep(0.2)
+        db._insert_link_rows = insert_rows
+        await asyncio.sleep(0.05)
+        total = await count_links(db)
+        await db.close()
+        return total
+
+    assert asyncio.run(scenario()) == 1
+    assert len([w for w in warnings if "Link flush failed" in w]) == 1
+    assert len([i for i in infos if "Link flush recovered" in i]) == 1
+
+
+def test_close_disposes_the_engine_when_the_last_flush_fails(tmp_path):
+    async def scenario():
+        db = Database(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}")
+        await db.connect()
+        pool = db.engine.sync_engine.pool
+        db._insert_link_rows = fail
+        db.queue_link_entry(1, 10, "example.com", "https://example.com/a")
+        with pytest.raises(RuntimeError):
+            await db.close()
+        # Disposing swaps in a fresh pool after closing the old connections
+        return db.engine.sync_engine.pool is not pool
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,137 @@
+"""Leaderboard ranks and the materialized counters they read."""
+
+import asyncio
+
+from sqlalchemy import delete, select
+
+from app.database import Database
+from app.models.links import LinkHostnameCount, LinkUserCount, LinkUserHostnameCount
+from app.models.slaps import SlapUserCount
+
+COUNTERS = (LinkUserCount, LinkHostnameCount, LinkUserHostnameCount, SlapUserCount)
+
+
+async def connected() -> Database:
+    db = Database("sqlite+aiosqlite://")
+    await db.connect()
+    return db
+
+
+def test_user_slap_ranks_share_ties():
+    async def scenario():
+        db = await connected()
+        # 10 and 11 are slapped twice each, 12 once; 20 slaps four times
+        for slapped in (10, 10, 11, 11, 12):
+            await db.store_slap_entry(1, 20 if slapped != 12 else 21, slapped)
+        # Another guild's slaps don't count towards ranks here
+        for _ in range(3):
+            await db.store_slap_entry(2, 20, 12)
+        stats = {
+            user_id: await db.get_user_slap_stats(1, user_id)
+            for user_id in (10, 11, 12, 20, 21)
+        }
+        await db.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats[10] == (2, 0, 1, 0)
+    assert stats[11] == (2, 0, 1, 0)
+    assert stats[12] == (1, 0, 3, 0)
+    assert stats[20] == (0, 4, 0, 1)
+    assert stats[21] == (0, 1, 0, 2)
+
+
+def test_user_slap_stats_without_rows():
+    async def scenario():
+        db = await connected()
+        await db.store_slap_entry(1, 20, 10)
+        stats = await db.get_user_slap_stats(1, 99)
+        await db.close()
+        return stats
+
+    assert asyncio.run(scenario()) == (0, 0, 0, 0)
+
+
+def test_user_link_rank_shares_ties():
+    async def scenario():
+        db = await connected()
+        for user_id, url in [
+            (10, "https://a.com/1"),
+            (10, "https://b.com/1"),
+            (10, "https://a.com/2"),
+            (11, "https://a.com/3"),
+            (11, "https://c.com/1"),
+            (11, "https://c.com/2"),
+            (12, "https://a.com/4"),
+        ]:
+            db.queue_link_entry(1, user_id, url.split("/")[2], url)
+        await db.flush_link_entries()
+        stats = {
+            user_id: await db.get_user_link_stats(1, user_id)
+            for user_id in (10, 11, 12, 99)
+        }
+        await db.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats[10] == ([("a.com", 2), ("b.com", 1)], 3, 1)
+    assert stats[11][1:] == (3, 1)
+    assert stats[12] == ([("a.com", 1)], 1, 3)
+    assert stats[99] == ([], 0, 0)
+
+
+async def snapshot(db: Database) -> dict[str, set[tuple]]:
+    async with db.session_factory() as session:
+        return {
+            model.__tablename__: set(
+                (await session.execute(select(*model.__table__.columns))).all()
+            )
+            for model in COUNTERS
+        }
+
+
+async def store_activity(db: Database) -> None:
+    for guild_id in (1, 2):
+        await db.store_link_entry(guild_id, 10, "a.com", "https://a.com/1")
+        # Queued rows land in two batches, so the second one adds to the first
+        for user_id, hostname in [(10, "a.com"), (11, "b.com"), (10, "b.com")]:
+            db.queue_link_entry(guild_id, user_id, hostname, f"https://{hostname}/")
+            await db.flush_link_entries()
+        await db.store_slap_entry(guild_id, 10, 11)
+        await db.store_slap_entry(guild_id, 11, 10)
+        await db.store_slap_entry(guild_id, 12, 10)
+
+
+def test_counters_match_a_recount():
+    async def scenario():
+        db = await connected()
+        await store_activity(db)
+        maintained = await snapshot(db)
+        await db.rebuild_counters()
+        rebuilt = await snapshot(db)
+        await db.close()
+        return maintained, rebuilt
+
+    maintained, rebuilt = asyncio.run(scenario())
+    assert maintained == rebuilt
+    assert (1, 10, 3) in maintained["link_user_counts"]
+    assert (1, 10, "b.com", 1) in maintained["link_user_hostname_counts"]
+
+
+def test_rebuild_repairs_only_the_given_guild():
+    async def scenario():
+        db = await connected()
+        await store_activity(db)
+        expected = await snapshot(db)
+        async with db.session_factory() as session:
+            for model in COUNTERS:
+                await session.execute(delete(model))
+            await session.commit()
+        await db.rebuild_counters(guild_id=1)
+        repaired = await snapshot(db)
+        await db.close()
+        return expected, repaired
+
+    expected, repaired = asyncio.run(scenario())
+    for table, rows in expected.items():
+        assert repaired[table] == {row for row in rows if row[0] == 1}
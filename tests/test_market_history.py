@@ -0,0 +1,80 @@
+"""Incremental price history store: tail merging and deduplication."""
+
+import asyncio
+
+import pandas as pd
+
+from app.utils import market_data
+from app.utils.market_data import HistoryStore, _merge_tail, _StoredHistory
+
+NOW = pd.Timestamp.now(tz="UTC")
+
+
+def bars(days: list[int], closes: list[float], dividends: float = 0.0) -> pd.DataFrame:
+    index = pd.DatetimeIndex(
+        [NOW.normalize() + pd.Timedelta(days=day) for day in days],
+        tz="UTC",
+        name="Date",
+    )
+    return pd.DataFrame(
+        {
+            "Close": closes,
+            "Dividends": [0.0] * (len(days) - 1) + [dividends],
+            "Stock Splits": 0.0,
+        },
+        index=index,
+    )
+
+
+def test_tail_replaces_the_last_bar_and_appends_new_ones():
+    stored = _StoredHistory(bars([-3, -2, -1], [1.0, 2.0, 3.0]), 0, 0.0)
+    tail = bars([-2, -1, 0], [2.0, 3.5, 4.0])
+
+    merged = _merge_tail(stored, tail, NOW)
+
+    assert merged.frame.index.is_unique
+    assert merged.frame["Close"].tolist() == [1.0, 2.0, 3.5, 4.0]
+    assert merged.fetched_at == NOW.timestamp()
+
+
+def test_empty_tail_only_refreshes_the_fetch_time():
+    stored = _StoredHistory(bars([-2, -1], [1.0, 2.0]), 0, 0.0)
+
+    merged = _merge_tail(stored, bars([], []), NOW)
+
+    assert merged.frame["Close"].tolist() == [1.0, 2.0]
+    assert merged.fetched_at == NOW.timestamp()
+
+
+def test_tail_with_a_new_dividend_needs_a_refetch():
+    stored = _StoredHistory(bars([-2, -1], [1.0, 2.0]), 0, 0.0)
+
+    assert _merge_tail(stored, bars([-1, 0], [2.0, 2.5], dividends=0.1), NOW) is None
+
+
+def test_store_downloads_missing_symbols_once_then_only_the_tail(
+    tmp_path, monkeypatch
+):
+    downloads = []
+
+    def download(symbols, **kwargs):
+        downloads.append((symbols, kwargs))
+        if "period" in kwargs:
+            return {s: bars([-3, -2, -1], [1.0, 2.0, 3.0]) for s in symbols}
+        return {s: bars([-1, 0], [3.5, 4.0]) for s in symbols}
+
+    monkeypatch.setattr(market_data, "_download", download)
+    store = HistoryStore(tmp_path)
+
+    first = asyncio.run(store.history_many(["aapl", "AAPL", "msft"], "1mo"))
+    second = asyncio.run(store.history_many(["AAPL", "MSFT"], "1mo", max_age=0))
+    reread = HistoryStore(tmp_path).load_many(["AAPL"], "1mo", "1d")
+
+    assert [symbols for symbols, _ in downloads] == [["AAPL", "MSFT"]] * 2
+    assert downloads[1][1]["start"] == bars([-1], [0.0]).index[0]
+    assert list(first) == ["AAPL", "MSFT"]
+    assert first["AAPL"]["Close"].tolist() == [1.0, 2.0, 3.0]
+    assert second["MSFT"]["Close"].tolist() == [1.0, 2.0, 3.5, 4.0]
+    # Served from the file written after the merge, without a download
+    assert len(downloads) == 2
+    assert reread["AAPL"]["Close"].tolist() == [1.0, 2.0, 3.5, 4.0]
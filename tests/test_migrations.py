@@ -0,0 +1,116 @@
+"""Startup migrations against databases created before Alembic was used."""
+
+import sqlite3
+
+from app.main import _upgrade_database
+
+# Schema that create_all produced from the models before the counter tables
+BASELINE_SCHEMA = """
+CREATE TABLE guild_settings (
+    guild_id BIGINT NOT NULL PRIMARY KEY,
+    ai_enabled BOOLEAN,
+    fact_check_enabled BOOLEAN,
+    grok_enabled BOOLEAN,
+    qotd_enabled BOOLEAN,
+    settings_json TEXT,
+    created_at DATETIME,
+    updated_at DATETIME
+);
+CREATE TABLE thread_settings (
+    thread_id BIGINT NOT NULL PRIMARY KEY,
+    guild_id BIGINT NOT NULL REFERENCES guild_settings (guild_id),
+    model VARCHAR NOT NULL,
+    temperature FLOAT,
+    max_tokens INTEGER
+);
+CREATE TABLE link_entries (
+    id INTEGER NOT NULL PRIMARY KEY,
+    guild_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    hostname VARCHAR(255) NOT NULL,
+    url TEXT NOT NULL,
+    created_at DATETIME
+);
+CREATE INDEX ix_link_entries_hostname ON link_entries (hostname);
+CREATE TABLE slap_entries (
+    id INTEGER NOT NULL PRIMARY KEY,
+    guild_id BIGINT NOT NULL,
+    slapper_id BIGINT NOT NULL,
+    slapped_id BIGINT NOT NULL,
+    created_at DATETIME
+);
+"""
+
+
+def make_baseline_database(path) -> None:
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.executemany(
+        "INSERT INTO link_entries (guild_id, user_id, hostname, url) VALUES (?, ?, ?, ?)",
+        [
+            (1, 10, "example.com", "https://example.com/a"),
+            (1, 10, "example.com", "https://example.com/b"),
+            (1, 11, "test.org", "https://test.org/"),
+            (2, 10, "example.com", "https://example.com/c"),
+        ],
+    )
+    connection.executemany(
+        "INSERT INTO slap_entries (guild_id, slapper_id, slapped_id) VALUES (?, ?, ?)",
+        [(1, 10, 11), (1, 10, 11), (1, 11, 10)],
+    )
+    connection.commit()
+    connection.close()
+
+
+def test_unversioned_database_is_migrated(tmp_path):
+    path = tmp_path / "bot.db"
+    make_baseline_database(path)
+
+    assert _upgrade_database(f"sqlite+aiosqlite:///{path}")
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT version_num FROM alembic_version").fetchall() == [
+        ("8e1f6a0c5d27",)
+    ]
+    assert sorted(connection.execute("SELECT * FROM link_user_counts")) == [
+        (1, 10, 2),
+        (1, 11, 1),
+        (2, 10, 1),
+    ]
+    assert sorted(connection.execute("SELECT * FROM link_hostname_counts")) == [
+        (1, "example.com", 2),
+        (1, "test.org", 1),
+        (2, "example.com", 1),
+    ]
+    assert sorted(connection.execute("SELECT * FROM slap_user_counts")) == [
+        (1, 10, 1, 2),
+        (1, 11, 2, 1),
+    ]
+    indexes = {
+        row[0]
+        for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+    }
+    assert {
+        "ix_link_entries_guild_user",
+        "ix_link_entries_guild_hostname",
+        "ix_slap_entries_guild_slapped",
+        "ix_slap_entries_guild_slapper",
+        "ix_link_user_counts_guild_count",
+        "ix_slap_user_counts_guild_slapped",
+    } <= indexes
+    connection.close()
+
+
+def test_new_database_is_created_at_head(tmp_path):
+    path = tmp_path / "bot.db"
+
+    assert _upgrade_database(f"sqlite+aiosqlite:///{path}")
+    assert not _upgrade_database(f"sqlite+aiosqlite:///{path}")
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT version_num FROM alembic_version").fetchall() == [
+        ("8e1f6a0c5d27",)
+    ]
+    connection.close()
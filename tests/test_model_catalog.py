@@ -0,0 +1,82 @@
+"""Model catalog search and background refresh."""
+
+import asyncio
+
+from app.utils.ai.model_catalog import ModelCatalog, _Index
+
+MODELS = [
+    "openai/gpt-4o",
+    "openai/gpt-4o-mini",
+    "openai/o3",
+    "anthropic/claude-sonnet-4",
+    "google/gemini-2.5-pro",
+    "gpt-lookalike/model",
+]
+
+
+def test_prefix_matches_rank_ids_then_names_then_tokens():
+    index = _Index.build(MODELS)
+
+    assert index.search("gpt", 10) == [
+        "gpt-lookalike/model",
+        "openai/gpt-4o",
+        "openai/gpt-4o-mini",
+    ]
+    assert index.search("OpenAI/GPT-4o", 10) == ["openai/gpt-4o", "openai/gpt-4o-mini"]
+    assert index.search("sonnet", 10) == ["anthropic/claude-sonnet-4"]
+    assert index.search("gpt", 1) == ["gpt-lookalike/model"]
+
+
+def test_substring_and_fuzzy_matches_fill_in():
+    index = _Index.build(MODELS)
+
+    # "4o-m" starts no token, so it is found as a substring
+    assert index.search("4o-m", 10) == ["openai/gpt-4o-mini"]
+    assert index.search("gem25", 10) == ["google/gemini-2.5-pro"]
+    assert index.search("", 2) == ["openai/o3", "openai/gpt-4o"]
+
+
+def test_refresh_failures_keep_serving_the_previous_models():
+    responses = [
+        {"openai/gpt-4o": 128000},
+        RuntimeError("provider down"),
+        {"openai/o3": 200000},
+    ]
+
+    async def fetch():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def scenario():
+        catalog = ModelCatalog(fetch, ttl=0, retry_after=0)
+        first = await catalog.search("gpt")
+        # Stale, so each search starts a refresh; this one fails
+        stale = await catalog.search("gpt")
+        await catalog._refresh
+        kept = await catalog.search("gpt")
+        after_failure = kept, catalog.context_length("openai/gpt-4o")
+        await catalog._refresh
+        refreshed = await catalog.search("o3"), catalog.context_length("openai/o3")
+        return first, stale, after_failure, refreshed
+
+    first, stale, after_failure, refreshed = asyncio.run(scenario())
+    assert first == stale == ["openai/gpt-4o"]
+    assert after_failure == (["openai/gpt-4o"], 128000)
+    assert refreshed == (["openai/o3"], 200000)
+    assert responses == []
+
+
+def test_first_search_gives_up_waiting_after_the_timeout():
+    async def fetch():
+        await asyncio.sleep(10)
+        return {"openai/gpt-4o": None}
+
+    async def scenario():
+        catalog = ModelCatalog(fetch)
+        results = await catalog.search("gpt", wait=0.05)
+        catalog._refresh.cancel()
+        return results
+
+    assert asyncio.run(scenario()) == []
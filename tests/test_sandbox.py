@@ -0,0 +1,70 @@
+"""Sandbox worker pool: timeouts and worker replacement."""
+
+import asyncio
+
+import pandas as pd
+
+from app.utils.ai.sandbox import SandboxLimits, SandboxPool, pack_frame
+
+FRAMES = {"income": None, "balance": None, "cash": None}
+
+
+async def wait_for_worker(pool: SandboxPool) -> None:
+    while pool._idle.empty():
+        await asyncio.sleep(0.05)
+
+
+def test_workers_are_reused_between_runs():
+    async def scenario():
+        pool = SandboxPool(workers=1, limits=SandboxLimits(timeout=30))
+        try:
+            first = await pool.run("output = {'rows': len(income)}", FRAMES)
+            (worker,) = pool._live
+            second = await pool.run("output = {'total': sum([1, 2])}", FRAMES)
+            return first, second, pool._live == {worker}
+        finally:
+            pool.close()
+
+    assert asyncio.run(scenario()) == ({"rows": 0}, {"total": 3}, True)
+
+
+def test_a_run_that_times_out_gets_its_worker_replaced():
+    async def scenario():
+        pool = SandboxPool(workers=1, limits=SandboxLimits(timeout=1))
+        try:
+            pool.start()
+            await wait_for_worker(pool)
+            (stuck,) = pool._live
+            timed_out = await pool.run("while True:\n    pass", FRAMES)
+            killed = not stuck.process.is_alive()
+            await wait_for_worker(pool)
+            after = await pool.run("output = {'ok': True}", FRAMES)
+            (replacement,) = pool._live
+            return timed_out, killed, after, replacement is not stuck
+        finally:
+            pool.close()
+
+    timed_out, killed, after, replaced = asyncio.run(scenario())
+    assert timed_out == {"error": "Analysis timed out after 1 seconds"}
+    assert killed and replaced
+    assert after == {"ok": True}
+
+
+def test_statements_reach_the_worker_as_frames():
+    async def scenario():
+        pool = SandboxPool(workers=1, limits=SandboxLimits(timeout=30))
+        try:
+            statement = pd.DataFrame(
+                {"2024": [10.0, 4.0], "2023": [8.0, 3.0]},
+                index=["Total Revenue", "Net Income"],
+            )
+            frames = {**FRAMES, "income": pack_frame(statement)}
+            return await pool.run(
+                "output = {'margin': round((income['Net Income'].sum()"
+                " / income['Total Revenue'].sum()), 2)}",
+                frames,
+            )
+        finally:
+            pool.close()
+
+    assert asyncio.run(scenario()) == {"margin": 0.39}
@@ -0,0 +1,163 @@
+"""Write-through caches for guild and thread settings."""
+
+import asyncio
+
+from sqlalchemy import event
+
+from app.database import Database
+
+
+async def connected() -> tuple[Database, list[str]]:
+    db = Database("sqlite+aiosqlite://")
+    await db.connect()
+    queries: list[str] = []
+
+    @event.listens_for(db.engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+
+    return db, queries
+
+
+async def stored_guild_settings(db: Database, guild_id: int):
+    db.guild_settings_cache.pop(guild_id)
+    return await db.get_guild_settings(guild_id)
+
+
+def test_guild_settings_are_read_once():
+    async def scenario():
+        db, queries = await connected()
+        first = await db.get_guild_settings(1)
+        read = len(queries)
+        second = await db.get_guild_settings(1)
+        await db.close()
+        return first, second, read, len(queries)
+
+    first, second, read, total = asyncio.run(scenario())
+    assert first == second
+    assert read > 0 and total == read
+
+
+def test_guild_setting_update_writes_through():
+    async def scenario():
+        db, queries = await connected()
+        await db.get_guild_settings(1)
+        await db.update_guild_setting(1, "ai_enabled", True)
+        written = len(queries)
+        cached = await db.get_guild_settings(1)
+        served_from_cache = len(queries) == written
+        stored = await stored_guild_settings(db, 1)
+        await db.close()
+        return cached, stored, served_from_cache
+
+    cached, stored, served_from_cache = asyncio.run(scenario())
+    assert cached.ai_enabled and stored.ai_enabled
+    assert served_from_cache
+
+
+def test_guild_setting_update_for_an_unknown_guild_caches_nothing():
+    async def scenario():
+        db, _ = await connected()
+        await db.update_guild_setting(1, "ai_enabled", True)
+        cached = 1 in db.guild_settings_cache
+        settings = await db.get_guild_settings(1)
+        await db.close()
+        return cached, settings
+
+    cached, settings = asyncio.run(scenario())
+    assert not cached
+    assert not settings.ai_enabled
+
+
+def test_guild_settings_json_update_refreshes_the_cache():
+    async def scenario():
+        db, _ = await connected()
+        before = await db.get_guild_settings(1)
+        await db.update_guild_settings_json(1, {"prefix": "!"})
+        cached = await db.get_guild_settings(1)
+        stored = await stored_guild_settings(db, 1)
+        await db.close()
+        return before, cached, stored
+
+    before, cached, stored = asyncio.run(scenario())
+    assert before.settings_json == {}
+    assert cached.settings_json == stored.settings_json == {"prefix": "!"}
+
+
+async def stored_thread_settings(db: Database, thread_id: int):
+    db.thread_settings_cache.pop(thread_id)
+    return await db.get_thread_settings(thread_id)
+
+
+def test_missing_thread_settings_are_cached():
+    async def scenario():
+        db, queries = await connected()
+        first = await db.get_thread_settings(5)
+        read = len(queries)
+        second = await db.get_thread_settings(5)
+        await db.close()
+        return first, second, read, len(queries)
+
+    first, second, read, total = asyncio.run(scenario())
+    assert first is None and second is None
+    assert read > 0 and total == read
+
+
+def test_thread_ai_parameters_write_through():
+    async def scenario():
+        db, queries = await connected()
+        # Cache the thread as having no settings, then give it some
+        await db.get_thread_settings(5)
+        await db.set_thread_ai_parameters(1, 5, "a", temperature=0.2, max_tokens=50)
+        written = len(queries)
+        cached = await db.get_thread_ai_parameters(5)
+        served_from_cache = len(queries) == written
+        stored = await stored_thread_settings(db, 5)
+        await db.close()
+        return cached, stored, served_from_cache
+
+    cached, stored, served_from_cache = asyncio.run(scenario())
+    assert cached == {"model": "a", "temperature": 0.2, "max_tokens": 50}
+    assert (stored.model, stored.temperature, stored.max_tokens) == ("a", 0.2, 50)
+    assert served_from_cache
+
+
+def test_thread_model_update_patches_the_cached_row():
+    async def scenario():
+        db, _ = await connected()
+        await db.set_thread_ai_parameters(1, 5, "a", temperature=0.2, max_tokens=50)
+        await db.set_thread_model(1, 5, "b")
+        cached = await db.get_thread_settings(5)
+        stored = await stored_thread_settings(db, 5)
+        await db.close()
+        return cached, stored
+
+    cached, stored = asyncio.run(scenario())
+    assert cached == stored
+    assert (cached.model, cached.temperature) == ("b", 0.2)
+
+
+def test_thread_model_update_drops_a_cached_missing_row():
+    async def scenario():
+        db, _ = await connected()
+        await db.get_thread_settings(5)
+        await db.set_thread_model(1, 5, "b")
+        settings = await db.get_thread_settings(5)
+        await db.close()
+        return settings
+
+    assert asyncio.run(scenario()).model == "b"
+
+
+def test_forgotten_threads_are_read_again():
+    async def scenario():
+        db, _ = await connected()
+        await db.set_thread_ai_parameters(1, 5, "a")
+        db.forget_thread(5)
+        cached = 5 in db.thread_settings_cache
+        settings = await db.get_thread_settings(5)
+        await db.close()
+        return cached, settings
+
+    cached, settings = asyncio.run(scenario())
+    assert not cached and settings.model == "a"
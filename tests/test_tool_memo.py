@@ -0,0 +1,110 @@
+"""Run-scoped memoization of the agent tools."""
+
+import asyncio
+
+import pytest
+
+from app.utils.ai import tools
+from app.utils.ai.tools import _memoized, tool_memo
+
+calls: list[str] = []
+
+
+@_memoized
+async def lookup(ticker: str, period: str = "1d") -> str:
+    calls.append(ticker)
+    await asyncio.sleep(0)
+    return f"{ticker}:{period}"
+
+
+@_memoized
+async def flaky(ticker: str) -> str:
+    calls.append(ticker)
+    if calls.count(ticker) == 1:
+        raise RuntimeError("rate limited")
+    return ticker
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def test_identical_calls_in_a_run_share_one_lookup():
+    async def scenario():
+        with tool_memo() as memo:
+            results = await asyncio.gather(
+                lookup("aapl"), lookup("AAPL", "1d"), lookup("AAPL", period="5d")
+            )
+        return results, memo.stats
+
+    results, stats = asyncio.run(scenario())
+    assert results == ["aapl:1d", "aapl:1d", "AAPL:5d"]
+    assert calls == ["aapl", "AAPL"]
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_runs_do_not_share_results():
+    async def run():
+        with tool_memo():
+            return await lookup("AAPL")
+
+    async def scenario():
+        await run()
+        await run()
+        # Concurrent runs each get their own memo too
+        await asyncio.gather(run(), run())
+
+    asyncio.run(scenario())
+    assert calls == ["AAPL"] * 4
+
+
+def test_calls_outside_a_run_are_not_memoized():
+    async def scenario():
+        await lookup("AAPL")
+        await lookup("AAPL")
+
+    asyncio.run(scenario())
+    assert calls == ["AAPL", "AAPL"]
+
+
+def test_tasks_started_in_a_run_inherit_its_memo():
+    async def scenario():
+        with tool_memo() as memo:
+            task = asyncio.create_task(lookup("AAPL"))
+        # The block has exited, but the task still sees the run's memo
+        await task
+        return memo.stats
+
+    stats = asyncio.run(scenario())
+    assert stats["misses"] == 1 and stats["size"] == 1
+
+
+def test_failed_calls_are_retried():
+    async def scenario():
+        with tool_memo():
+            with pytest.raises(RuntimeError):
+                await flaky("AAPL")
+            return await flaky("AAPL"), await flaky("AAPL")
+
+    assert asyncio.run(scenario()) == ("AAPL", "AAPL")
+    assert calls == ["AAPL", "AAPL"]
+
+
+def test_shared_statement_loads_are_not_counted_as_lookups(monkeypatch):
+    def fetch_statement(ticker, statement, period="annual"):
+        calls.append(statement)
+        return None
+
+    monkeypatch.setattr(tools, "_fetch_statement", fetch_statement)
+
+    async def scenario():
+        with tool_memo() as memo:
+            await lookup("AAPL")
+            for _ in range(3):
+                await tools._load_statement("AAPL", "income statement")
+        return memo.stats
+
+    stats = asyncio.run(scenario())
+    assert calls == ["AAPL", "income statement"]
+    assert (stats["hits"], stats["misses"]) == (0, 1)